@@ -1,10 +1,11 @@
 import logging
 from .errors import CircularReferenceError, InvalidIndicesError, RedefinedNameError, SolverError, UndefinedNameError
-from .input import InputSpec
+from .input import Columns, InputSpec
 from .output import OutputSpec
-from .program import Program
+from .program import InputCache, MappingOptions, Program
 from .registry import register, register_dict, import_from_module
 from .solver import Solver, SolverOptions
+from .spec_cache import SpecCache, set_spec_cache_directory
 
 __all__ = [
     'CircularReferenceError',
@@ -13,10 +14,13 @@ __all__ = [
     'SolverError',
     'UndefinedNameError',
     #
+    'Columns',
     'InputSpec',
     #
     'OutputSpec',
     #
+    'InputCache',
+    'MappingOptions',
     'Program',
     #
     'register',
@@ -25,6 +29,9 @@ __all__ = [
     #
     'Solver',
     'SolverOptions',
+    #
+    'SpecCache',
+    'set_spec_cache_directory',
 ]
 
 # Set up logging. By default, do not output any log messages from library code.
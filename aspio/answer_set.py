@@ -0,0 +1,409 @@
+import re
+from array import array
+from collections import OrderedDict
+from functools import partial
+from typing import Callable, Iterable, Iterator, List, Mapping, MutableMapping, Optional, Sequence, Tuple, Union  # noqa
+from .errors import SolverError
+from . import asp
+
+__all__ = [
+    'ColumnarAnswerSet',
+    'ColumnarFacts',
+    'LazyAnswerSet',
+    'parse_answer_set',
+    'SymbolTable',
+]
+
+
+# A hand-written scanner for the answer sets printed by dlvhex2.
+#
+# It accepts the same facts as the pyparsing grammar in `parser.AnswerSetParser`, but only in the compact form dlvhex2 actually prints,
+# i.e. without whitespace between the tokens (whitespace at the start and end of the line is fine).
+# Lines the scanner does not understand are passed on to the pyparsing grammar, which is the reference implementation
+# and decides whether the line is valid or not.
+#
+# The syntax of quoted strings mirrors `QuotedString(quoteChar='"', escChar='\\')`:
+# any character except quotes, backslashes and line breaks, or a backslash followed by any character (except line breaks).
+#
+# Lines may be given as `str` or as (undecoded) `bytes`.
+# In the latter case, only the arguments of facts that are actually accessed are decoded.
+_predicate = r'-?[a-z][a-zA-Z0-9_]*'
+_argument = r'[0-9]+|[a-z][a-zA-Z0-9_]*|"(?:[^"\\\n\r]|\\.)*"'
+_fact = r'({0})(?:\(((?:{1})(?:,(?:{1}))*)\))?[,}}]'.format(_predicate, _argument)
+_quoted_argument_re = re.compile(r'"((?:[^"\\\n\r]|\\.)*)"|[^,]+')
+_escape_re = re.compile(r'\\(.)')
+_whitespace = ' \t\r\n'  # same as parser.DEFAULT_WHITESPACE_CHARS
+
+RawLine = Union[str, bytes]
+
+
+class _Syntax:
+    '''The regular expressions and delimiters used by the scanner, for either `str` or `bytes` lines.'''
+
+    def __init__(self, convert: Callable[[str], RawLine]) -> None:
+        self.fact_re = re.compile(convert(_fact))
+        self.whitespace = convert(_whitespace)
+        self.open_brace = convert('{')
+        self.close_brace = convert('}')
+
+
+_str_syntax = _Syntax(str)
+_bytes_syntax = _Syntax(lambda s: s.encode('ascii'))
+
+# pyparsing's QuotedString converts these escape sequences to the corresponding whitespace characters,
+# every other escaped character stands for itself.
+_escaped_whitespace = {'t': '\t', 'n': '\n', 'f': '\f', 'r': '\r'}
+
+
+class _UnsupportedLine(Exception):
+    '''Raised by the scanner if it cannot handle a line (which does not necessarily mean the line is invalid).'''
+
+
+def _unescape(match):
+    c = match.group(1)
+    return _escaped_whitespace.get(c, c)
+
+
+def _unquote(quoted_contents: str) -> str:
+    if '\\' in quoted_contents:
+        return _escape_re.sub(_unescape, quoted_contents)
+    return quoted_contents
+
+
+def _split_arguments(args: str) -> Tuple[str, ...]:
+    '''Split the argument list of a single fact (without the enclosing parentheses) into the constants it contains.'''
+    if '"' not in args:
+        return tuple(args.split(','))
+    return tuple(
+        _unquote(m.group(1)) if m.group(1) is not None else m.group(0)
+        for m in _quoted_argument_re.finditer(args)
+    )
+
+
+def _split_raw_arguments(raw_args: RawLine, encoding: str) -> Tuple[str, ...]:
+    if isinstance(raw_args, bytes):
+        raw_args = raw_args.decode(encoding)
+    return _split_arguments(raw_args)
+
+
+class SymbolTable:
+    '''Interns the constants of all answer sets computed by a single solver invocation.
+
+    Answer sets of the same program usually share most of their atoms,
+    so with a symbol table the memory needed for the decoded answer sets grows with the number of distinct symbols instead of the number of answer sets.
+    Recently used argument tuples are interned as well, but only up to `max_tuples` of them,
+    so the table itself does not keep the facts of every answer set alive.
+    '''
+    # The maximum number of argument tuples that are remembered (the least recently used ones are dropped first)
+    max_tuples = 4096
+
+    def __init__(self) -> None:
+        self._symbols = {}  # type: MutableMapping[str, str]
+        self._tuples = OrderedDict()  # type: OrderedDict[Tuple[str, ...], Tuple[str, ...]]
+        # Numeric ids of the symbols, used by the columnar answer set representation
+        self._ids = {}  # type: MutableMapping[str, int]
+        self._names = []  # type: List[str]
+
+    def symbol(self, s: str) -> str:
+        '''Return the canonical instance of the given string.'''
+        return self._symbols.setdefault(s, s)
+
+    def arguments(self, raw_args: RawLine, encoding: str = 'UTF-8') -> Tuple[str, ...]:
+        '''Decode the given raw argument list, interning its constants.'''
+        return self.argument_tuple(tuple(map(self.symbol, _split_raw_arguments(raw_args, encoding))))
+
+    def argument_tuple(self, args: Tuple[str, ...]) -> Tuple[str, ...]:
+        '''Return the canonical instance of the given argument tuple, whose constants must already be interned. Only the `max_tuples` most recently used tuples are remembered.'''
+        tuples = self._tuples
+        canonical = tuples.get(args)
+        if canonical is None:
+            canonical = tuples[args] = args
+            if len(tuples) > self.max_tuples:
+                tuples.popitem(last=False)
+        else:
+            tuples.move_to_end(args)
+        return canonical
+
+    def intern_answer_set(self, answer_set: asp.RawAnswerSet) -> asp.RawAnswerSet:
+        '''Intern the symbols of an answer set that has been decoded without this symbol table (e.g., in another process).'''
+        symbol = self.symbol
+        argument_tuple = self.argument_tuple
+        return {
+            symbol(pred): tuple(argument_tuple(tuple(map(symbol, args))) for args in facts)
+            for (pred, facts) in answer_set.items()
+        }
+
+    def symbol_id(self, s: str) -> int:
+        '''Return the numeric id of the given string, assigning a new id if necessary.'''
+        i = self._ids.get(s)
+        if i is None:
+            s = self.symbol(s)
+            i = self._ids[s] = len(self._names)
+            self._names.append(s)
+        return i
+
+    def symbol_name(self, i: int) -> str:
+        '''Return the string with the given numeric id.'''
+        return self._names[i]
+
+    @property
+    def symbol_names(self) -> Sequence[str]:
+        '''The strings that have been assigned a numeric id, indexed by their id (see `symbol_id`). Must not be modified.'''
+        return self._names
+
+    def __len__(self) -> int:
+        '''The number of distinct symbols.'''
+        return len(self._symbols)
+
+
+def _line_bounds(line: RawLine, whitespace: RawLine) -> Tuple[int, int]:
+    '''Return the positions of the first and one past the last non-whitespace character of the given line.'''
+    start = 0
+    end = len(line)
+    while start < end and line[start] in whitespace:
+        start += 1
+    while end > start and line[end - 1] in whitespace:
+        end -= 1
+    return start, end
+
+
+def _index_answer_set(line: RawLine, symbols: Optional[SymbolTable]) -> MutableMapping[str, 'array[int]']:
+    '''Find the facts in the given line, without decoding them.
+
+    Returns a dictionary that maps each predicate to a flat array of (start, end) positions of the argument lists of its facts,
+    or (-1, -1) for facts without arguments.
+    '''
+    syntax = _bytes_syntax if isinstance(line, bytes) else _str_syntax
+    close_brace = syntax.close_brace
+    start, end = _line_bounds(line, syntax.whitespace)
+    if end - start < 2 or line[start:start + 1] != syntax.open_brace or line[end - 1:end] != close_brace:
+        raise _UnsupportedLine()
+    index = {}  # type: MutableMapping[RawLine, array[int]]
+    pos = start + 1
+    if pos == end - 1:
+        # empty answer set
+        return {}
+    for m in syntax.fact_re.finditer(line, pos, end):  # type: ignore  # the pattern and the line are either both str or both bytes
+        # The facts must follow each other immediately, finditer would silently skip anything in between
+        if m.start() != pos:
+            raise _UnsupportedLine()
+        pred = m.group(1)
+        spans = index.get(pred)
+        if spans is None:
+            spans = index[pred] = array('q')
+        spans.extend(m.span(2))
+        pos = m.end()
+        if line[pos - 1:pos] == close_brace:
+            break
+    if pos != end or line[pos - 1:pos] != close_brace:
+        raise _UnsupportedLine()
+    # Predicate names are ASCII by definition
+    predicates = {
+        (pred.decode('ascii') if isinstance(pred, bytes) else pred): spans for (pred, spans) in index.items()
+    }  # type: MutableMapping[str, array[int]]
+    if symbols is not None:
+        predicates = {symbols.symbol(pred): spans for (pred, spans) in predicates.items()}
+    return predicates
+
+
+def _decode_facts(line: RawLine, spans: 'array[int]', symbols: Optional[SymbolTable], encoding: str) -> Sequence[Tuple[str, ...]]:
+    '''Decode the facts at the given positions (as returned by `_index_answer_set`) into argument tuples.'''
+    if symbols is not None:
+        decode = partial(symbols.arguments, encoding=encoding)  # type: Callable[[RawLine], Tuple[str, ...]]
+    elif isinstance(line, bytes):
+        decode = partial(_split_raw_arguments, encoding=encoding)
+    else:
+        decode = _split_arguments  # type: ignore
+    it = iter(spans)
+    return tuple(decode(line[start:end]) if start >= 0 else () for start, end in zip(it, it))
+
+
+class LazyAnswerSet(Mapping[str, Sequence[Tuple[str, ...]]]):
+    '''A raw answer set that only decodes the facts of a predicate when they are accessed for the first time.
+
+    The underlying line is kept until all predicates have been decoded.
+    '''
+
+    def __init__(self,
+                 line: RawLine,
+                 index: MutableMapping[str, 'array[int]'],
+                 symbols: Optional[SymbolTable] = None,
+                 encoding: str = 'UTF-8') -> None:
+        self._line = line  # type: Optional[RawLine]
+        self._index = index
+        self._symbols = symbols
+        self._encoding = encoding
+        # The decoded facts (per predicate)
+        self._facts = {}  # type: MutableMapping[str, Sequence[Tuple[str, ...]]]
+
+    def __getitem__(self, pred: str) -> Sequence[Tuple[str, ...]]:
+        facts = self._facts.get(pred)
+        if facts is None:
+            spans = self._index[pred]  # raises KeyError for unknown predicates
+            line = self._line
+            assert line is not None  # only released after all predicates have been decoded
+            facts = self._facts[pred] = _decode_facts(line, spans, self._symbols, self._encoding)
+            if len(self._facts) == len(self._index):
+                # Everything has been decoded, so we do not need the raw data anymore
+                self._line = None
+        return facts
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, pred: object) -> bool:
+        return pred in self._index
+
+    def __repr__(self) -> str:
+        return 'LazyAnswerSet({0!r})'.format(dict(self.items()))
+
+
+class ColumnarFacts(Sequence[Tuple[str, ...]]):
+    '''The facts of a single predicate, stored column-wise as arrays of symbol ids.
+
+    Behaves like a read-only sequence of argument tuples; the tuples are re-created on every access.
+    '''
+
+    def __init__(self, facts: Iterable[Sequence[str]], symbols: SymbolTable) -> None:
+        self._symbols = symbols
+        # The same predicate name may be used with different arities, so we need one set of columns per arity.
+        # The columns are filled fact by fact, so the facts are never stored as a whole.
+        counts = {}  # type: MutableMapping[int, int]
+        columns_by_arity = {}  # type: MutableMapping[int, Tuple[array[int], ...]]
+        symbol_id = symbols.symbol_id
+        for args in facts:
+            arity = len(args)
+            columns = columns_by_arity.get(arity)
+            if columns is None:
+                columns = columns_by_arity[arity] = tuple(array('I') for _ in range(arity))
+                counts[arity] = 0
+            counts[arity] += 1
+            for (column, arg) in zip(columns, args):
+                column.append(symbol_id(arg))
+        self._groups = tuple(
+            (counts[arity], columns) for (arity, columns) in columns_by_arity.items()
+        )  # type: Tuple[Tuple[int, Tuple[array[int], ...]], ...]
+        self._len = sum(count for (count, _) in self._groups)
+
+    @classmethod
+    def from_spans(cls, line: RawLine, spans: 'array[int]', symbols: SymbolTable, encoding: str = 'UTF-8') -> 'ColumnarFacts':
+        '''Create the columns directly from the facts at the given positions of the line (as returned by `_index_answer_set`).'''
+        it = iter(spans)
+        return cls((_split_raw_arguments(line[start:end], encoding) if start >= 0 else () for start, end in zip(it, it)), symbols)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Tuple[str, ...]]:
+        names = self._symbols.symbol_names
+        for (count, columns) in self._groups:
+            if len(columns) == 0:
+                yield from (() for _ in range(count))
+            else:
+                yield from zip(*(map(names.__getitem__, column) for column in columns))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return tuple(self)[i]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError('ColumnarFacts index out of range')
+        names = self._symbols.symbol_names
+        for (count, columns) in self._groups:
+            if i < count:
+                return tuple(names[column[i]] for column in columns)
+            i -= count
+        raise AssertionError('unreachable')
+
+    def __repr__(self) -> str:
+        return 'ColumnarFacts({0!r})'.format(list(self))
+
+
+class ColumnarAnswerSet(Mapping[str, Sequence[Tuple[str, ...]]]):
+    '''A compact raw answer set that stores the facts of every predicate column-wise (see `ColumnarFacts`).
+
+    Instead of one tuple per fact and one reference per argument, only a single integer id is stored per argument.
+    '''
+
+    def __init__(self, answer_set: asp.RawAnswerSet, symbols: SymbolTable) -> None:
+        self._facts = {
+            symbols.symbol(pred): ColumnarFacts(facts, symbols)
+            for (pred, facts) in answer_set.items()
+        }  # type: Mapping[str, ColumnarFacts]
+
+    @classmethod
+    def from_columns(cls, facts: Mapping[str, ColumnarFacts]) -> 'ColumnarAnswerSet':
+        '''Create an answer set from facts that are already stored column-wise, without copying them.'''
+        answer_set = cls.__new__(cls)
+        answer_set._facts = facts
+        return answer_set
+
+    def __getitem__(self, pred: str) -> Sequence[Tuple[str, ...]]:
+        return self._facts[pred]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._facts)
+
+    def __len__(self) -> int:
+        return len(self._facts)
+
+    def __contains__(self, pred: object) -> bool:
+        return pred in self._facts
+
+    def __repr__(self) -> str:
+        return 'ColumnarAnswerSet({0!r})'.format({pred: list(facts) for (pred, facts) in self._facts.items()})
+
+
+def parse_answer_set(line: RawLine,
+                     *,
+                     lazy: bool = False,
+                     compact: bool = False,
+                     symbols: Optional[SymbolTable] = None,
+                     encoding: str = 'UTF-8') -> asp.RawAnswerSet:
+    '''Parse the answer set from a single line of dlvhex2's output.
+
+    The line may be passed as `bytes`, in which case the constants are decoded using the given encoding (only when they are actually needed).
+
+    If `lazy` is `True`, the facts of each predicate are only decoded when the predicate is first accessed (see `LazyAnswerSet`).
+    If `compact` is `True`, the answer set is stored in a columnar representation (see `ColumnarAnswerSet`), and `lazy` is ignored.
+    If a symbol table is given, the decoded constants (and recently used argument tuples) are interned in that table.
+
+    Raises a SolverError if the line does not contain a valid answer set.
+    '''
+    if compact and symbols is None:
+        symbols = SymbolTable()
+    try:
+        index = _index_answer_set(line, symbols)
+    except _UnsupportedLine:
+        pass
+    else:
+        if compact:
+            assert symbols is not None
+            # The columns are built from the raw arguments, without decoding the facts to tuples first
+            # (also, the tuples are not interned in the symbol table, or it would keep every tuple alive)
+            return ColumnarAnswerSet.from_columns({pred: ColumnarFacts.from_spans(line, spans, symbols, encoding) for (pred, spans) in index.items()})
+        if lazy:
+            return LazyAnswerSet(line, index, symbols, encoding)
+        return {pred: _decode_facts(line, spans, symbols, encoding) for (pred, spans) in index.items()}
+    # Fall back to the (much slower) pyparsing grammar for anything unusual
+    from .grammar import ParseException
+    from .parser import parse_answer_set as parse_answer_set_with_pyparsing
+    if isinstance(line, bytes):
+        line = line.decode(encoding)
+    try:
+        answer_set = parse_answer_set_with_pyparsing(line)
+    except ParseException:
+        e = SolverError('Unable to parse answer set received from solver')
+        e.line = line  # type: ignore
+        raise e
+    if compact:
+        assert symbols is not None
+        return ColumnarAnswerSet(answer_set, symbols)
+    # Return the same types as the scanner, i.e., tuples of argument tuples
+    if symbols is not None:
+        return symbols.intern_answer_set(answer_set)
+    return {pred: tuple(facts) for (pred, facts) in answer_set.items()}
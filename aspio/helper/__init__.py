@@ -1,5 +1,10 @@
 from .caching_iterable import CachingIterable
 from .filesystem_ipc import FilesystemIPC, TemporaryNamedPipe, TemporaryFile
+from .input_writer import InputWriter
+from .line_reader import read_lines
+from .ordered_map import ordered_map
+from .process_pool import start_process_pool
+from .predicate_scan import scan_predicate_names, scan_file_predicate_names
 from .stream_capture_thread import StreamCaptureThread
 
 __all__ = [
@@ -9,5 +14,16 @@ __all__ = [
     'TemporaryFile',
     'TemporaryNamedPipe',
     #
+    'InputWriter',
+    #
+    'read_lines',
+    #
+    'ordered_map',
+    #
+    'start_process_pool',
+    #
+    'scan_predicate_names',
+    'scan_file_predicate_names',
+    #
     'StreamCaptureThread',
 ]
@@ -0,0 +1,138 @@
+import os
+import queue
+from threading import Event, Thread
+from typing import Callable, IO, List, Optional  # noqa
+
+__all__ = ['InputWriter']
+
+
+_END = None  # marks the end of the input in the queue
+
+
+class _QueueStream:
+    '''A minimal writable text stream that passes its data to an `InputWriter` in chunks.'''
+
+    def __init__(self, writer: 'InputWriter') -> None:
+        self._writer = writer
+        self._parts = []  # type: List[str]
+        self._size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        self._parts.append(s)
+        self._size += len(s)
+        if self._size >= self._writer.chunk_size:
+            self.flush()
+        return len(s)
+
+    def flush(self) -> None:
+        if self._size > 0:
+            self._writer._put(''.join(self._parts))
+            self._parts.clear()
+            self._size = 0
+
+
+class InputWriter:
+    '''Writes the input for a solver process to a named pipe in the background.
+
+    The `write_input` function runs in a producer thread, and writes to a bounded queue of text chunks.
+    This way, the input mapping can already proceed while the solver process starts up.
+    A second thread opens the named pipe (which blocks until the solver opens it for reading), and copies the chunks to the pipe.
+
+    Any exception raised by `write_input` or while writing to the pipe is stored in the `error` attribute
+    (before the pipe is closed, so the solver cannot produce output based on incomplete input before the error is visible).
+    Call `check` to re-raise it.
+    '''
+
+    def __init__(self, filename: str, encoding: str, write_input: Callable[[IO[str]], None], *, max_chunks: int = 16, chunk_size: int = 1 << 16) -> None:
+        self.filename = filename
+        self.encoding = encoding
+        self.write_input = write_input
+        self.chunk_size = chunk_size
+        self.error = None  # type: Optional[BaseException]
+        self._queue = queue.Queue(maxsize=max_chunks)  # type: queue.Queue
+        self._cancelled = Event()
+        self._producer = Thread(target=self._produce, name='aspio input mapping', daemon=True)
+        self._writer = Thread(target=self._write, name='aspio input writer', daemon=True)
+
+    def start(self) -> None:
+        self._producer.start()
+        self._writer.start()
+
+    def _set_error(self, error: BaseException) -> None:
+        if self.error is None:
+            self.error = error
+
+    def _put(self, chunk: Optional[str]) -> None:
+        '''Add a chunk to the queue, waiting while the queue is full. Raises an exception if writing has been cancelled.'''
+        while True:
+            if self._cancelled.is_set():
+                raise RuntimeError('Writing the solver input has been cancelled')
+            try:
+                self._queue.put(chunk, timeout=0.05)
+                return
+            except queue.Full:
+                pass
+
+    def _produce(self) -> None:
+        stream = _QueueStream(self)
+        try:
+            self.write_input(stream)  # type: ignore
+            stream.flush()
+        except BaseException as e:
+            if not self._cancelled.is_set():
+                self._set_error(e)
+        finally:
+            try:
+                self._put(_END)
+            except RuntimeError:
+                pass
+
+    def _write(self) -> None:
+        try:
+            with open(self.filename, 'wt', encoding=self.encoding) as pipe:
+                while not self._cancelled.is_set():
+                    chunk = self._queue.get()
+                    if chunk is _END:
+                        break
+                    pipe.write(chunk)
+        except BaseException as e:
+            if not self._cancelled.is_set():
+                self._set_error(e)
+            # Stop the producer (there is nobody to consume its output)
+            self._cancelled.set()
+
+    def check(self) -> None:
+        '''Raise the exception that occurred while writing the input, if any.'''
+        if self.error is not None:
+            error = self.error
+            self.error = None  # make sure we only raise an error once
+            raise error
+
+    def join(self) -> None:
+        self._producer.join()
+        self._writer.join()
+
+    def close(self) -> None:
+        '''Stop writing (if the input has not been written completely yet) and wait for the threads to exit.
+
+        Must be called before the named pipe is removed.
+        '''
+        self._cancelled.set()
+        # Wake up the writer if it is waiting for the next chunk
+        try:
+            self._queue.put_nowait(_END)
+        except queue.Full:
+            pass
+        while self._writer.is_alive():
+            # The writer might be blocked while opening the named pipe, if the solver never opened it for reading.
+            # Opening the read end in non-blocking mode unblocks it (its next write will fail with a BrokenPipeError, which is ignored after cancellation).
+            try:
+                fd = os.open(self.filename, os.O_RDONLY | os.O_NONBLOCK)
+                os.close(fd)
+            except OSError:
+                pass
+            self._writer.join(timeout=0.01)
+        self._producer.join()
@@ -0,0 +1,41 @@
+from typing import BinaryIO, Iterator
+
+__all__ = ['read_lines']
+
+
+def read_lines(stream: BinaryIO, *, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    '''Iterate over the lines of the given binary stream, without the line terminators.
+
+    Data is read into a reusable buffer in chunks of (up to) `chunk_size` bytes.
+    Each read returns as soon as *some* data is available, so this is safe to use with a process that waits for input after writing a line.
+    The buffer grows as needed to hold the longest line.
+    '''
+    buf = bytearray(chunk_size)
+    start = 0   # start of the current line
+    search = 0  # no line terminator before this position (after `start`)
+    end = 0     # end of the data in the buffer
+    while True:
+        nl = buf.find(b'\n', search, end)
+        if nl >= 0:
+            with memoryview(buf) as view:
+                line = view[start:nl].tobytes()
+            yield line
+            start = search = nl + 1
+            continue
+        # No complete line in the buffer, we need to read more data
+        if start > 0:
+            # Move the incomplete line to the front of the buffer
+            buf[:end - start] = buf[start:end]
+            end -= start
+            start = 0
+        if end == len(buf):
+            buf.extend(bytes(len(buf)))
+        search = end
+        with memoryview(buf) as view:
+            n = stream.readinto1(view[end:])  # type: ignore
+        if not n:
+            # End of stream
+            if end > start:
+                yield bytes(buf[start:end])
+            return
+        end += n
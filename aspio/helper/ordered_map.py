@@ -0,0 +1,35 @@
+from collections import deque
+from typing import Callable, Iterable, Iterator, TypeVar, TYPE_CHECKING  # noqa
+if TYPE_CHECKING:
+    # Not imported at runtime to keep `import aspio` fast
+    from concurrent.futures import Executor, Future  # noqa
+    # typing.Deque is only available since Python 3.5.4/3.6.1
+    from typing import Deque  # noqa
+
+__all__ = ['ordered_map']
+
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def ordered_map(executor: 'Executor', fn: Callable[[T], R], iterable: Iterable[T], *, window: int) -> Iterator[R]:
+    '''Apply `fn` to every element of `iterable` using the given executor, and yield the results in order.
+
+    Unlike `Executor.map`, the iterable is consumed lazily:
+    at most `window` elements are submitted to the executor ahead of the element that is currently being yielded.
+    Exceptions raised by `fn` are re-raised when the corresponding result would have been yielded.
+    '''
+    assert window > 0
+    pending = deque()  # type: Deque[Future]
+    try:
+        for x in iterable:
+            pending.append(executor.submit(fn, x))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while len(pending) > 0:
+            yield pending.popleft().result()
+    finally:
+        # Only relevant if the consumer stops early or an exception occurs
+        for f in pending:
+            f.cancel()
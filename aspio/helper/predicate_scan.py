@@ -0,0 +1,73 @@
+import codecs
+import mmap
+import os
+import re
+from collections import OrderedDict
+from threading import Lock
+from typing import FrozenSet, Tuple  # noqa
+
+__all__ = [
+    'scan_predicate_names',
+    'scan_file_predicate_names',
+]
+
+# Matches quoted strings and comments (which are skipped), and identifiers and directives (captured).
+# Identifiers starting with an upper-case letter or underscore are variables and filtered out afterwards;
+# they must be matched here anyway, so that e.g. the `bc` in `Abc` is not mistaken for a name.
+# Of the directives (and aggregate functions), only `#include` is kept.
+_token_re = re.compile(r'"(?:[^"\\]|\\.)*"|%[^\n]*|(#?[A-Za-z_][A-Za-z0-9_]*)', re.DOTALL)
+_token_bytes_re = re.compile(_token_re.pattern.encode('ascii'), re.DOTALL)
+
+# (filename, encoding) => ((modification time, size), names), in order of their last use
+_file_cache = OrderedDict()  # type: OrderedDict[Tuple[str, str], Tuple[Tuple[int, int], FrozenSet[str]]]
+_file_cache_lock = Lock()
+# The maximum number of files whose names are remembered (the least recently used ones are dropped first)
+_file_cache_size = 256
+
+# Encodings that encode the characters matched by `_token_re` as single ASCII bytes, and never use such bytes for other characters
+_ascii_safe_encodings = frozenset(['utf-8', 'ascii', 'iso8859-1', 'iso8859-15', 'cp1252'])
+
+
+def scan_predicate_names(code: str) -> FrozenSet[str]:
+    '''Return the names of all constants and predicates that occur in the given ASP code (outside of comments and quoted strings).
+
+    This is a purely lexical scan, so the result may contain additional names (e.g., of constants, aggregate functions, or external atoms),
+    but it contains the name of every predicate used by the program.
+    Included files are not scanned; instead, the result contains '#include' if the code contains an include directive.
+    '''
+    return frozenset(name for name in _token_re.findall(code) if name[:1].islower() or name == '#include')
+
+
+def scan_file_predicate_names(filename: str, encoding: str = 'UTF-8') -> FrozenSet[str]:
+    '''Same as `scan_predicate_names`, but for the ASP code in the given file.
+
+    Files in UTF-8 (or another encoding in which ASP tokens and other characters never share bytes) are memory-mapped instead of decoded,
+    files in other encodings are decoded completely.
+    The result is cached until the file's modification time or size changes (for a limited number of files).
+    Raises `OSError` if the file cannot be read.
+    '''
+    st = os.stat(filename)
+    version = (st.st_mtime_ns, st.st_size)
+    key = (filename, encoding)
+    with _file_cache_lock:
+        entry = _file_cache.get(key)
+        if entry is not None:
+            _file_cache.move_to_end(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    if codecs.lookup(encoding).name not in _ascii_safe_encodings:
+        with open(filename, 'r', encoding=encoding) as text_file:
+            names = scan_predicate_names(text_file.read())
+    else:
+        with open(filename, 'rb') as file:
+            if st.st_size == 0:
+                names = frozenset()
+            else:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    names = frozenset(name.decode('ascii') for name in set(_token_bytes_re.findall(data)) if name[:1].islower() or name == b'#include')
+    with _file_cache_lock:
+        _file_cache[key] = (version, names)
+        _file_cache.move_to_end(key)
+        if len(_file_cache) > _file_cache_size:
+            _file_cache.popitem(last=False)
+    return names
@@ -0,0 +1,78 @@
+import sys
+from typing import Any, Callable, Optional, Sequence, TYPE_CHECKING  # noqa
+if TYPE_CHECKING:
+    # Not imported at runtime to keep `import aspio` fast
+    from concurrent.futures import ProcessPoolExecutor  # noqa
+
+__all__ = ['start_process_pool']
+
+# The barrier shared by the worker processes of a pool while it is started (see `start_process_pool`)
+_startup_barrier = None  # type: Any
+# Before Python 3.7, the barrier and the initializer are passed to the (forked) worker processes by setting this variable before they are started
+_inherited_startup = None  # type: Any
+
+
+def _init_worker(barrier: Any, initializer: Optional[Callable[..., None]], initargs: Sequence[Any]) -> None:
+    global _startup_barrier
+    _startup_barrier = barrier
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _wait_for_other_workers() -> None:
+    _startup_barrier.wait()
+
+
+def _init_inherited_worker() -> None:
+    _init_worker(*_inherited_startup)
+    _wait_for_other_workers()
+
+
+def start_process_pool(max_workers: int, **kwargs: Any) -> 'ProcessPoolExecutor':
+    '''Create a `ProcessPoolExecutor` and wait until all of its worker processes have been started.
+
+    With the default 'fork' start method, the worker processes are copies of the current process at the time they are started,
+    which is only safe as long as no other threads are running (e.g., a thread writing the input of the solver, which may hold locks or open file descriptors).
+    `ProcessPoolExecutor` starts its workers when tasks are submitted (since Python 3.9, only as many as there are no idle workers for),
+    so this function submits one task per worker, and the tasks block until every worker has started one of them.
+    Further keyword arguments are passed to the `ProcessPoolExecutor` constructor (before Python 3.7, only `initializer` and `initargs` are supported,
+    and only with the 'fork' start method).
+    '''
+    if sys.version_info < (3, 7):
+        return _start_forked_process_pool(max_workers, **kwargs)
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    barrier = (kwargs.get('mp_context') or multiprocessing).Barrier(max_workers)
+    initializer = kwargs.pop('initializer', None)
+    initargs = kwargs.pop('initargs', ())
+    executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(barrier, initializer, initargs), **kwargs)
+    return _wait_for_workers(executor, max_workers, _wait_for_other_workers)
+
+
+def _start_forked_process_pool(max_workers: int, *, initializer: Optional[Callable[..., None]] = None, initargs: Sequence[Any] = ()) -> 'ProcessPoolExecutor':
+    '''Variant of `start_process_pool` for Python versions before 3.7, where `ProcessPoolExecutor` supports neither an initializer nor a custom start method.
+
+    The barrier and the initializer are inherited by the worker processes, so this only works with the 'fork' start method.
+    '''
+    global _inherited_startup
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    if multiprocessing.get_start_method() != 'fork':
+        raise RuntimeError('Worker processes require Python 3.7 or the \'fork\' start method')
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    _inherited_startup = (multiprocessing.Barrier(max_workers), initializer, initargs)
+    try:
+        return _wait_for_workers(executor, max_workers, _init_inherited_worker)
+    finally:
+        _inherited_startup = None
+
+
+def _wait_for_workers(executor: 'ProcessPoolExecutor', max_workers: int, startup: Callable[[], None]) -> 'ProcessPoolExecutor':
+    '''Submit one startup task per worker and wait until all of them have finished.'''
+    try:
+        for future in [executor.submit(startup) for _ in range(max_workers)]:
+            future.result()
+    except BaseException:
+        executor.shutdown(wait=False)
+        raise
+    return executor
@@ -1,12 +1,16 @@
 import collections
 import collections.abc  # type: ignore (mypy does not know about collections.abc)
+import keyword
 from abc import ABCMeta, abstractmethod
-from typing import Iterable, Any, Union, Dict, Iterator, MutableSet, Sequence, AbstractSet
+from typing import Iterable, Any, Callable, Union, Dict, Iterator, List, MutableMapping, MutableSet, Optional, Sequence, AbstractSet, Tuple  # noqa
 from . import parser
 from .errors import RedefinedNameError, UndefinedNameError
 
 Context = Dict['Variable', Any]
 
+# Performs the input mapping of a single predicate, see `Predicate.compile`
+CompiledMapping = Callable[[Sequence[Any], 'FactAccumulator'], None]
+
 
 # Maybe have perform_mapping return a Generator (with "yield Fact(pred, args)" or some such) instead of using FactAccumulator instances.
 class FactAccumulator(metaclass=ABCMeta):
@@ -14,6 +18,115 @@ class FactAccumulator(metaclass=ABCMeta):
     def add_fact(self, predicate: str, args: Sequence[Any]) -> None:
         pass
 
+    def add_facts(self, predicate: str, columns: Sequence[Sequence[Any]]) -> None:
+        '''Add one fact for each row of the given columns (i.e., the i-th fact has the arguments `columns[0][i]`, `columns[1][i]`, ...).
+
+        All columns have the same length. Override this method to process columnar input more efficiently.
+        '''
+        for args in zip(*columns):
+            self.add_fact(predicate, args)
+
+
+class DiscardingAccumulator(FactAccumulator):
+    '''Ignores all facts.'''
+
+    def add_fact(self, predicate: str, args: Sequence[Any]) -> None:
+        pass
+
+    def add_facts(self, predicate: str, columns: Sequence[Sequence[Any]]) -> None:
+        pass
+
+
+class _AccumulatorError(Exception):
+    '''Raised by compiled input mappings to pass on an exception raised by the accumulator, see `Predicate.compile`.'''
+
+    def __init__(self, error: Exception) -> None:
+        super().__init__(error)
+        self.error = error
+
+
+def _accumulator_call_source(indent: str, call: str) -> List[str]:
+    '''Generate the lines of a compiled input mapping that call the accumulator, marking its exceptions with `_AccumulatorError`.'''
+    return [
+        indent + 'try:',
+        indent + '    ' + call,
+        indent + 'except Exception as e:',
+        indent + '    raise AccumulatorError(e)',
+    ]
+
+
+class Columns(collections.abc.Set):
+    '''A set of rows (tuples) that is stored column-wise, e.g. as lists or NumPy arrays of equal length.
+
+    When used as input argument, it behaves like a set of tuples.
+    However, a predicate of the form `p(a, b) for (a, b) in columns` (i.e., a single iteration whose arguments are taken directly from the tuple)
+    is mapped in bulk, by passing the columns to `FactAccumulator.add_facts` instead of generating one fact per row.
+    Note that duplicate rows are not removed (which does not matter for the ASP solver).
+    '''
+
+    def __init__(self, *columns: Sequence[Any]) -> None:
+        if len(columns) == 0:
+            raise ValueError('At least one column is required')
+        self.columns = columns
+        self.width = len(columns)
+        self._length = len(columns[0])
+        if any(len(column) != self._length for column in columns):
+            raise ValueError('All columns must have the same length')
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Tuple[Any, ...]]:
+        return zip(*self.columns)
+
+    def __contains__(self, row: object) -> bool:
+        return any(row == r for r in self)
+
+    def __repr__(self) -> str:
+        return 'Columns({0})'.format(', '.join(map(repr, self.columns)))
+
+
+def _iterate_set(collection: Any) -> Iterator[Any]:
+    return iter(collection)
+
+
+def _iterate_sequence(collection: Any) -> Iterator[Any]:
+    return enumerate(collection)  # yields (index, element) tuples
+
+
+def _iterate_mapping(collection: Any) -> Iterator[Any]:
+    return iter(collection.items())  # yields (key, element) tuples
+
+
+# Caches the result of `collection_iterator_for` by type, so the (comparatively slow) isinstance checks against the ABCs are only performed once per type
+_collection_iterators = {}  # type: MutableMapping[type, Optional[Callable[[Any], Iterator[Any]]]]
+
+
+def collection_iterator_for(collection_type: type) -> Optional[Callable[[Any], Iterator[Any]]]:
+    '''Return the function that creates an iterator over the elements of collections of the given type (as used in the FOR clause), or None if the type is not supported.'''
+    try:
+        return _collection_iterators[collection_type]
+    except KeyError:
+        pass
+    if issubclass(collection_type, collections.abc.Set):  # type: ignore (mypy does not know about collections.abc)
+        make_iterator = _iterate_set  # type: Optional[Callable[[Any], Iterator[Any]]]
+    elif issubclass(collection_type, collections.abc.Sequence):  # type: ignore (mypy does not know about collections.abc)
+        make_iterator = _iterate_sequence
+    elif issubclass(collection_type, collections.abc.Mapping):  # type: ignore (mypy does not know about collections.abc)
+        make_iterator = _iterate_mapping
+    else:
+        make_iterator = None
+    _collection_iterators[collection_type] = make_iterator
+    return make_iterator
+
+
+def _iterate_collection(collection: Any) -> Iterator[Any]:
+    '''Used by compiled input mappings. Error handling is left to the interpreted mapping, see `Predicate.compile`.'''
+    make_iterator = _collection_iterators.get(type(collection)) or collection_iterator_for(type(collection))
+    if make_iterator is None:
+        raise TypeError('unsupported collection type')
+    return make_iterator(collection)
+
 
 class AssignmentTarget(metaclass=ABCMeta):
     @abstractmethod
@@ -24,6 +137,11 @@ class AssignmentTarget(metaclass=ABCMeta):
     def assign(self, value: Any, context: Context) -> None:
         pass
 
+    @abstractmethod
+    def target_source(self, names: Dict['Variable', str]) -> str:
+        '''Return Python source code for an assignment target equivalent to this one. Variables are named according to `names`, which is updated with the newly bound variables.'''
+        pass
+
 
 class AnonymousVariable(AssignmentTarget):
     def check_and_update_variable_bindings(self, bound_variables: MutableSet['Variable']) -> None:
@@ -32,6 +150,9 @@ class AnonymousVariable(AssignmentTarget):
     def assign(self, value: Any, context: Context) -> None:
         pass
 
+    def target_source(self, names: Dict['Variable', str]) -> str:
+        return '_'
+
     def __repr__(self):
         return 'AnonymousVariable()'
 
@@ -52,6 +173,11 @@ class Variable(AssignmentTarget):
             raise RedefinedNameError('Variable {0!s} is defined twice'.format(self))
         bound_variables.add(self)
 
+    def target_source(self, names: Dict['Variable', str]) -> str:
+        assert self not in names
+        names[self] = 'v' + str(len(names))
+        return names[self]
+
     def __repr__(self):
         return 'Variable({0!r})'.format(self._name)
 
@@ -82,6 +208,9 @@ class TupleMatch(AssignmentTarget):
         for t in self._targets:
             t.check_and_update_variable_bindings(bound_variables)
 
+    def target_source(self, names: Dict[Variable, str]) -> str:
+        return '(' + ''.join(t.target_source(names) + ', ' for t in self._targets) + ')'
+
     def __repr__(self):
         return 'TupleMatch([{0}])'.format(','.join(repr(t) for t in self._targets))
 
@@ -100,6 +229,12 @@ class Attribute:
             # Raise a ValueError, since this situation occurs when the user passes wrong input arguments to the program
             raise ValueError('Unable to access attribute {0!r} on object {1!r} during INPUT mapping'.format(self._name, obj))
 
+    def access_source(self, obj_source: str, constants: List[Any]) -> str:
+        if self._name.isidentifier() and not keyword.iskeyword(self._name):
+            return obj_source + '.' + self._name
+        else:
+            return 'getattr({0}, {1!r})'.format(obj_source, self._name)
+
     def __str__(self) -> str:
         return '.' + str(self._name)
 
@@ -115,6 +250,13 @@ class Subscript:
             # Raise a ValueError, since this situation occurs when the user passes wrong input arguments to the program
             raise ValueError('Unable to access subscript [{0!r}] on object {1!r} during INPUT mapping'.format(self._key, obj))
 
+    def access_source(self, obj_source: str, constants: List[Any]) -> str:
+        if type(self._key) in (int, str):
+            return '{0}[{1!r}]'.format(obj_source, self._key)
+        else:
+            constants.append(self._key)
+            return '{0}[c{1}]'.format(obj_source, len(constants) - 1)
+
     def __str__(self) -> str:
         return '[{0!r}]'.format(self._key)
 
@@ -138,6 +280,13 @@ class Accessor:
             result = attr.access(result)
         return result
 
+    def access_source(self, names: Dict[Variable, str], constants: List[Any]) -> str:
+        '''Return a Python expression equivalent to this accessor (but without the error handling). Subscript keys that cannot be written as literals are appended to `constants`.'''
+        source = names[self._variable]
+        for attr in self._path:
+            source = attr.access_source(source, constants)
+        return source
+
 
 class Iteration:
     def __init__(self, target: AssignmentTarget, accessor: Accessor) -> None:
@@ -150,12 +299,9 @@ class Iteration:
 
     def get_collection_iterator(self, context: Context) -> Iterator[Any]:
         collection = self._accessor.perform_access(context)
-        if isinstance(collection, collections.abc.Set):  # type: ignore (mypy does not know about collections.abc)
-            return iter(collection)
-        elif isinstance(collection, collections.abc.Sequence):  # type: ignore (mypy does not know about collections.abc)
-            return enumerate(collection)  # yields (index, element) tuples
-        elif isinstance(collection, collections.abc.Mapping):  # type: ignore (mypy does not know about collections.abc)
-            return iter(collection.items())  # yields (key, element) tuples
+        make_iterator = collection_iterator_for(type(collection))
+        if make_iterator is not None:
+            return make_iterator(collection)
         else:
             raise ValueError(
                 'During iteration {0!r}: '
@@ -166,6 +312,31 @@ class Iteration:
     def assign_to_target(self, value: Any, context: Context) -> None:
         self._target.assign(value, context)
 
+    def loop_source(self, names: Dict[Variable, str], constants: List[Any], collection_source: Optional[str] = None) -> str:
+        '''Return the header of a Python for-loop equivalent to this iteration (iterating over `collection_source`, if given).'''
+        if collection_source is None:
+            collection_source = self._accessor.access_source(names, constants)  # before the target, which binds new names
+        return 'for {0} in iterate({1}):'.format(self._target.target_source(names), collection_source)
+
+    def column_positions(self, arguments: Sequence[Accessor]) -> Optional[Tuple[int, ...]]:
+        '''If every argument is a plain variable bound by a tuple target of this iteration, return the positions of the arguments in the tuple. Otherwise, return None.'''
+        if not isinstance(self._target, TupleMatch) or len(arguments) == 0:
+            return None
+        targets = self._target._targets
+        if not all(isinstance(t, (Variable, AnonymousVariable)) for t in targets):
+            return None
+        positions = []  # type: List[int]
+        for arg in arguments:
+            if len(arg._path) > 0 or arg._variable not in targets:
+                return None
+            positions.append(targets.index(arg._variable))
+        return tuple(positions)
+
+    @property
+    def width(self) -> int:
+        assert isinstance(self._target, TupleMatch)
+        return len(self._target._targets)
+
     def __str__(self) -> str:
         return 'FOR {0!s} IN {1!s}'.format(self._target, self._accessor)
 
@@ -182,6 +353,16 @@ class Predicate:
         self._arguments = tuple(arguments)
         self._iterations = tuple(iterations)
 
+    @property
+    def predicate(self) -> str:
+        return self._predicate
+
+    def dependencies(self, parameters: Sequence[Variable]) -> Tuple[int, ...]:
+        '''Return the (sorted) positions of the parameters that this mapping accesses, i.e., the input arguments the generated facts depend on.'''
+        accessors = [it._accessor for it in self._iterations] + list(self._arguments)
+        used = set(acc._variable for acc in accessors)
+        return tuple(i for (i, p) in enumerate(parameters) if p in used)
+
     def check_variable_bindings(self, input_variables: Iterable[Variable]) -> None:
         bound_variables = set(input_variables)
         for it in self._iterations:
@@ -220,6 +401,68 @@ class Predicate:
                 it = self._iterations[len(iter_stack)]
                 iter_stack.append(it.get_collection_iterator(context))
 
+    def compile(self, parameters: Sequence[Variable]) -> CompiledMapping:
+        '''Generate a specialized Python function that performs the same mapping as `perform_mapping`, but with nested for-loops instead of the interpreted iteration stack.
+
+        The function is called with the sequence of input arguments (corresponding to `parameters`) and an accumulator.
+        The fast path does not perform any error handling.
+        Instead, if accessing or iterating the input objects raises an exception,
+        the mapping is repeated by `perform_mapping` (discarding the facts) to raise the usual error.
+        Exceptions raised by the accumulator are passed on immediately.
+        '''
+        names = {}  # type: Dict[Variable, str]
+        constants = []  # type: List[Any]
+        lines = ['def fast_mapping(arguments, accumulator):']
+        indent = '    '
+        lines.append(indent + 'add_fact = accumulator.add_fact')
+        if len(parameters) > 0:
+            lines.append(indent + ''.join(p.target_source(names) + ', ' for p in parameters) + '= arguments')
+        column_positions = self._iterations[0].column_positions(self._arguments) if len(self._iterations) == 1 else None
+        if column_positions is not None:
+            # Bulk mapping of columnar input (see `Columns`)
+            it = self._iterations[0]
+            lines.append(indent + 'collection = ' + it._accessor.access_source(names, constants))
+            lines.append(indent + 'if type(collection) is Columns and collection.width == {0}:'.format(it.width))
+            lines.append(indent + '    columns = ({0})'.format(''.join('collection.columns[{0}], '.format(i) for i in column_positions)))
+            lines.extend(_accumulator_call_source(indent + '    ', 'accumulator.add_facts(predicate, columns)'))
+            lines.append(indent + '    return')
+            lines.append(indent + it.loop_source(names, constants, 'collection'))
+            indent += '    '
+        else:
+            for it in self._iterations:
+                lines.append(indent + it.loop_source(names, constants))
+                indent += '    '
+        args_source = ''.join(arg.access_source(names, constants) + ', ' for arg in self._arguments)
+        lines.append(indent + 'args = ({0})'.format(args_source))
+        lines.extend(_accumulator_call_source(indent, 'add_fact(predicate, args)'))
+        namespace = {
+            'iterate': _iterate_collection,
+            'predicate': self._predicate,
+            'Columns': Columns,
+            'AccumulatorError': _AccumulatorError,
+        }  # type: Dict[str, Any]
+        namespace.update(('c' + str(n), c) for (n, c) in enumerate(constants))
+        exec(compile('\n'.join(lines), '<INPUT mapping for predicate {0}>'.format(self._predicate), 'exec'), namespace)
+        fast_mapping = namespace['fast_mapping']
+
+        def perform_compiled_mapping(arguments: Sequence[Any], accumulator: FactAccumulator) -> None:
+            try:
+                fast_mapping(arguments, accumulator)
+                return
+            except _AccumulatorError as e:
+                # E.g., the input writer has been cancelled, so there is no point in repeating the mapping
+                error = e.error
+                repeat = False
+            except Exception as e:
+                error = e
+                repeat = True
+            if repeat:
+                # Raises the same exception as the interpreted mapping would have raised
+                self.perform_mapping(dict(zip(parameters, arguments)), DiscardingAccumulator())
+            # If that did not raise, the exception came from somewhere else
+            raise error
+        return perform_compiled_mapping
+
 
 class InputSpec:
     def __init__(self, parameters: Sequence[Variable], predicates: Iterable[Predicate]) -> None:
@@ -236,6 +479,27 @@ class InputSpec:
         # Check for name errors in accessor and iteration definitions (two kinds of errors: either using an undefined variable name, or redefining a variable name)
         for pred in self._predicates:
             pred.check_variable_bindings(self._parameters)
+        # Specialized functions generated by `compile`
+        self._compiled = None  # type: Optional[Tuple[CompiledMapping, ...]]
+
+    def __getstate__(self):
+        # Generated code cannot be pickled (it is regenerated on demand)
+        state = self.__dict__.copy()
+        state['_compiled'] = None
+        return state
+
+    def compile(self) -> 'InputSpec':
+        '''Generate specialized Python functions for the mapping of each predicate (see `Predicate.compile`), which are then used by `perform_mapping`.
+
+        This is done automatically by the first call to `perform_mapping`.
+        '''
+        self._compiled_mappings()
+        return self
+
+    def _compiled_mappings(self) -> Tuple[CompiledMapping, ...]:
+        if self._compiled is None:
+            self._compiled = tuple(pred.compile(self._parameters) for pred in self._predicates)
+        return self._compiled
 
     @staticmethod
     def empty() -> 'InputSpec':
@@ -245,12 +509,39 @@ class InputSpec:
     def parse(string: str) -> 'InputSpec':
         return parser.parse_input_spec(string)
 
-    def perform_mapping(self, arguments: Sequence[Any], accumulator: FactAccumulator) -> None:
+    def perform_mapping(self, arguments: Sequence[Any], accumulator: FactAccumulator, *, predicates: Optional[AbstractSet[str]] = None) -> None:
         '''Perform the input mapping.
 
         Transforms the arguments to an ASP representation according to the InputSpec,
         and passes the results to the given accumulator (see FactAccumulator class).
+        If a set of `predicates` is given, only the facts of predicates with these names are generated.
         '''
+        if len(arguments) != len(self._parameters):
+            raise ValueError('Wrong number of arguments: expecting {0}, got {1}'.format(len(self._parameters), len(arguments)))
+        for (pred, perform_compiled_mapping) in zip(self._predicates, self._compiled_mappings()):
+            if predicates is None or pred.predicate in predicates:
+                perform_compiled_mapping(arguments, accumulator)
+
+    @property
+    def parameters(self) -> Tuple[Variable, ...]:
+        return self._parameters
+
+    @property
+    def predicates(self) -> Tuple[Predicate, ...]:
+        return self._predicates
+
+    def dependencies(self, index: int) -> Tuple[int, ...]:
+        '''Return the positions of the input arguments that the facts of the predicate mapping at the given index depend on.'''
+        return self._predicates[index].dependencies(self._parameters)
+
+    def perform_predicate_mapping(self, index: int, arguments: Sequence[Any], accumulator: FactAccumulator) -> None:
+        '''Perform only the mapping of the predicate at the given index (see `predicates`).'''
+        if len(arguments) != len(self._parameters):
+            raise ValueError('Wrong number of arguments: expecting {0}, got {1}'.format(len(self._parameters), len(arguments)))
+        self._compiled_mappings()[index](arguments, accumulator)
+
+    def perform_interpreted_mapping(self, arguments: Sequence[Any], accumulator: FactAccumulator) -> None:
+        '''Same as `perform_mapping`, but without generating specialized code.'''
         if len(arguments) != len(self._parameters):
             raise ValueError('Wrong number of arguments: expecting {0}, got {1}'.format(len(self._parameters), len(arguments)))
         for pred in self._predicates:
@@ -0,0 +1,149 @@
+from collections.abc import Mapping, Sequence, Set
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple  # noqa
+
+__all__ = [
+    'LazyDictionary',
+    'LazySequence',
+    'LazySet',
+]
+
+# The captured values of one element of an output collection
+CapturedValues = Tuple[str, ...]
+ElementFactory = Callable[[CapturedValues], Any]
+
+_not_constructed = object()  # sentinel value for elements that have not been constructed yet
+
+
+class LazySet(Set):
+    '''A set whose elements are only constructed (from the captured tuples of an answer set) when they are accessed.
+
+    Iterating constructs the elements one by one.
+    Membership tests, hashing, and comparisons construct all remaining elements, since different tuples may result in equal elements.
+    The same holds for `len`, unless the elements are known to be distinct for distinct captured tuples (`injective`, e.g. for tuples of the captured values);
+    then the size is determined from the captured tuples alone.
+    '''
+
+    def __init__(self, captured: List[CapturedValues], make_element: ElementFactory, *, injective: bool = False) -> None:
+        self._captured = captured
+        self._make_element = make_element
+        self._injective = injective
+        self._elements = [_not_constructed] * len(captured)  # type: List[Any]
+        self._set = None  # type: Optional[frozenset]
+
+    def _element(self, i: int) -> Any:
+        x = self._elements[i]
+        if x is _not_constructed:
+            x = self._elements[i] = self._make_element(self._captured[i])
+        return x
+
+    def materialize(self) -> frozenset:
+        '''Construct all elements and return them as a `frozenset`.'''
+        if self._set is None:
+            self._set = frozenset(self._element(i) for i in range(len(self._captured)))
+        return self._set
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._set is not None:
+            return iter(self._set)
+        return self._iter_lazily()
+
+    def _iter_lazily(self) -> Iterator[Any]:
+        seen = set()
+        for i in range(len(self._elements)):
+            x = self._element(i)
+            if x not in seen:
+                seen.add(x)
+                yield x
+
+    def __len__(self) -> int:
+        if self._set is None and self._injective:
+            return len(set(self._captured))
+        return len(self.materialize())
+
+    def __contains__(self, x: object) -> bool:
+        return x in self.materialize()
+
+    def __hash__(self) -> int:
+        return hash(self.materialize())
+
+    def __repr__(self) -> str:
+        return 'LazySet({0!r})'.format(set(self.materialize()))
+
+
+class LazySequence(Sequence):
+    '''A sequence whose elements are only constructed (from the captured tuples of an answer set) when they are accessed.'''
+
+    def __init__(self, captured: List[CapturedValues], make_element: ElementFactory) -> None:
+        '''`captured` contains the captured values of each element, ordered by index.'''
+        self._captured = captured
+        self._make_element = make_element
+        self._elements = [_not_constructed] * len(captured)  # type: List[Any]
+
+    def _element(self, i: int) -> Any:
+        x = self._elements[i]
+        if x is _not_constructed:
+            x = self._elements[i] = self._make_element(self._captured[i])
+        return x
+
+    def materialize(self) -> List[Any]:
+        '''Construct all elements and return them as a list.'''
+        return [self._element(i) for i in range(len(self._elements))]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._element(i) for i in range(*index.indices(len(self._elements)))]
+        if index < 0:
+            index += len(self._elements)
+        if not 0 <= index < len(self._elements):
+            raise IndexError('LazySequence index out of range')
+        return self._element(index)
+
+    def __len__(self) -> int:
+        return len(self._elements)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (LazySequence, list, tuple)):
+            return len(self) == len(other) and all(x == y for (x, y) in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self) -> str:
+        return 'LazySequence({0!r})'.format(self.materialize())
+
+
+class LazyDictionary(Mapping):
+    '''A mapping whose values are only constructed (from the captured tuples of an answer set) when they are accessed.
+
+    The keys are constructed immediately (they are needed to detect duplicate keys).
+    '''
+
+    def __init__(self, captured: Dict[Hashable, CapturedValues], make_value: ElementFactory) -> None:
+        '''`captured` maps each key to the captured values of its value.'''
+        self._captured = captured
+        self._make_value = make_value
+        self._values = {}  # type: Dict[Hashable, Any]
+
+    def __getitem__(self, key: Hashable) -> Any:
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        value = self._values[key] = self._make_value(self._captured[key])
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._captured
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._captured)
+
+    def __len__(self) -> int:
+        return len(self._captured)
+
+    def materialize(self) -> Dict[Hashable, Any]:
+        '''Construct all values and return the contents as a dict.'''
+        return {key: self[key] for key in self._captured}
+
+    def __repr__(self) -> str:
+        return 'LazyDictionary({0!r})'.format(self.materialize())
@@ -1,26 +1,36 @@
 from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
 from contextlib import contextmanager
-from itertools import chain
-from typing import AbstractSet, Any, Iterable, Tuple, Optional, Union, Mapping, MutableMapping, Sequence  # noqa
+from itertools import chain, count
+from operator import itemgetter
+from typing import AbstractSet, Any, Callable, Dict, Iterable, Iterator, List, Tuple, Optional, Union, Mapping, MutableMapping, Sequence  # noqa
 from .errors import CircularReferenceError, DuplicateKeyError, InvalidIndicesError, RedefinedNameError, UndefinedNameError
+from .lazy_views import LazyDictionary, LazySequence, LazySet
 from .registry import Registry
 from . import asp
 from . import parser
 
 __all__ = [
-    'OutputSpec'
+    'CompiledOutputSpec',
+    'OutputSpec',
 ]
 
+_not_memoized = object()  # sentinel value for missing entries of ExprCompiler.memo (pure constructors may return None)
+
 
 class OutputResult:
     __object_is_being_mapped = object()  # sentinel value, used for cycle detection
 
-    def __init__(self, toplevel: Mapping[str, 'Expr'], answer_set: asp.RawAnswerSet, registry: Registry) -> None:
+    def __init__(self, toplevel: Mapping[str, 'Expr'], answer_set: asp.RawAnswerSet, registry: Registry, *, keep_answer_set: bool = False) -> None:
         self.toplevel = toplevel
         self.answer_set = answer_set
         self.registry = registry
         # The objects created from the given answer set and registry
         self.objs = {}  # type: MutableMapping[str, Any]
+        # (captured predicate, prefix length, arity) => (prefix of a tuple => the tuples of the predicate with that prefix)
+        self._indices = {}  # type: Dict[Tuple[str, int, Optional[int]], Dict[Tuple[str, ...], List[Tuple[str, ...]]]]
+        # Must be true if objects may still be mapped after all top-level names have been evaluated (e.g., by lazy collections)
+        self.keep_answer_set = keep_answer_set
 
     def get_object(self, name: str) -> Any:
         if name not in self.objs:
@@ -29,12 +39,40 @@ class OutputResult:
             self.objs[name] = OutputResult.__object_is_being_mapped
             self.objs[name] = self.toplevel[name].evaluate(self, LocalContext())
             # We don't need to keep the raw data around after everything has been mapped
-            if len(self.toplevel) == len(self.objs):
+            if len(self.toplevel) == len(self.objs) and not self.keep_answer_set:
                 del self.answer_set
+                del self._indices
         if self.objs[name] is OutputResult.__object_is_being_mapped:
             raise CircularReferenceError('Circular reference detected while trying to resolve name "{0}".'.format(name))
         return self.objs[name]
 
+    def get_tuples(self, predicate: str, prefix: Tuple[str, ...], arity: Optional[int] = None) -> Iterable[Tuple[str, ...]]:
+        '''Return the tuples of the given predicate whose first values are equal to `prefix`.
+
+        If an `arity` is given, only the tuples of that length are returned (necessary for predicates of the ASP program, which may be used with different arities).
+
+        For a non-empty prefix (or an arity), an index of the predicate's tuples by prefixes of that length is built on first use,
+        so nested collections (which look up the tuples for every value of the enclosing variables) do not need to scan all tuples every time.
+        '''
+        tuples = self.answer_set.get(predicate, ())
+        n = len(prefix)
+        if n == 0 and arity is None:
+            return tuples
+        index = self._indices.get((predicate, n, arity))
+        if index is None:
+            index = {}
+            for t in tuples:
+                if arity is not None and len(t) != arity:
+                    continue
+                key = t[:n]
+                matching = index.get(key)
+                if matching is None:
+                    index[key] = [t]
+                else:
+                    matching.append(t)
+            self._indices[(predicate, n, arity)] = index
+        return index.get(prefix, ())
+
 
 class LocalContext:
     def __init__(self) -> None:
@@ -52,15 +90,101 @@ class LocalContext:
             del self.va[name]
 
 
+# A compiled expression (see `Expr.compile`), called with the output result and the environment, i.e., the list of values of the ASP variables bound at this point
+CompiledFunction = Callable[[OutputResult, List[Any]], Any]
+
+
+class ExprCompiler:
+    '''Holds the state while compiling the expressions of an `OutputSpec` (see `OutputSpec.compile`).'''
+
+    def __init__(self, registry: Registry, *, lazy: bool = False, memo: Optional[MutableMapping[Any, Any]] = None) -> None:
+        self.registry = registry
+        # Whether collections are compiled into lazy views (see `lazy_views`)
+        self.lazy = lazy
+        # The objects created by pure constructors, by constructor and then by arguments (if objects are memoized)
+        self.memo = memo
+        # The size of the environment needed by the expression being compiled
+        self.env_size = 0
+
+    def bind(self, slots: Mapping[str, int], names: Sequence[str]) -> Mapping[str, int]:
+        '''Return the slots of `slots` extended by new slots for the given variables, which are appended to the environment (in order).'''
+        extended = dict(slots)
+        for name in names:
+            assert name not in extended
+            extended[name] = len(extended)
+        self.env_size = max(self.env_size, len(extended))
+        return extended
+
+    def memoized_objects(self, key: Any) -> Dict[Tuple[Any, ...], Any]:
+        '''Return the dictionary in `memo` that maps the arguments of the constructor identified by `key` to the created objects.'''
+        memo = self.memo
+        assert memo is not None
+        objects = memo.get(key)
+        if objects is None:
+            objects = memo[key] = {}
+        return objects
+
+    def memoized(self, constructor: Callable[..., Any], key: Any, *, hashable: bool = False) -> Callable[..., Any]:
+        '''Return a function that calls `constructor`, but returns the same object whenever it is called again with equal arguments.
+
+        The objects are stored in `memo` by the given key (which identifies the constructor) and the arguments (see `memoized_objects`).
+        Calls with unhashable arguments are not memoized; pass `hashable=True` if the arguments are always hashable (e.g., values of the answer set).
+        '''
+        objects = self.memoized_objects(key)
+        get_object = objects.get
+        if hashable:
+            def memoized_constructor(*args):
+                obj = get_object(args, _not_memoized)
+                if obj is _not_memoized:
+                    obj = objects[args] = constructor(*args)
+                return obj
+        else:
+            def memoized_constructor(*args):
+                try:
+                    obj = get_object(args, _not_memoized)
+                except TypeError:
+                    # Unhashable arguments
+                    return constructor(*args)
+                if obj is _not_memoized:
+                    obj = objects[args] = constructor(*args)
+                return obj
+        return memoized_constructor
+
+
+class CompiledExpr:
+    '''A top-level expression compiled by `OutputSpec.compile`. Can be used in place of the original expression by `OutputResult`.'''
+    __slots__ = ('function', 'env_size')
+
+    def __init__(self, function: CompiledFunction, env_size: int) -> None:
+        self.function = function
+        self.env_size = env_size
+
+    def evaluate(self, r: OutputResult, lc: LocalContext) -> Any:
+        # Variables bound in the expression are assigned to the slots of a fresh environment
+        return self.function(r, [None] * self.env_size)
+
+
 class Expr(metaclass=ABCMeta):
     @abstractmethod
     def evaluate(self, r: OutputResult, lc: LocalContext) -> Any:
         pass
 
+    @abstractmethod
+    def compile(self, compiler: ExprCompiler, slots: Mapping[str, int]) -> CompiledFunction:
+        '''Return a function that is equivalent to `evaluate`, but uses an environment list instead of a `LocalContext`.
+
+        `slots` maps the names of the currently bound variables to their positions in the environment.
+        '''
+        pass
+
     def variables(self) -> Iterable['Variable']:
         '''All the variable expressions (i.e., does not include those occurring only in queries) used in this expression and any subexpressions.'''
         return ()
 
+    def fixed_variables(self) -> Iterable[str]:
+        '''The names of the variables whose values are taken from the surrounding expressions by the queries in this expression and any subexpressions (available after `check`).'''
+        return ()
+
     def check(self, toplevel_name: str, bound_variables: Tuple[str, ...]) -> None:
         pass
 
@@ -70,6 +194,13 @@ class Expr(metaclass=ABCMeta):
     def captured_predicates(self) -> Iterable[str]:
         return ()
 
+    def assign_output_predicates(self, names: Iterator[str], shared: MutableMapping[str, str]) -> None:
+        '''Assign the names of the helper predicates used by this expression and any subexpressions, taking them from `names` in order of traversal.
+
+        Collections with the same canonical rule (see `ExprCollection.canonical_rule`) share a helper predicate; `shared` maps the canonical rules to the assigned names.
+        '''
+        pass
+
 
 class Constant(Expr):
     def __init__(self, value: Union[int, str]) -> None:
@@ -78,6 +209,10 @@ class Constant(Expr):
     def evaluate(self, r: OutputResult, lc: LocalContext) -> Union[int, str]:
         return self.value
 
+    def compile(self, compiler: ExprCompiler, slots: Mapping[str, int]) -> CompiledFunction:
+        value = self.value
+        return lambda r, env: value
+
 
 class Reference(Expr):
     def __init__(self, name: str) -> None:
@@ -87,6 +222,10 @@ class Reference(Expr):
     def evaluate(self, r: OutputResult, lc: LocalContext) -> Any:
         return r.get_object(self.name)
 
+    def compile(self, compiler: ExprCompiler, slots: Mapping[str, int]) -> CompiledFunction:
+        name = self.name
+        return lambda r, env: r.get_object(name)
+
 
 class Variable(Expr):
     def __init__(self, name: str) -> None:
@@ -103,6 +242,11 @@ class Variable(Expr):
         assert self.name in lc.va
         return str(lc.va[self.name])
 
+    def compile(self, compiler: ExprCompiler, slots: Mapping[str, int]) -> CompiledFunction:
+        # The values are taken from the answer set, so they are strings already
+        slot = slots[self.name]
+        return lambda r, env: env[slot]
+
     def variables(self) -> Iterable['Variable']:
         return [self]
 
@@ -130,11 +274,84 @@ class ExprObject(Expr):
         mapped_args = (subexpr.evaluate(r, lc) for subexpr in self.args)
         return constructor(*mapped_args)
 
+    def compile(self, compiler: ExprCompiler, slots: Mapping[str, int]) -> CompiledFunction:
+        # The constructor is resolved only once
+        if self.constructor_name is None:
+            make_tuple = compiler.registry.tuple_constructor
+
+            def constructor(*args):
+                return make_tuple(args)
+        else:
+            constructor = compiler.registry.resolve(self.constructor_name)
+            if constructor is None:
+                message = 'constructor {0!r} not defined'.format(self.constructor_name)
+
+                def undefined_constructor(r, env):
+                    raise NotImplementedError(message)  # TODO
+                return undefined_constructor
+        memo_key = None  # type: Any
+        if compiler.memo is not None and self.is_memoizable(compiler.registry):
+            memo_key = tuple if self.constructor_name is None else constructor
+        if all(isinstance(arg, Variable) for arg in self.args) and len(self.args) >= 2:
+            # Common case: all arguments are variables
+            get_args = itemgetter(*(slots[arg.name] for arg in self.args))  # type: ignore  # all arguments are variables
+            if memo_key is None:
+                if self.constructor_name is None:
+                    return lambda r, env: make_tuple(get_args(env))
+                return lambda r, env: constructor(*get_args(env))
+            # The values of the answer set are hashable, so the argument tuple can be used as key directly
+            objects = compiler.memoized_objects(memo_key)
+            if memo_key is tuple:
+                # The tuple of the arguments is the memoized object itself
+                def memoized_tuple(r, env):
+                    args = get_args(env)
+                    return objects.setdefault(args, args)
+                return memoized_tuple
+            get_object = objects.get
+
+            def memoized_object(r, env):
+                args = get_args(env)
+                obj = get_object(args, _not_memoized)
+                if obj is _not_memoized:
+                    obj = objects[args] = constructor(*args)
+                return obj
+            return memoized_object
+        if memo_key is not None:
+            constructor = compiler.memoized(constructor, memo_key, hashable=all(isinstance(arg, (Variable, Constant)) for arg in self.args))
+        fs = tuple(arg.compile(compiler, slots) for arg in self.args)
+        if len(fs) == 0:
+            return lambda r, env: constructor()
+        if len(fs) == 1:
+            (f,) = fs
+            return lambda r, env: constructor(f(r, env))
+        return lambda r, env: constructor(*[f(r, env) for f in fs])
+
+    def is_memoizable(self, registry: Registry) -> bool:
+        '''Return true iff the objects of this expression may be shared between answer sets (see `ExprCompiler.memoized`).
+
+        This is the case for tuples built by the (immutable) builtin tuple and objects of pure constructors,
+        if every argument is a value of the answer set or a memoizable object itself.
+        Otherwise, the arguments may be mutable, or only hash by identity (which would add new entries to the memo for every answer set).
+        '''
+        if self.constructor_name is None:
+            if registry.tuple_constructor is not tuple:
+                return False
+        elif not registry.is_pure(self.constructor_name):
+            return False
+        return all(
+            isinstance(arg, (Variable, Constant)) or (isinstance(arg, ExprObject) and arg.is_memoizable(registry))
+            for arg in self.args
+        )
+
     def variables(self) -> Iterable['Variable']:
         # return chain(*(subexpr.variables() for subexpr in self.args))
         for subexpr in self.args:
             yield from subexpr.variables()
 
+    def fixed_variables(self) -> Iterable[str]:
+        for subexpr in self.args:
+            yield from subexpr.fixed_variables()
+
     def additional_rules(self) -> Iterable[asp.Rule]:
         for subexpr in self.args:
             yield from subexpr.additional_rules()
@@ -145,6 +362,10 @@ class ExprObject(Expr):
             yield from subexpr.captured_predicates()
         # return chain(*(subexpr.captured_predicates() for subexpr in self.args))
 
+    def assign_output_predicates(self, names: Iterator[str], shared: MutableMapping[str, str]) -> None:
+        for subexpr in self.args:
+            subexpr.assign_output_predicates(names, shared)
+
     def check(self, toplevel_name: str, bound_variables: Tuple[str, ...]) -> None:
         for subexpr in self.args:
             subexpr.check(toplevel_name, bound_variables)
@@ -169,14 +390,74 @@ class ExprCollection(Expr):
         self.query = query
         self.subexpressions = tuple(subexpressions)
         # # TODO: Note the precondition somewhere: no predicate starting with aspio__ may be used anywhere in the ASP program (or our additional rules will alter the program's meaning).
-        # TODO: Special handling for cases where the original predicate can be used (e.g., only one literal and all variables captured)
-        # TODO: Similar output expressions may generate duplicate rules... would be good if both expressions could use the same rule, without having all the data twice in the answer set
-        self.output_predicate = 'aspio__' + str(id(self))  # unique for as long as this object is alive
+        # Assigned by the surrounding OutputSpec (see `assign_output_predicates`).
+        # The names only depend on the structure of the specification, so they are the same in every process (which is required to cache parsed specifications).
+        self.output_predicate = ''
+        # False if another collection with the same canonical rule already generates the tuples of the output predicate,
+        # or if the tuples are read directly from a predicate of the ASP program (see `direct_predicate`)
+        self.defines_output_predicate = True
+        # The arity of the tuples to read from the output predicate, if it may contain tuples of other arities
+        self.output_arity = None  # type: Optional[int]
         self.captured_variables = None  # type: Tuple[str, ...]
 
+    def direct_predicate(self) -> Optional[str]:
+        '''Return the predicate of the query if its tuples can be used directly instead of those of a helper predicate, or None otherwise.
+
+        This is the case if the query consists of a single positive literal (without strong negation),
+        whose arguments are distinct variables that are all captured, in the same order.
+        '''
+        if len(self.query.literals) != 1:
+            return None
+        lit = self.query.literals[0]
+        if lit.defaultNegated or not lit.predicate[:1].islower():
+            # Note: builtin predicates (e.g., '<' or '#succ') and strongly negated predicates do not start with a lowercase letter
+            return None
+        if not all(isinstance(term, asp.Variable) for term in lit.arguments):
+            return None
+        if tuple(str(term) for term in lit.arguments) != self.captured_variables:
+            # Also excludes repeated variables, since the captured variables are distinct
+            return None
+        return lit.predicate
+
+    def canonical_rule(self) -> str:
+        '''Return the helper rule of this collection without the name of the head predicate, and with the variables renamed in order of their first occurrence.
+
+        Collections with the same canonical rule capture the same tuples, so they can share a helper predicate.
+        '''
+        renaming = OrderedDict()  # type: MutableMapping[str, str]
+        for v in chain(self.captured_variables, (str(v) for v in self.query.variables())):
+            if v not in renaming:
+                renaming[v] = 'V' + str(len(renaming))
+
+        def rename(term: asp.Term) -> asp.Term:
+            return asp.Variable(renaming[term.name]) if isinstance(term, asp.Variable) else term
+        query = asp.Query(tuple(asp.Literal(lit.predicate, tuple(map(rename, lit.arguments)), lit.defaultNegated) for lit in self.query.literals))
+        return '(' + ','.join(renaming[v] for v in self.captured_variables) + ') :- ' + str(query) + '.'
+
+    def assign_output_predicates(self, names: Iterator[str], shared: MutableMapping[str, str]) -> None:
+        direct_predicate = self.direct_predicate()
+        if direct_predicate is not None:
+            # No helper rule necessary
+            self.output_predicate = direct_predicate
+            self.output_arity = len(self.captured_variables)
+            self.defines_output_predicate = False
+        else:
+            key = self.canonical_rule()
+            predicate = shared.get(key)
+            if predicate is None:
+                predicate = shared[key] = next(names)
+                self.defines_output_predicate = True
+            else:
+                self.defines_output_predicate = False
+            self.output_predicate = predicate
+            self.output_arity = None
+        for subexpr in self.subexpressions:
+            subexpr.assign_output_predicates(names, shared)
+
     def additional_rules(self) -> Iterable[asp.Rule]:
-        rule = self.output_predicate + '(' + ','.join(self.captured_variables) + ') :- ' + str(self.query) + '.'
-        yield rule
+        if self.defines_output_predicate:
+            rule = self.output_predicate + '(' + ','.join(self.captured_variables) + ') :- ' + str(self.query) + '.'
+            yield rule
         for subexpr in self.subexpressions:
             yield from subexpr.additional_rules()
         # return chain([rule], *(expr.additional_rules() for expr in self.subexpressions))
@@ -191,40 +472,82 @@ class ExprCollection(Expr):
         for subexpr in self.subexpressions:
             yield from subexpr.variables()
 
+    def fixed_variables(self) -> Iterable[str]:
+        yield from self.fixed_query_variables
+        for subexpr in self.subexpressions:
+            yield from subexpr.fixed_variables()
+
     def check(self, toplevel_name: str, bound_variables: Tuple[str, ...]) -> None:
         # NOTE: We have to use the variable names (i.e., strings) here,
         #       because the query returns ASP variable objects, while the expressions return variable expression objects.
         #
-        # All variables that appear in the query
-        query_variables = set(str(v) for v in self.query.variables())
+        #
+        # All variables that appear in the query, in order of their first occurrence
+        # (we avoid iterating over sets here, so the generated helper rules are the same in every process)
+        query_variables = tuple(OrderedDict.fromkeys(str(v) for v in self.query.variables()))
         # All variables that are fixed from the surrounding expression
         # (semantically equivalent: variables that are replaced by constants before evaluating the query for this expression)
-        self.fixed_query_variables = tuple(query_variables.intersection(bound_variables))
+        self.fixed_query_variables = tuple(v for v in query_variables if v in bound_variables)
+        for subexpr in self.subexpressions:
+            subexpr.check(toplevel_name, bound_variables + query_variables)
         # All variables that are varying in the context of one result of this expression
         # (i.e., these variables vary and thus the content subexpression results in different contained objects),
-        # and are also used in the construction of at least one subexpression
-        used_varying_query_variables = query_variables.intersection(str(v) for v in self.variables())
+        # and are also used in the construction of at least one subexpression, or fixed by one of the nested queries
+        used_variables = set(str(v) for v in self.variables())
+        for subexpr in self.subexpressions:
+            used_variables.update(subexpr.fixed_variables())
+        used_varying_query_variables = set(v for v in query_variables if v in used_variables)
         # We need to capture all fixed and (used) varying variables in the query, and ignore all others
         # IMPORTANT: The fixed variables must come first! (cf. get_captured_values)
-        self.captured_variables = self.fixed_query_variables + tuple(used_varying_query_variables.difference(self.fixed_query_variables))
+        self.captured_variables = self.fixed_query_variables + tuple(v for v in query_variables if v in used_varying_query_variables and v not in self.fixed_query_variables)
         assert len(set(self.captured_variables)) == len(self.captured_variables)
         self.used_varying_query_variables = self.captured_variables[len(self.fixed_query_variables):]
         assert set(self.used_varying_query_variables) == used_varying_query_variables
 
-        for subexpr in self.subexpressions:
-            subexpr.check(toplevel_name, bound_variables + tuple(query_variables))
-
     def get_captured_values(self, r: OutputResult, lc: LocalContext) -> Iterable[Tuple[str, ...]]:
         '''Return only those tuples of the `output_predicate` that assign the correct values for the fixed variables.'''
-        for captured_values in r.answer_set.get(self.output_predicate, ()):
-            # Only yield tuples that assign the correct values for the fixed variables
-            for (i, v) in enumerate(self.fixed_query_variables):
-                assert self.captured_variables[i] == v
-                if lc.va[v] != captured_values[i]:
-                    break
-            else:
-                # fixed_query_variables was exhausted without reaching `break`, which means all fixed variables have the correct value
-                yield captured_values
+        # The fixed variables are captured first, so the matching tuples are those starting with the current values of the fixed variables
+        return r.get_tuples(self.output_predicate, tuple(lc.va[v] for v in self.fixed_query_variables), self.output_arity)
+
+    def compile_tuples(self, compiler: ExprCompiler, slots: Mapping[str, int]) -> Tuple[Callable[[OutputResult, List[Any]], Iterable[Tuple[str, ...]]], Mapping[str, int], slice]:
+        '''Compile the lookup of the captured tuples (see `get_captured_values`).
+
+        Returns the lookup function, the slots for the subexpressions (with the varying variables bound),
+        and the slice of the environment the varying values of each tuple must be assigned to.
+        '''
+        predicate = self.output_predicate
+        arity = self.output_arity
+        fixed_slots = tuple(slots[v] for v in self.fixed_query_variables)
+        inner_slots = compiler.bind(slots, self.used_varying_query_variables)
+        varying = slice(len(slots), len(inner_slots))
+        if len(fixed_slots) == 0:
+            def get_tuples(r, env):
+                return r.get_tuples(predicate, (), arity)
+        elif len(fixed_slots) == 1:
+            (fixed_slot,) = fixed_slots
+
+            def get_tuples(r, env):
+                return r.get_tuples(predicate, (env[fixed_slot],), arity)
+        else:
+            get_prefix = itemgetter(*fixed_slots)
+
+            def get_tuples(r, env):
+                return r.get_tuples(predicate, get_prefix(env), arity)
+        return (get_tuples, inner_slots, varying)
+
+    def compile_element_factory(self, content: CompiledFunction, varying: slice, r: OutputResult, env: List[Any]) -> Callable[[Tuple[str, ...]], Any]:
+        '''Return a function that evaluates `content` for the captured values of one element, for use by lazy views.
+
+        The elements are constructed after the evaluation of the collection has finished, so the current environment is copied.
+        '''
+        env = list(env)
+        n = len(self.fixed_query_variables)
+
+        def make_element(vs):
+            element_env = list(env)
+            element_env[varying] = vs[n:]
+            return content(r, element_env)
+        return make_element
 
     # @contextmanager
     # def assign_varying_variables(self, lc: LocalContext, values: Sequence[str]):
@@ -254,6 +577,35 @@ class ExprSet(ExprCollection):
         gen = (self.eval_subexpression(self.content, vs, r, lc) for vs in self.get_captured_values(r, lc))
         return make_set(gen)  # type: ignore
 
+    def compile(self, compiler: ExprCompiler, slots: Mapping[str, int]) -> CompiledFunction:
+        (get_tuples, inner_slots, varying) = self.compile_tuples(compiler, slots)
+        make_set = compiler.registry.set_constructor
+        n = len(self.fixed_query_variables)
+        if isinstance(self.content, Variable) and inner_slots[self.content.name] >= varying.start:
+            # Common case (e.g., `set { p/1 }`): the content is taken directly from the tuples
+            pos = n + inner_slots[self.content.name] - varying.start
+            return lambda r, env: make_set([vs[pos] for vs in get_tuples(r, env)])
+        content = self.content.compile(compiler, inner_slots)
+
+        if compiler.lazy:
+            # Tuples of the captured values are distinct for distinct captured tuples, so the size of the set is known without constructing them
+            injective = (
+                isinstance(self.content, ExprObject) and self.content.constructor_name is None and compiler.registry.tuple_constructor is tuple
+                and all(isinstance(arg, (Variable, Constant)) for arg in self.content.args)
+            )
+
+            def evaluate_lazy_set(r, env):
+                return LazySet(list(get_tuples(r, env)), self.compile_element_factory(content, varying, r, env), injective=injective)
+            return evaluate_lazy_set
+
+        def evaluate_set(r, env):
+            xs = []
+            for vs in get_tuples(r, env):
+                env[varying] = vs[n:]
+                xs.append(content(r, env))
+            return make_set(xs)
+        return evaluate_set
+
 
 class ExprSequence(ExprCollection):
     def __init__(self, query: asp.Query, content: Expr, index: Variable) -> None:
@@ -286,6 +638,36 @@ class ExprSequence(ExprCollection):
         super().check(toplevel_name, bound_variables)
         self.index_pos = self.captured_variables.index(self.index.name)
 
+    def compile(self, compiler: ExprCompiler, slots: Mapping[str, int]) -> CompiledFunction:
+        (get_tuples, inner_slots, varying) = self.compile_tuples(compiler, slots)
+        content = self.content.compile(compiler, inner_slots)
+        make_sequence = compiler.registry.sequence_constructor
+        n = len(self.fixed_query_variables)
+        index_pos = self.index_pos
+        lazy = compiler.lazy
+
+        def evaluate_sequence(r, env):
+            all_captured_values = tuple(get_tuples(r, env))
+            indices = []
+            for vs in all_captured_values:
+                try:
+                    indices.append(int(vs[index_pos]))
+                except ValueError as e:
+                    raise InvalidIndicesError('index variable is not an integer: {0!s}'.format(e))
+            if sorted(indices) != list(range(len(indices))):
+                raise InvalidIndicesError('not a valid range of indices')  # TODO: better message
+            if lazy:
+                ordered = [None] * len(indices)  # type: List[Any]
+                for (i, vs) in zip(indices, all_captured_values):
+                    ordered[i] = vs
+                return LazySequence(ordered, self.compile_element_factory(content, varying, r, env))
+            xs = [None] * len(indices)  # type: List[Any]
+            for (i, vs) in zip(indices, all_captured_values):
+                env[varying] = vs[n:]
+                xs[i] = content(r, env)
+            return make_sequence(xs)
+        return evaluate_sequence
+
 
 class ExprDictionary(ExprCollection):
     # TODO: Note the limitation somewhere (keys must be hashable)
@@ -306,10 +688,41 @@ class ExprDictionary(ExprCollection):
         make_dictionary = r.registry.dictionary_constructor  # type: ignore
         return make_dictionary(d)  # type: ignore
 
+    def compile(self, compiler: ExprCompiler, slots: Mapping[str, int]) -> CompiledFunction:
+        (get_tuples, inner_slots, varying) = self.compile_tuples(compiler, slots)
+        content = self.content.compile(compiler, inner_slots)
+        key = self.key.compile(compiler, inner_slots)
+        make_dictionary = compiler.registry.dictionary_constructor
+        n = len(self.fixed_query_variables)
+
+        def evaluate_dictionary(r, env):
+            d = {}  # type: MutableMapping[Any, Any]
+            for vs in get_tuples(r, env):
+                env[varying] = vs[n:]
+                k = key(r, env)
+                if k not in d:
+                    d[k] = content(r, env)
+                else:
+                    raise DuplicateKeyError('Duplicate key: {0}'.format(repr(k)))
+            return make_dictionary(d)
+
+        def evaluate_lazy_dictionary(r, env):
+            # Only the keys are evaluated immediately
+            captured = {}  # type: Dict[Any, Tuple[str, ...]]
+            for vs in get_tuples(r, env):
+                env[varying] = vs[n:]
+                k = key(r, env)
+                if k not in captured:
+                    captured[k] = vs
+                else:
+                    raise DuplicateKeyError('Duplicate key: {0}'.format(repr(k)))
+            return LazyDictionary(captured, self.compile_element_factory(content, varying, r, env))
+        return evaluate_lazy_dictionary if compiler.lazy else evaluate_dictionary
+
 
 class OutputSpec:
     def __init__(self, named_exprs: Iterable[Tuple[str, Expr]]) -> None:
-        exprs = {}  # type: MutableMapping[str, Expr]
+        exprs = OrderedDict()  # type: MutableMapping[str, Expr]
         for (name, expr) in named_exprs:
             if name not in exprs:
                 exprs[name] = expr
@@ -320,6 +733,13 @@ class OutputSpec:
         # TODO: Check for cycles in references (currently we do that while mapping, but for consistency it would be nice to have it checked at time of construction -- it is some additional work though, while we get the result 'for free' during mapping)
         for (name, expr) in self.exprs.items():
             expr.check(toplevel_name=name, bound_variables=())  # , bound_references=self.exprs.keys())
+        # Helper predicates are numbered in order of their appearance in the specification
+        # (only one OUTPUT specification per program is allowed, so the names are unique within the program)
+        output_predicate_names = ('aspio__' + str(n) for n in count())
+        # Structurally identical collections share their helper predicate (and rule)
+        shared = {}  # type: MutableMapping[str, str]
+        for expr in self.exprs.values():
+            expr.assign_output_predicates(output_predicate_names, shared)
 
     @staticmethod
     def empty() -> 'OutputSpec':
@@ -332,6 +752,19 @@ class OutputSpec:
     def prepare_mapping(self, answer_set: asp.RawAnswerSet, registry: Registry) -> OutputResult:
         return OutputResult(self.exprs, answer_set, registry)
 
+    def compile(self, registry: Registry, *, lazy: bool = False, memo: Optional[MutableMapping[Any, Any]] = None) -> 'CompiledOutputSpec':
+        '''Compile the expressions into nested functions for faster mapping (see `CompiledOutputSpec`).
+
+        If `lazy` is true, sets, sequences, and dictionaries are mapped to views that only construct their elements when accessed (see `lazy_views`),
+        instead of using the collection constructors of the registry.
+        Sets whose elements are plain values of the answer set are still constructed immediately.
+
+        If a `memo` dictionary is given, constructors that have been registered as pure (see `Registry.register`) and the builtin tuple constructor
+        return the same object for equal arguments, which is stored in `memo` (e.g., to share objects between the answer sets of a `Results` object).
+        This only applies if all arguments are values of the answer set or such shared objects themselves (see `ExprObject.is_memoizable`).
+        '''
+        return CompiledOutputSpec(self, registry, lazy=lazy, memo=memo)
+
     def additional_rules(self) -> Iterable[asp.Rule]:
         for expr in self.exprs.values():
             yield from expr.additional_rules()
@@ -339,3 +772,28 @@ class OutputSpec:
     def captured_predicates(self) -> Iterable[str]:
         # create a set to remove duplicates
         return set(chain(*(expr.captured_predicates() for expr in self.exprs.values())))
+
+
+class CompiledOutputSpec:
+    '''An `OutputSpec` whose expressions have been compiled into nested functions for a specific registry.
+
+    Compared to the `evaluate` methods of the expressions, the variables are stored in lists (at positions determined during compilation) instead of dictionaries,
+    and the constructors are resolved only once, during compilation.
+    Can be used in place of the `OutputSpec` for mapping answer sets (see `prepare_mapping`).
+    '''
+
+    def __init__(self, spec: OutputSpec, registry: Registry, *, lazy: bool = False, memo: Optional[MutableMapping[Any, Any]] = None) -> None:
+        self.spec = spec
+        self.registry = registry
+        self.lazy = lazy
+        exprs = OrderedDict()  # type: MutableMapping[str, Any]
+        for (name, expr) in spec.exprs.items():
+            compiler = ExprCompiler(registry, lazy=lazy, memo=memo)
+            function = expr.compile(compiler, {})
+            exprs[name] = CompiledExpr(function, compiler.env_size)
+        self.exprs = exprs  # type: Mapping[str, CompiledExpr]
+
+    def prepare_mapping(self, answer_set: asp.RawAnswerSet, registry: Registry) -> OutputResult:
+        assert registry is self.registry, 'The output specification has been compiled for a different registry'
+        # Lazy collections may need the answer set after all top-level names have been evaluated
+        return OutputResult(self.exprs, answer_set, registry, keep_answer_set=self.lazy)  # type: ignore
@@ -1,22 +1,70 @@
+import hashlib
 import logging
 import numbers
+from collections import Counter, deque
 from copy import copy
+from io import StringIO
 from pathlib import Path
-from typing import Any, IO, Iterable, Iterator, List, Mapping, Optional, Sequence, Union  # noqa
+from typing import AbstractSet, Any, Callable, Dict, IO, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple, Union, TYPE_CHECKING  # noqa
+from .answer_set import SymbolTable
 from .helper.typing import ClosableIterable
 from .solver import DefaultSolver, Solver, SolverOptions
-from .helper import CachingIterable
+from .helper import CachingIterable, ordered_map, scan_file_predicate_names, scan_predicate_names, start_process_pool
 from .input import InputSpec, FactAccumulator
-from .output import UndefinedNameError, OutputSpec
-from .parser import parse_embedded_spec
+from .output import CompiledOutputSpec, UndefinedNameError, OutputSpec
 from .registry import Registry, global_registry
+from .spec_cache import global_spec_cache
 from . import asp
+if TYPE_CHECKING:
+    from concurrent.futures import Executor, Future  # noqa
+    # typing.Deque is only available since Python 3.5.4/3.6.1
+    from typing import Deque  # noqa
 
-__all__ = ['Program']
+__all__ = ['MappingOptions', 'Program']
 
 log = logging.getLogger(__name__)
 
 
+class MappingOptions:
+    def __init__(self, *,
+                 input_cache: Optional['InputCache'] = None,
+                 input_executor: Optional['Executor'] = None,
+                 deduplicate: Iterable[str] = (),
+                 prune_input: bool = False,
+                 lazy_output: bool = False,
+                 output_workers: Optional[int] = None,
+                 memoize: bool = False) -> None:
+        self.input_cache = input_cache
+        '''Reuse the facts generated from unchanged input arguments in previous calls (see `InputCache`).'''
+        self.input_executor = input_executor
+        '''Map the INPUT predicates concurrently in the given executor (e.g., a `concurrent.futures.ThreadPoolExecutor`). With a `ProcessPoolExecutor`, the input arguments must be picklable.'''
+        self.deduplicate = deduplicate
+        '''Pass every distinct fact of the INPUT predicates named here to the solver only once (useful if the same objects are reachable through several paths of the input arguments).
+        A digest of every distinct fact is kept until the input mapping has finished (about 100 bytes per fact, regardless of its length).'''
+        self.prune_input = prune_input
+        '''Do not map INPUT predicates that neither occur in the ASP code (see `Program.used_predicates`) nor are captured explicitly (see `SolverOptions.capture`).
+        This is only valid if the solver receives no further code that uses them (e.g., through additional solver arguments).'''
+        self.lazy_output = lazy_output
+        '''Map output collections to lazy views that construct their elements only when they are accessed (see `OutputSpec.compile`); the collection constructors of the registry are not used in this case.'''
+        self.output_workers = output_workers
+        '''Map the answer sets in a pool of `output_workers` processes (see `Results`). Map on the calling thread if `None`.'''
+        self.memoize = memoize
+        '''Return the same object for equal arguments of the constructors that have been registered as pure (see `Registry.register`) and the builtin tuple constructor,
+        as long as all arguments are values of the answer set or such shared objects themselves, in all answer sets of a `Results` object (within each worker process, if `output_workers` is given).
+        This mainly saves memory when many answer sets share objects; looking up the arguments costs about as much time as constructing cheap objects like tuples,
+        so the mapping is only faster if the memoized constructors are expensive.'''
+
+    def __copy__(self) -> 'MappingOptions':
+        return MappingOptions(
+            input_cache=self.input_cache,
+            input_executor=self.input_executor,
+            deduplicate=copy(self.deduplicate),
+            prune_input=self.prune_input,
+            lazy_output=self.lazy_output,
+            output_workers=self.output_workers,
+            memoize=self.memoize)
+
+
 class Program:
     '''Represents an answer set program.'''
 
@@ -30,6 +78,8 @@ class Program:
         For convenience, calls the appropriate `append...` method with the given `filename` and `code` keyword arguments.
         '''
         self.file_parts = []  # type: List[str]
+        # The encodings passed to `append_file` (used to scan the files for predicate names, see `used_predicates`)
+        self.file_encodings = {}  # type: Dict[str, str]
         self.code_parts = []  # type: List[str]
         self._input_spec = None  # type: Optional[InputSpec]
         self._output_spec = None  # type: Optional[OutputSpec]
@@ -43,6 +93,7 @@ class Program:
     def __copy__(self) -> 'Program':
         other = Program()
         other.file_parts = copy(self.file_parts)
+        other.file_encodings = copy(self.file_encodings)
         other.code_parts = copy(self.code_parts)
         other._input_spec = copy(self._input_spec)
         other._output_spec = copy(self._output_spec)
@@ -96,7 +147,10 @@ class Program:
         return self._output_spec is not None
 
     def parse_spec(self, code: str) -> None:
-        i, o = parse_embedded_spec(code)
+        # Parsed specifications are cached by content (see `set_spec_cache_directory` to share them between processes)
+        self._set_parsed_spec(*global_spec_cache.parse_embedded_spec(code))
+
+    def _set_parsed_spec(self, i: Optional[InputSpec], o: Optional[OutputSpec]) -> None:
         if i is not None:
             if not self.has_input_spec:
                 self.input_spec = i
@@ -117,9 +171,10 @@ class Program:
         filename = str(filename)  # also support pathlib.Path instances
         # TODO: If the encoding differs from what the solver expects, we should just read the file and append it to the code parts
         self.file_parts.append(filename)
+        self.file_encodings[filename] = encoding
         if parse_io_spec:
-            with open(filename, 'rt', encoding=encoding) as file:
-                self.parse_spec(file.read())
+            # Only the lines containing '%!' are decoded (the remaining ASP code, e.g. large generated fact files, is read by the solver)
+            self._set_parsed_spec(*global_spec_cache.parse_embedded_spec_file(filename, encoding=encoding))
 
     def append_code(self, code: str, *, parse_io_spec: bool = True) -> None:
         '''Append the given ASP code to the program.
@@ -130,26 +185,90 @@ class Program:
         if parse_io_spec:
             self.parse_spec(code)
 
+    def used_predicates(self) -> Optional[AbstractSet[str]]:
+        '''Return a superset of the names of predicates that are used by the ASP code of this program, the helper rules of the output specification, or the output mapping.
+
+        The names are determined by a lexical scan of the code (see `scan_predicate_names`); the results for files are cached until the files change.
+        Returns None if one of the files cannot be read or decoded, or if the code includes other files (with an `#include` directive).
+        '''
+        names = set(self.output_spec.captured_predicates())
+        for rule in self.output_spec.additional_rules():
+            names.update(scan_predicate_names(str(rule)))
+        for code in self.code_parts:
+            names.update(scan_predicate_names(code))
+        for filename in self.file_parts:
+            try:
+                names.update(scan_file_predicate_names(filename, self.file_encodings.get(filename, 'UTF-8')))
+            except (OSError, ValueError) as e:
+                # ValueError: the file cannot be decoded
+                log.debug('Program: Unable to scan %r for used predicates: %r', filename, e)
+                return None
+        if '#include' in names:
+            log.debug('Program: Unable to determine the used predicates, since the code includes other files')
+            return None
+        return names
+
     def solve(self,
               *input_arguments,
               solver: Optional[Solver] = None,
               options: Optional[SolverOptions] = None,
+              mapping_options: Optional[MappingOptions] = None,
               cache: bool = True) -> 'Results':
         '''Solve the ASP program with the given input arguments and return a collection of answer sets.
 
         If deterministic cleanup of the solver subprocess is required, call close() on the returned object,
         or use the returned object as a context manager in a `with` statement.
+
+        The input mapping may still be running in a background thread when this method returns (while the solver starts up).
+        Therefore, the input arguments (and all objects reachable from them) must not be modified until the first answer set has been retrieved from the returned object,
+        or the object has been closed; otherwise, the solver may receive an inconsistent mix of old and new facts.
+
+        The input and output mapping can be tuned with `mapping_options` (see `MappingOptions`).
         '''
+        if mapping_options is None:
+            mapping_options = MappingOptions()
+        # Read the options now, since the input mapping may run in a background thread
+        input_cache = mapping_options.input_cache
+        input_executor = mapping_options.input_executor
+        lazy_output = mapping_options.lazy_output
+        output_workers = mapping_options.output_workers
+        memoize = mapping_options.memoize
+        if lazy_output and output_workers is not None:
+            raise ValueError('Lazy output views cannot be mapped in worker processes.')
+        deduplicate = frozenset(mapping_options.deduplicate)
+        mapped_predicates = None  # type: Optional[AbstractSet[str]]
+        if mapping_options.prune_input:
+            used = self.used_predicates()
+            if used is not None and options is not None and options.capture is not None:
+                # Predicates that are captured explicitly are part of the result, even if the ASP code does not use them
+                # (the capture option may be a one-shot iterable, so the solver receives a copy of the options)
+                options = copy(options)
+                options.capture = tuple(options.capture)
+                used = used | frozenset(options.capture)
+            if used is not None:
+                declared = frozenset(pred.predicate for pred in self.input_spec.predicates)
+                mapped_predicates = declared & used
+                if len(mapped_predicates) < len(declared):
+                    log.debug('Program: Skipping unused INPUT predicates: %s', ', '.join(sorted(declared - mapped_predicates)))
         if solver is None:
             solver = self.solver
             if solver is None:
                 solver = DefaultSolver()
+        # The input mapping may run in the background, so check the arguments now to get a meaningful error as early as possible
+        if len(input_arguments) != len(self.input_spec.parameters):
+            raise ValueError('Wrong number of arguments: expecting {0}, got {1}'.format(len(self.input_spec.parameters), len(input_arguments)))
 
         def write_asp_input(text_stream: IO[str]) -> None:
             '''Write all facts and rules that are needed in addition to the original ASP code to the given stream.'''
             # Map input data and pass it over the stream
             # Raises exception if the input arguments are not as expected (e.g., wrong count, an attribute does not exist, ...)
-            self.input_spec.perform_mapping(input_arguments, StreamAccumulator(text_stream))
+            if input_cache is not None or input_executor is not None:
+                write_input_facts(self.input_spec, input_arguments, text_stream, input_cache=input_cache, executor=input_executor, deduplicate=deduplicate, predicates=mapped_predicates)
+            else:
+                accumulator = StreamAccumulator(text_stream, buffer_size=StreamAccumulator.default_buffer_size, deduplicate=deduplicate)
+                self.input_spec.perform_mapping(input_arguments, accumulator, predicates=mapped_predicates)
+                accumulator.flush()
+                accumulator.log_duplicates()
             # Additional rules required for output mapping
             for rule in self.output_spec.additional_rules():
                 log.debug('Program: Adding helper rule %r', rule)
@@ -159,73 +278,446 @@ class Program:
             for code in self.code_parts:
                 text_stream.write(code)
 
-        answer_sets = solver.run(
-            write_input=write_asp_input,
-            capture_predicates=self.output_spec.captured_predicates(),
-            file_args=self.file_parts,
-            options=options
-        )
-        return Results(answer_sets, self.output_spec, self.local_registry, cache)
+        # The output workers must be forked before the solver starts writing the input in a background thread
+        output_executor = None  # type: Optional[Executor]
+        if output_workers is not None:
+            output_executor = Results.start_workers(self.output_spec, self.local_registry, output_workers, memoize=memoize)
+        # The symbols of all answer sets are interned in a single table, which lives as long as the returned Results object
+        symbols = SymbolTable()
+        try:
+            answer_sets = solver.run(
+                write_input=write_asp_input,
+                capture_predicates=self.output_spec.captured_predicates(),
+                file_args=self.file_parts,
+                options=options,
+                symbols=symbols,
+            )
+        except BaseException:
+            if output_executor is not None:
+                output_executor.shutdown(wait=False)
+            raise
+        return Results(answer_sets, self.output_spec, self.local_registry, cache, symbols=symbols, lazy=lazy_output, workers=output_workers, memoize=memoize, executor=output_executor)
 
     def solve_one(self,
                   *input_arguments,
                   solver: Optional[Solver] = None,
-                  options: Optional[SolverOptions] = None) -> Optional['Result']:
+                  options: Optional[SolverOptions] = None,
+                  mapping_options: Optional[MappingOptions] = None) -> Optional['Result']:
         '''Solve the ASP program and return one of the computed answer sets, or None if no answer set exists. No special cleanup is necessary.'''
         options = SolverOptions() if options is None else copy(options)
         options.max_answer_sets = 1
-        with self.solve(*input_arguments, solver=solver, options=options, cache=False) as results:
+        with self.solve(*input_arguments, solver=solver, options=options, mapping_options=mapping_options, cache=False) as results:
             try:
                 return next(iter(results))
             except StopIteration:
                 return None
 
 
+def _quote_str(arg: str) -> str:
+    # Same as asp.quote, but without the conversion to str
+    return '"' + arg.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+# Maps the type of an argument to the function that formats it for the ASP solver (filled on demand, see `StreamAccumulator.formatter_for`)
+_arg_formatters = {
+    int: str,
+    str: _quote_str,
+}  # type: Dict[type, Callable[[Any], str]]
+
+
+def _fact_key(fact: str) -> bytes:
+    '''Return the key under which a formatted fact is remembered for deduplication.
+
+    A 128-bit digest takes less memory than most facts, and collisions (which would drop a distinct fact) are practically impossible.
+    '''
+    return hashlib.blake2b(fact.encode('UTF-8', 'surrogatepass'), digest_size=16).digest()
+
+
 class StreamAccumulator(FactAccumulator):
-    def __init__(self, output_stream: IO[str]) -> None:
+    # Buffer size (in facts) used by `Program.solve`
+    default_buffer_size = 4096
+
+    def __init__(self, output_stream: IO[str], *, buffer_size: int = 0, deduplicate: AbstractSet[str] = frozenset()) -> None:
+        '''Writes facts to the given stream.
+
+        If `buffer_size` is positive, up to that many facts are collected and then formatted column-wise and written with a single call to `output_stream.write`.
+        In that case, `flush` must be called after the last fact has been added, and the facts of different predicates may be written in a different order than they were added.
+
+        Facts of the predicates in `deduplicate` are only written the first time they are added.
+        The number of dropped duplicates is counted (by predicate) in the `duplicates` attribute.
+        '''
         if not output_stream.writable:
             raise ValueError('output_stream must be writable')
         self._stream = output_stream
-
-    def arg_str(self, arg: Any) -> str:
-        '''Convert the given argument to a string suitable to be passed to the ASP solver.'''
-        if isinstance(arg, numbers.Integral):
+        self._buffer_size = buffer_size
+        # The buffered argument tuples, by predicate and arity
+        self._buffer = {}  # type: Dict[Tuple[str, int], List[Sequence[Any]]]
+        self._buffered_facts = 0
+        self._deduplicate = deduplicate
+        # The keys of the formatted facts that have already been written (only of predicates that are deduplicated, see `_fact_key`)
+        self._seen = set()  # type: Set[bytes]
+        self.duplicates = Counter()  # type: Counter[str]
+        # Checking the log level for every fact is expensive, so we only do it once
+        self._debug = log.isEnabledFor(logging.DEBUG)  # type: ignore
+
+    @staticmethod
+    def formatter_for(arg_type: type) -> Callable[[Any], str]:
+        '''Return the function that converts arguments of the given type to strings suitable to be passed to the ASP solver.'''
+        try:
+            return _arg_formatters[arg_type]
+        except KeyError:
+            pass
+        if issubclass(arg_type, numbers.Integral):
             # Output integers without quotes (so we can use them for arithmetic in ASP)
-            return str(arg)
+            formatter = str  # type: Callable[[Any], str]
         else:
             # Everything else is converted to a string and quoted unconditionally
-            return asp.quote(arg)
+            formatter = asp.quote
+        _arg_formatters[arg_type] = formatter
+        return formatter
+
+    def arg_str(self, arg: Any) -> str:
+        '''Convert the given argument to a string suitable to be passed to the ASP solver.'''
+        return (_arg_formatters.get(type(arg)) or self.formatter_for(type(arg)))(arg)
 
     def add_fact(self, predicate: str, args: Sequence[Any]) -> None:
         '''Writes a fact to the output stream, in the usual ASP syntax: predicate(arg1, arg2, arg3).'''
         assert len(predicate) > 0
-        self._stream.write(predicate)
-        self._stream.write('(')
-        for (idx, arg) in enumerate(args):
-            if idx > 0:
-                self._stream.write(',')
-            self._stream.write(self.arg_str(arg))
-        self._stream.write(').\n')
-        if log.isEnabledFor(logging.DEBUG):  # type: ignore
+        if self._debug:
             fact = predicate + '(' + ', '.join(self.arg_str(x) for x in args) + ')'
             log.debug('StreamAccumulator: Adding fact for predicate %r with args %r:\t=> %s', predicate, args, fact)
+        if self._buffer_size > 0:
+            key = (predicate, len(args))
+            facts = self._buffer.get(key)
+            if facts is None:
+                facts = self._buffer[key] = []
+            facts.append(args)
+            self._buffered_facts += 1
+            if self._buffered_facts >= self._buffer_size:
+                self.flush()
+        else:
+            fact = predicate + '(' + ','.join([self.arg_str(arg) for arg in args]) + ').\n'
+            if predicate in self._deduplicate:
+                key = _fact_key(fact)
+                if key in self._seen:
+                    self.duplicates[predicate] += 1
+                    return
+                self._seen.add(key)
+            self._write_facts((fact,))
+
+    def add_facts(self, predicate: str, columns: Sequence[Sequence[Any]]) -> None:
+        '''Writes one fact per row of the given columns (see `FactAccumulator.add_facts`), formatting each column in bulk.'''
+        assert len(predicate) > 0
+        if self._debug:
+            # Log every single fact
+            super().add_facts(predicate, columns)
+            return
+        # Keep the facts in order (not required by the solver, but expected when unbuffered)
+        self.flush()
+        # NumPy arrays (or array.array, etc.) are converted to lists of Python objects in a single pass
+        columns = [column.tolist() if hasattr(column, 'tolist') else column for column in columns]  # type: ignore
+        rows = len(columns[0])
+        chunk_size = max(self._buffer_size, type(self).default_buffer_size) * 4
+        for start in range(0, rows, chunk_size):
+            chunk = [column[start:start + chunk_size] for column in columns]
+            facts = self.format_facts(predicate, chunk)
+            if predicate in self._deduplicate:
+                facts = self.unique_facts(predicate, facts)
+            self._write_facts(facts)
+
+    def format_facts(self, predicate: str, columns: Sequence[Sequence[Any]]) -> Iterable[str]:
+        '''Format the facts given by columns of arguments (of equal length, at least one column), returning one string per fact.'''
+        (fields, formatted_columns) = zip(*map(self.format_column, columns))
+        template = predicate.replace('{', '{{').replace('}', '}}') + '(' + ','.join(fields) + ').\n'
+        return map(template.format, *formatted_columns)
+
+    def format_column(self, column: Sequence[Any]) -> Tuple[str, Iterable[Any]]:
+        '''Prepare one column of arguments (i.e., the arguments at the same position of several facts) for formatting.
+
+        Returns a replacement field for `str.format` and the values to substitute.
+        '''
+        column_types = set(map(type, column))
+        if column_types == {int}:
+            return ('{}', column)
+        if column_types == {str}:
+            if any('"' in arg or '\\' in arg for arg in column):
+                return ('"{}"', [arg.replace('\\', '\\\\').replace('"', '\\"') for arg in column])
+            return ('"{}"', column)
+        return ('{}', list(map(self.arg_str, column)))
+
+    def unique_facts(self, predicate: str, facts: Iterable[str]) -> List[str]:
+        '''Return the given formatted facts of a predicate, without those that have been seen before (and without repetitions).'''
+        seen = self._seen
+        seen_add = seen.add
+        facts = list(facts)
+        unique = [fact for (fact, key) in zip(facts, map(_fact_key, facts)) if not (key in seen or seen_add(key))]  # type: ignore  # seen_add returns None
+        if len(unique) < len(facts):
+            self.duplicates[predicate] += len(facts) - len(unique)
+        return unique
+
+    def log_duplicates(self) -> None:
+        '''Log the number of dropped duplicate facts (at debug level).'''
+        for (predicate, count) in self.duplicates.items():
+            log.debug('StreamAccumulator: Dropped %d duplicate facts of predicate %r', count, predicate)
+
+    def flush(self) -> None:
+        '''Write all buffered facts to the output stream.'''
+        if self._buffered_facts == 0:
+            return
+        chunks = []  # type: List[str]
+        for ((predicate, arity), facts) in self._buffer.items():
+            if arity == 0:
+                formatted = [predicate + '().\n'] * len(facts)  # type: Iterable[str]
+            else:
+                formatted = self.format_facts(predicate, tuple(zip(*facts)))
+            if predicate in self._deduplicate:
+                formatted = self.unique_facts(predicate, formatted)
+            chunks.extend(formatted)
+        self._write_facts(chunks)
+        self._buffer.clear()
+        self._buffered_facts = 0
+
+    def _write_facts(self, facts: Iterable[str]) -> None:
+        self._stream.write(''.join(facts))
+
+
+class _FactListAccumulator(StreamAccumulator):
+    '''Collects the formatted facts in the list `facts` (one string per fact) instead of writing them to a stream.'''
+
+    def __init__(self, *, buffer_size: int = 0, deduplicate: AbstractSet[str] = frozenset()) -> None:
+        super().__init__(StringIO(), buffer_size=buffer_size, deduplicate=deduplicate)
+        self.facts = []  # type: List[str]
+
+    def _write_facts(self, facts: Iterable[str]) -> None:
+        self.facts.extend(facts)
+
+
+class InputCache:
+    '''Remembers the facts generated by the input mapping of each INPUT predicate, so repeated calls to `Program.solve` only need to map the predicates whose input arguments have changed.
+
+    The facts of a predicate are reused if the input arguments it depends on are the same objects as before, and have the same version:
+    * If an argument has an `aspio_version` attribute, its value is used as version. Update it whenever the object (or anything reachable from it) changes.
+    * Otherwise, the hash of the argument is used as version, unless the argument uses the default (identity-based) hash of `object`.
+      This is only safe for arguments that are immutable, including all objects that are reachable from them (e.g., a frozenset of tuples of numbers and strings).
+    * Arguments that have no `aspio_version` and are not hashable (or only by identity) are never cached.
+
+    Only the facts of the most recent call are kept for each predicate. The cache keeps references to the argument objects used as keys.
+    '''
+
+    def __init__(self) -> None:
+        # (id of input spec, predicate index) => (input spec, versions of the dependencies, referenced arguments, serialized facts (see `store`))
+        self._entries = {}  # type: Dict[Tuple[int, int], Tuple[InputSpec, Tuple[Any, ...], Tuple[Any, ...], Union[str, List[str]]]]
+        # Statistics, e.g. for testing
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def version(argument: Any) -> Optional[Tuple[int, Any]]:
+        '''Return the key identifying the current state of the given argument, or None if the argument cannot be cached.'''
+        try:
+            return (id(argument), argument.aspio_version)
+        except AttributeError:
+            pass
+        if type(argument).__hash__ is object.__hash__:
+            # The identity-based hash does not change when the object is modified
+            return None
+        try:
+            return (id(argument), hash(argument))
+        except TypeError:
+            return None
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def lookup(self, input_spec: InputSpec, index: int, arguments: Sequence[Any], *, deduplicated: bool = False) -> Optional[Union[str, List[str]]]:
+        '''Return the cached facts of the predicate at the given index, or None if they are not cached for the current state of the arguments.'''
+        entry = self._entries.get((id(input_spec), index))
+        if entry is not None and entry[1] == (deduplicated,) + tuple(self.version(arguments[i]) for i in input_spec.dependencies(index)):
+            self.hits += 1
+            return entry[3]
+        self.misses += 1
+        return None
+
+    def store(self, input_spec: InputSpec, index: int, arguments: Sequence[Any], facts: Union[str, List[str]], *, deduplicated: bool = False) -> None:
+        '''Remember the facts of the predicate at the given index, which have been generated from the given arguments.
+
+        The facts are either a single string, or a list with one string per fact (see `map_predicate_facts`); they are returned by `lookup` as they are, and must not be modified.
+        '''
+        slot = (id(input_spec), index)
+        dependencies = tuple(arguments[i] for i in input_spec.dependencies(index))
+        versions = tuple(map(self.version, dependencies))
+        if None not in versions:
+            self._entries[slot] = (input_spec, (deduplicated,) + versions, dependencies, facts)
+        else:
+            self._entries.pop(slot, None)
+
+    def write_facts(self, input_spec: InputSpec, arguments: Sequence[Any], text_stream: IO[str]) -> None:
+        '''Perform the input mapping (see `InputSpec.perform_mapping`) and write the facts to the given stream, reusing cached facts where possible.'''
+        write_input_facts(input_spec, arguments, text_stream, input_cache=self)
+
+
+def map_predicate(input_spec: InputSpec, index: int, arguments: Sequence[Any], deduplicate: AbstractSet[str] = frozenset()) -> str:
+    '''Perform the input mapping of the predicate at the given index, and return the facts in ASP syntax.'''
+    # Note: this is a module-level function so it can be used with a process pool
+    buf = StringIO()
+    accumulator = StreamAccumulator(buf, buffer_size=StreamAccumulator.default_buffer_size, deduplicate=deduplicate)
+    input_spec.perform_predicate_mapping(index, arguments, accumulator)
+    accumulator.flush()
+    accumulator.log_duplicates()
+    return buf.getvalue()
+
+
+def map_predicate_facts(input_spec: InputSpec, index: int, arguments: Sequence[Any], deduplicate: AbstractSet[str] = frozenset()) -> List[str]:
+    '''Perform the input mapping of the predicate at the given index, and return the facts in ASP syntax (one string per fact).'''
+    # Note: the facts cannot be split after joining them, since quoted strings may contain line breaks
+    accumulator = _FactListAccumulator(buffer_size=StreamAccumulator.default_buffer_size, deduplicate=deduplicate)
+    input_spec.perform_predicate_mapping(index, arguments, accumulator)
+    accumulator.flush()
+    accumulator.log_duplicates()
+    return accumulator.facts
+
+
+def _unseen_facts(facts: Sequence[str], seen: Set[bytes]) -> str:
+    '''Return the given facts (one string per fact) without those whose keys are in `seen` (see `_fact_key`), and add their keys to `seen`.'''
+    seen_add = seen.add
+    return ''.join([fact for (fact, key) in zip(facts, map(_fact_key, facts)) if not (key in seen or seen_add(key))])  # type: ignore  # seen_add returns None
+
+
+def write_input_facts(input_spec: InputSpec,
+                      arguments: Sequence[Any],
+                      text_stream: IO[str],
+                      *,
+                      input_cache: Optional[InputCache] = None,
+                      executor: Optional['Executor'] = None,
+                      deduplicate: AbstractSet[str] = frozenset(),
+                      predicates: Optional[AbstractSet[str]] = None) -> None:
+    '''Perform the input mapping predicate by predicate and write the facts to the given stream.
+
+    Facts are reused from the `input_cache` if possible (and the cache is updated with the others).
+    If an `executor` is given, the predicates are mapped concurrently; the facts are still written in order of the predicates, from the calling thread.
+    Duplicate facts of the predicates in `deduplicate` are removed (also if they are generated by different predicate mappings).
+    If a set of `predicates` is given, only the facts of predicates with these names are written.
+    '''
+    if len(arguments) != len(input_spec.parameters):
+        raise ValueError('Wrong number of arguments: expecting {0}, got {1}'.format(len(input_spec.parameters), len(arguments)))
+    # For each predicate: the cached facts, a future (if an executor is used), or None (to be mapped when it is written)
+    pending = []  # type: List[Union[str, List[str], Future, None]]
+    try:
+        # Only pass the names that are relevant for the respective predicate mapping
+        deduplicated = [frozenset({p.predicate}) & deduplicate for p in input_spec.predicates]
+        # Each mapping removes its own duplicates, so facts only need to be compared across mappings of the same predicate
+        mappings = Counter(p.predicate for p in input_spec.predicates)
+        # The keys of the facts written so far, for each deduplicated predicate with several mappings
+        seen = {pred: set() for pred in deduplicate if mappings[pred] > 1}  # type: Dict[str, Set[bytes]]
+        # The facts of these predicates are kept as separate strings, so they can be compared with each other
+        mappers = [map_predicate_facts if p.predicate in seen else map_predicate for p in input_spec.predicates]  # type: List[Callable[..., Union[str, List[str]]]]
+        for index in range(len(input_spec.predicates)):
+            if predicates is not None and input_spec.predicates[index].predicate not in predicates:
+                pending.append('')  # skipped
+                continue
+            facts = input_cache.lookup(input_spec, index, arguments, deduplicated=bool(deduplicated[index])) if input_cache is not None else None
+            if facts is None and executor is not None:
+                # Only pass the arguments that are actually needed (relevant if they have to be pickled)
+                dependencies = input_spec.dependencies(index)
+                needed_arguments = tuple(arg if i in dependencies else None for (i, arg) in enumerate(arguments))
+                pending.append(executor.submit(mappers[index], input_spec, index, needed_arguments, deduplicated[index]))
+            else:
+                pending.append(facts)
+        for (index, item) in enumerate(pending):
+            if isinstance(item, (str, list)):
+                facts = item
+            else:
+                facts = item.result() if item is not None else mappers[index](input_spec, index, arguments, deduplicated[index])
+                if input_cache is not None:
+                    input_cache.store(input_spec, index, arguments, facts, deduplicated=bool(deduplicated[index]))
+            if isinstance(facts, list):
+                facts = _unseen_facts(facts, seen[input_spec.predicates[index].predicate])
+            text_stream.write(facts)
+    finally:
+        # Only relevant if an exception occurred
+        for item in pending:
+            if item is not None and not isinstance(item, (str, list)):
+                item.cancel()
 
 
 class Results(Iterable['Result']):
-    '''The collection of results of a Solver invocation, corresponding to the set of all answer sets.'''
+    '''The collection of results of a Solver invocation, corresponding to the set of all answer sets.
+
+    If `workers` is given, all top-level names of every answer set are mapped in a pool of worker processes,
+    each of which compiles the output specification once for its own copy of the registry.
+    The registered constructors must be picklable by reference (i.e., importable by their qualified names), and the mapped objects (and any exceptions raised while mapping them) must be picklable.
+    While the workers are busy, further answer sets are requested from the solver (up to a fixed number ahead of the consumer); the results are still yielded in solver order.
+    '''
     # TODO: Describe implicit access to mapped objects through __getattr__ (e.g. .all_graph iterates over answer sets, returning the "graph" object for every answer set)
     # TODO: Should support async/await
 
-    def __init__(self, answer_sets: ClosableIterable[asp.RawAnswerSet], output_spec: OutputSpec, registry: Registry, cache: bool) -> None:
+    def __init__(self,
+                 answer_sets: ClosableIterable[asp.RawAnswerSet],
+                 output_spec: OutputSpec,
+                 registry: Registry,
+                 cache: bool,
+                 *,
+                 symbols: Optional[SymbolTable] = None,
+                 lazy: bool = False,
+                 workers: Optional[int] = None,
+                 memoize: bool = False,
+                 executor: Optional['Executor'] = None) -> None:
+        '''If `workers` is given, the pool may be passed as `executor` (see `start_workers`); otherwise it is started when the iteration begins.'''
         self.output_spec = output_spec
         self.registry = registry
+        self.lazy = lazy
+        self.workers = workers
+        self.memoize = memoize
+        # The objects created by pure constructors, shared by all answer sets (if `memoize` is true)
+        self.memo = {} if memoize else None  # type: Optional[Dict[Any, Any]]
+        self.executor = executor
         self.answer_sets = answer_sets
-        self.results = (
-            Result(answer_set, self.output_spec, self.registry) for answer_set in self.answer_sets
-        )  # type: Iterable[Result]
+        # The symbol table shared by all answer sets of this solver invocation (if any)
+        self.symbols = symbols
+        self._compiled_output_spec = None  # type: Optional[CompiledOutputSpec]
+        if workers is None:
+            self.results = (
+                Result(answer_set, self.compiled_output_spec, self.registry) for answer_set in self.answer_sets
+            )  # type: Iterable[Result]
+        else:
+            self.results = self._map_in_workers()
         if cache:
             self.results = CachingIterable(self.results)
 
+    @property
+    def compiled_output_spec(self) -> CompiledOutputSpec:
+        '''The output specification compiled for the registry (see `OutputSpec.compile`).
+
+        It is compiled when the first answer set is mapped, so constructors may still be registered after calling `Program.solve`.
+        '''
+        if self._compiled_output_spec is None:
+            self._compiled_output_spec = self.output_spec.compile(self.registry, lazy=self.lazy, memo=self.memo)
+        return self._compiled_output_spec
+
+    @staticmethod
+    def start_workers(output_spec: OutputSpec, registry: Registry, workers: int, *, memoize: bool = False) -> 'Executor':
+        '''Start a pool of worker processes for mapping answer sets with the given output specification and registry (see `start_process_pool`).'''
+        return start_process_pool(workers, initializer=_init_output_worker, initargs=(output_spec, registry, memoize))
+
+    def _map_in_workers(self) -> Iterator['Result']:
+        assert self.workers is not None
+        if self.executor is None:
+            self.executor = Results.start_workers(self.output_spec, self.registry, self.workers, memoize=self.memoize)
+        # The answer sets that have been sent to the workers, but whose results have not been yielded yet
+        pending = deque()  # type: Deque[asp.RawAnswerSet]
+
+        def plain_answer_sets() -> Iterator[Dict[str, List[Tuple[str, ...]]]]:
+            for answer_set in self.answer_sets:
+                pending.append(answer_set)
+                # Lazy or columnar answer sets are converted to plain data, which is cheaper to pickle
+                yield {pred: list(facts) for (pred, facts) in answer_set.items()}
+
+        try:
+            for mapped in ordered_map(self.executor, _map_output, plain_answer_sets(), window=2 * self.workers):
+                yield Result(pending.popleft(), self.output_spec, self.registry, mapped=MappedObjects(mapped))
+        finally:
+            self.executor.shutdown(wait=False)
+
     def __iter__(self) -> Iterator['Result']:
         # Make sure we can only create one results iterator if we aren't caching
         assert self.results is not None, 'Pass cache=True if you need to iterate over results multiple times.'
@@ -252,6 +744,8 @@ class Results(Iterable['Result']):
             raise AttributeError("No attribute with name {0!r}. Prefix an output variable name with '{1!s}' when iterating over its values for all answer sets.".format(name, prefix))
 
     def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
         self.answer_sets.close()
 
     def __enter__(self) -> 'Results':
@@ -284,12 +778,53 @@ class ResultsAttributeIterator(Iterable[Any]):
         return False
 
 
+# The compiled output specification of a worker process (see `Results`)
+_worker_output_spec = None  # type: Optional[CompiledOutputSpec]
+_worker_registry = None  # type: Optional[Registry]
+
+
+def _init_output_worker(output_spec: OutputSpec, registry: Registry, memoize: bool) -> None:
+    global _worker_output_spec, _worker_registry
+    _worker_output_spec = output_spec.compile(registry, memo={} if memoize else None)
+    _worker_registry = registry
+
+
+def _map_output(answer_set: asp.RawAnswerSet) -> Dict[str, Tuple[Any, Optional[Exception]]]:
+    '''Map all top-level names of the given answer set in a worker process. Returns each object, or the exception raised while mapping it, by name.'''
+    assert _worker_output_spec is not None and _worker_registry is not None
+    r = _worker_output_spec.prepare_mapping(answer_set, _worker_registry)
+    mapped = {}  # type: Dict[str, Tuple[Any, Optional[Exception]]]
+    for name in _worker_output_spec.exprs:
+        try:
+            mapped[name] = (r.get_object(name), None)
+        except Exception as e:
+            mapped[name] = (None, e)
+    return mapped
+
+
+class MappedObjects:
+    '''The objects of an answer set that have been mapped in a worker process (provides the same `get_object` method as `OutputResult`).'''
+
+    def __init__(self, mapped: Mapping[str, Tuple[Any, Optional[Exception]]]) -> None:
+        self.mapped = mapped
+
+    def get_object(self, name: str) -> Any:
+        try:
+            (obj, error) = self.mapped[name]
+        except KeyError:
+            raise UndefinedNameError('No top-level name "{0}".'.format(name))
+        if error is not None:
+            raise error
+        return obj
+
+
 class Result:
     '''Represents a single answer set.'''
 
-    def __init__(self, answer_set: asp.RawAnswerSet, output_spec: OutputSpec, registry: Registry) -> None:
+    def __init__(self, answer_set: asp.RawAnswerSet, output_spec: Union[OutputSpec, CompiledOutputSpec], registry: Registry, *, mapped: Optional[MappedObjects] = None) -> None:
+        '''If `mapped` is given, the objects have already been mapped (by a worker process) and `output_spec` is not used.'''
         self.answer_set = answer_set
-        self._r = output_spec.prepare_mapping(answer_set, registry)
+        self._r = mapped if mapped is not None else output_spec.prepare_mapping(answer_set, registry)  # type: Union[MappedObjects, Any]
 
     def get(self, name: str) -> Any:
         return self._r.get_object(name)
@@ -2,7 +2,7 @@ import importlib
 import logging
 from copy import copy
 from types import ModuleType
-from typing import Any, AbstractSet, Callable, Iterable, Mapping, MutableMapping, Optional, Sequence, Union  # noqa
+from typing import Any, AbstractSet, Callable, Iterable, Mapping, MutableMapping, Optional, Sequence, Set, Union  # noqa
 
 __all__ = [
     'Constructor',
@@ -17,6 +17,8 @@ log = logging.getLogger(__name__)
 
 Constructor = Callable[..., object]
 
+_not_cached = object()  # sentinel value for Registry._resolved
+
 
 class Registry:
     # Default constructors for collections (global setting)
@@ -29,6 +31,10 @@ class Registry:
         self._registered_names = {
             'int': int  # 'int' constructor must be available as per the language specification
         }  # type: MutableMapping[str, Constructor]
+        # The names of constructors that have been registered as pure (see `register`)
+        self._pure_names = {'int'}  # type: Set[str]
+        # Results of `resolve` (including None for names that cannot be resolved), cleared whenever a name is registered
+        self._resolved = {}  # type: MutableMapping[str, Optional[Constructor]]
         # Default constructors for collections (local setting)
         self.tuple_constructor = type(self).tuple_constructor  # type: ignore  # bug in mypy: https://github.com/python/mypy/issues/708
         self.set_constructor = type(self).set_constructor  # type: ignore
@@ -38,13 +44,29 @@ class Registry:
     def __copy__(self) -> 'Registry':
         other = Registry()
         other._registered_names = copy(self._registered_names)
+        other._pure_names = copy(self._pure_names)
         return other
 
-    def register(self, constructor: Constructor, name: str = None, *, replace: bool = False) -> None:
+    def __getstate__(self) -> Mapping[str, Any]:
+        # The constructors are pickled by reference (i.e., by import path); the cached results of `resolve` are recomputed after unpickling
+        state = dict(self.__dict__)
+        del state['_resolved']
+        return state
+
+    def __setstate__(self, state: Mapping[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._resolved = {}
+
+    def register(self, constructor: Constructor, name: str = None, *, replace: bool = False, pure: bool = False) -> None:
         '''Register the given constructor with the given name.
 
         If `name` is not given, it defaults to `constructor.__name__` (raising a `ValueError` if this attribute does not exist).
 
+        Pass `pure=True` if the constructor always returns equivalent objects for equal arguments, has no side effects,
+        and the returned objects are never modified (e.g., immutable value types like named tuples).
+        Objects of pure constructors may be shared between answer sets (see `MappingOptions.memoize`), unless some of their arguments are created by constructors that are not pure.
+        The builtin 'int' constructor is registered as pure.
+
         Raises a `ValueError` when trying to re-register a name with a different constructor (unless `replace` is `True`).
         Raises a `ValueError` when the constructor argument is not callable.
         '''
@@ -57,14 +79,21 @@ class Registry:
             if self._registered_names[name] is constructor:
                 # If we try to register the same object again, there is no problem.
                 # This might happen in practice when calling `register_dict` with `globals()`, since all the imported names are registered too.
+                if pure:
+                    self._pure_names.add(name)
                 return
             raise ValueError('Name {0!r} is already registered. Pass replace=True to re-register.'.format(name))
         if not callable(constructor):
             raise ValueError('The constructor argument must be callable.')
         log.debug('Registry: registering name %r with constructor %r', name, constructor)
         self._registered_names[name] = constructor
+        if pure:
+            self._pure_names.add(name)
+        else:
+            self._pure_names.discard(name)
+        self._resolved.clear()
 
-    def register_dict(self, name_dict: Mapping[str, Any]) -> None:
+    def register_dict(self, name_dict: Mapping[str, Any], *, pure: bool = False) -> None:
         '''Import names from the given dict.
 
         Skips entries where the associated constructor is not callable.
@@ -77,9 +106,9 @@ class Registry:
             if name.startswith('__') and name.endswith('__'):
                 continue
             if callable(obj):
-                self.register(obj, name)
+                self.register(obj, name, pure=pure)
 
-    def import_from_module(self, names: Iterable[str], module_or_module_name: Union[ModuleType, str], package: Optional[str] = None) -> None:
+    def import_from_module(self, names: Iterable[str], module_or_module_name: Union[ModuleType, str], package: Optional[str] = None, *, pure: bool = False) -> None:
         '''Import names from the given module.
 
         All objects bound to the given names in the module are registered.
@@ -91,18 +120,36 @@ class Registry:
         else:
             module = importlib.import_module(module_or_module_name, package=package)
         for name in names:
-            self.register(getattr(module, name), name)
+            self.register(getattr(module, name), name, pure=pure)
 
     def get(self, name: str) -> Constructor:
         '''Return the constructor registered to `name`, or `None` if the name is not registered.'''
         return self._registered_names.get(name)
 
+    def is_pure(self, name: str) -> bool:
+        '''Return true iff a constructor has been registered as pure with the given name (see `register`).'''
+        return name in self._pure_names
+
     def resolve(self, name: str) -> Constructor:
         '''Resolve the given (possibly qualified) name.
 
         The name is split into parts separated by dots.
         The leftmost (top level) name is looked up in this registry or, if it is not registered, imported as module.
+
+        The results are cached until the next name is registered (also if the name cannot be resolved, to avoid repeated import attempts).
+        Call `clear_resolve_cache` if a name should be resolved again for other reasons (e.g., after changing `sys.path`).
         '''
+        constructor = self._resolved.get(name, _not_cached)
+        if constructor is _not_cached:
+            constructor = self._resolve(name)
+            self._resolved[name] = constructor
+        return constructor  # type: ignore
+
+    def clear_resolve_cache(self) -> None:
+        '''Forget the results of previous calls to `resolve`.'''
+        self._resolved.clear()
+
+    def _resolve(self, name: str) -> Optional[Constructor]:
         toplevel, *parts = name.split('.')
         obj = self.get(toplevel)  # type: Any
         if obj is None:
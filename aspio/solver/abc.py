@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from copy import copy
 from typing import Callable, IO, Iterable, Optional, Sequence  # noqa
+from ..answer_set import SymbolTable
 from ..helper.typing import ClosableIterable
 from .. import asp
 
@@ -15,7 +16,9 @@ class SolverOptions:
                  max_answer_sets: Optional[int] = None,
                  max_int: Optional[int] = None,
                  capture: Optional[Iterable[str]] = None,
-                 custom: Optional[Sequence[str]] = None) -> None:
+                 custom: Optional[Sequence[str]] = None,
+                 compact_answer_sets: bool = False,
+                 parse_workers: Optional[int] = None) -> None:
         self.max_answer_sets = max_answer_sets
         '''Instruct the solver to compute at most `max_answer_sets` answer sets. Compute all answer sets if `None`.'''
         self.max_int = max_int
@@ -25,6 +28,10 @@ class SolverOptions:
         # TODO: Provide some "sentinel" value for the capture options that just means "capture everything"
         self.custom = custom
         '''Custom solver options, passed to the solver as-is'''
+        self.compact_answer_sets = compact_answer_sets
+        '''Store the raw answer sets in a compact, columnar representation. Needs less memory, but accessing the raw facts is slower.'''
+        self.parse_workers = parse_workers
+        '''Parse the answer sets in a pool of `parse_workers` processes, while the solver keeps computing further answer sets. Parse on the calling thread if `None`.'''
         # TODO: Add a "timeout" option? => creates a watchdog thread that just kills the solver after the time elapses (prompting a SolverTimeoutExpired exception or something like that.)
 
     def __copy__(self) -> 'SolverOptions':
@@ -32,7 +39,9 @@ class SolverOptions:
             max_answer_sets=self.max_answer_sets,
             max_int=self.max_int,
             capture=copy(self.capture),
-            custom=copy(self.custom))
+            custom=copy(self.custom),
+            compact_answer_sets=self.compact_answer_sets,
+            parse_workers=self.parse_workers)
 
 
 class Solver(ABC):
@@ -43,7 +52,12 @@ class Solver(ABC):
             write_input: Callable[[IO[str]], None],
             capture_predicates: Iterable[str],
             file_args: Iterable[str],
-            options: SolverOptions = None) -> ClosableIterable[asp.RawAnswerSet]:
+            options: SolverOptions = None,
+            symbols: Optional[SymbolTable] = None) -> ClosableIterable[asp.RawAnswerSet]:
+        '''Run the solver on the given program and return an iterable over its answer sets.
+
+        If a symbol table is given, the constants of all answer sets are interned in it.
+        '''
         pass
 
     @abstractmethod
@@ -1,17 +1,19 @@
-import io
 import os
 import signal
 import subprocess  # type: ignore
 import weakref
 from copy import copy
+from functools import partial
 from itertools import chain
-from typing import Callable, IO, Iterable, Iterator, Optional
+from typing import Callable, IO, Iterable, Iterator, Optional, TYPE_CHECKING
 from ..helper.typing import ClosableIterable
-from ..errors import SolverError, SolverSubprocessError
-from ..helper import FilesystemIPC, StreamCaptureThread, TemporaryFile, TemporaryNamedPipe
-from ..parser import parse_answer_set, ParseException
+from ..answer_set import parse_answer_set, ColumnarAnswerSet, RawLine, SymbolTable
+from ..errors import SolverSubprocessError
+from ..helper import FilesystemIPC, InputWriter, StreamCaptureThread, TemporaryFile, TemporaryNamedPipe, ordered_map, read_lines, start_process_pool
 from .abc import Solver, SolverOptions
 from .. import asp
+if TYPE_CHECKING:
+    from concurrent.futures import Executor  # noqa
 
 
 class Dlvhex2Solver(Solver):
@@ -38,7 +40,8 @@ class Dlvhex2Solver(Solver):
             write_input: Callable[[IO[str]], None],
             capture_predicates: Iterable[str],
             file_args: Iterable[str],
-            options: Optional[SolverOptions]) -> ClosableIterable[asp.RawAnswerSet]:
+            options: Optional[SolverOptions],
+            symbols: Optional[SymbolTable] = None) -> ClosableIterable[asp.RawAnswerSet]:
         '''Run the dlvhex solver on the given program.'''
         # Prefer named pipes, but fall back to a file if pipes are not implemented for the current platform
         try:
@@ -49,7 +52,14 @@ class Dlvhex2Solver(Solver):
         if options is not None and options.capture is not None:
             capture_predicates = chain(capture_predicates, options.capture)
 
+        # The parsing workers must be forked before any other threads (e.g., the input writer) are started,
+        # and before the pipes to the solver are opened (so the workers do not keep them open)
+        workers = options.parse_workers if options is not None else None
+        executor = None  # type: Optional[Executor]
+
         try:
+            if workers is not None:
+                executor = start_process_pool(workers)
             args = [
                 self.executable,
                 # only print the answer sets themselves
@@ -72,6 +82,8 @@ class Dlvhex2Solver(Solver):
             args.extend(file_args)
 
             # If we have a temporary file, we must pass the data before starting the subprocess
+            # (so in this case, the input mapping cannot overlap with the solver's startup)
+            input_writer = None  # type: Optional[InputWriter]
             if isinstance(tmp_input, TemporaryFile):
                 with open(tmp_input.name, 'wt', encoding=self.encoding) as stream:
                     write_input(stream)
@@ -93,38 +105,49 @@ class Dlvhex2Solver(Solver):
 
             try:
                 # If we have a named pipe, we must pass the data after starting the subprocess,
-                # or we risk a deadlock by filling the pipe's buffer
+                # or we risk a deadlock by filling the pipe's buffer.
+                # The input is written in the background, so we can return immediately
+                # (errors during the input mapping are raised by the DlvhexLineReader).
                 if isinstance(tmp_input, TemporaryNamedPipe):
-                    with open(tmp_input.name, 'wt', encoding=self.encoding) as stream:
-                        write_input(stream)
-                    # At this point the input pipe is flushed and closed, and dlvhex2 starts processing
+                    input_writer = InputWriter(tmp_input.name, self.encoding, write_input)
+                    input_writer.start()
+                    # When the input writer has finished, the input pipe is flushed and closed, and dlvhex2 starts processing
 
-                lines = DlvhexLineReader(process=process, encoding=self.encoding, tmp_input=tmp_input)
-                return AnswerSetParserIterable(lines)
+                lines = DlvhexLineReader(process=process, encoding=self.encoding, tmp_input=tmp_input, input_writer=input_writer)
+                compact = options is not None and options.compact_answer_sets
+                return AnswerSetParserIterable(lines, encoding=self.encoding, symbols=symbols, compact=compact, workers=workers, executor=executor)
             except:
                 process.kill()
                 process.wait()  # need to wait for the process to exit to prevent ResourceWarning on Python 3.6+
+                if input_writer is not None:
+                    input_writer.close()
                 # Close streams to prevent ResourceWarnings
                 process.stdin.close()
                 process.stdout.close()
                 process.stderr.close()
                 raise
-        except:
+        except BaseException:
+            if executor is not None:
+                executor.shutdown(wait=False)
             tmp_input.cleanup()
             raise
 
 
-class DlvhexLineReader(ClosableIterable[str]):
+class DlvhexLineReader(ClosableIterable[bytes]):
     '''Wraps a process and provides its standard output for line-based iteration.
 
+    The lines are returned as undecoded `bytes` (without line terminators), see `AnswerSetParserIterable`.
+
     It is only possible to iterate *once* over a DlvhexLineReader instance.
 
     If the process exits with a return code other than 0,
     a SolverSubprocessError will be thrown during iteration, containing the return code and stderr output of the process.
+    If an error occurred while writing the solver's input in the background (see `InputWriter`), it is raised during iteration as well.
     '''
 
-    def __init__(self, *, process: subprocess.Popen, encoding: str, tmp_input: FilesystemIPC) -> None:
+    def __init__(self, *, process: subprocess.Popen, encoding: str, tmp_input: FilesystemIPC, input_writer: Optional[InputWriter] = None) -> None:
         self.process = process
+        self.input_writer = input_writer
         self.stdout_encoding = encoding
         self.iterating = False
         #
@@ -136,17 +159,22 @@ class DlvhexLineReader(ClosableIterable[str]):
         # Set up finalization. Using weakref.finalize seems to work more robustly than using __del__.
         # (One problem that occurred with __del__: It seemed like python was calling __del__ for self.process and its IO streams first,
         # which resulted in ResourceWarnings even though we were closing the streams properly in our __del__ function.)
-        self._finalize = weakref.finalize(self, DlvhexLineReader.__close, process, self.stderr_capture_thread, encoding, tmp_input)  # type: ignore
+        self._finalize = weakref.finalize(self, DlvhexLineReader.__close, process, self.stderr_capture_thread, encoding, tmp_input, input_writer)  # type: ignore
         # Make sure the subprocess will be terminated if it's still running when the python process exits
         self._finalize.atexit = True
 
-    def __iter__(self) -> Iterator[str]:
+    def __iter__(self) -> Iterator[bytes]:
         '''Return an iterator over the lines written to stdout. May only be called once! Might raise a SolverSubprocessError.'''
         assert not self.iterating, 'You may only iterate once over a single DlvhexLineReader instance.'
         self.iterating = True
-        # Requirement: dlvhex2 needs to flush stdout after every line
-        with io.TextIOWrapper(self.process.stdout, encoding=self.stdout_encoding) as stdout_lines:
-            for line in stdout_lines:
+        try:
+            # Requirement: dlvhex2 needs to flush stdout after every line
+            # Note: The lines are not decoded here, since a single answer set may be hundreds of megabytes large,
+            #       and usually only some of its atoms are needed.
+            for line in read_lines(self.process.stdout):  # type: ignore  # stdout is a binary pipe
+                if self.input_writer is not None:
+                    # Do not yield answer sets computed from incomplete input
+                    self.input_writer.check()
                 yield line
                 # Tell dlvhex2 to prepare the next answer set
                 if not self.process.stdin.closed:
@@ -154,15 +182,31 @@ class DlvhexLineReader(ClosableIterable[str]):
                     self.process.stdin.flush()
                 else:
                     break
-        # We've exhausted stdout, so either:
-        #   1. we got all answer sets, or
-        #   2. an error occurred,
-        # and dlvhex closed stdout (and probably terminated).
-        # Give it a chance to terminate gracefully.
-        try:
-            self.process.wait(timeout=0.005)  # type: ignore (mypy does not know about `timeout`)
-        except subprocess.TimeoutExpired:  # type: ignore (mypy does not know about `TimeoutExpired`)
-            pass
+            # We've exhausted stdout, so either:
+            #   1. we got all answer sets, or
+            #   2. an error occurred,
+            # and dlvhex closed stdout (and probably terminated).
+            # Give it a chance to terminate gracefully.
+            try:
+                self.process.wait(timeout=0.005)  # type: ignore (mypy does not know about `timeout`)
+            except subprocess.TimeoutExpired:  # type: ignore (mypy does not know about `TimeoutExpired`)
+                pass
+            if self.input_writer is not None and self.input_writer.error is not None:
+                # Stop the process first, so the input error is raised instead of the resulting solver error
+                try:
+                    self.close()
+                except SolverSubprocessError:
+                    pass
+                self.input_writer.check()
+        except BaseException:
+            # Clean up in the same way as after normal termination (e.g., if the input mapping failed, or the consumer stopped early),
+            # otherwise the process would keep running until this object is garbage collected.
+            # An error of the process caused by stopping it must not hide the original exception.
+            try:
+                self.close()
+            except SolverSubprocessError:
+                pass
+            raise
         self.close()
 
     def close(self) -> None:
@@ -170,7 +214,7 @@ class DlvhexLineReader(ClosableIterable[str]):
 
     # We cannot have a reference to `self` because we must avoid reference cycles here (see weakref.finalize documentation).
     @staticmethod
-    def __close(process: subprocess.Popen, stderr_capture_thread: StreamCaptureThread[bytes], stderr_encoding: str, tmp_input: FilesystemIPC) -> None:
+    def __close(process: subprocess.Popen, stderr_capture_thread: StreamCaptureThread[bytes], stderr_encoding: str, tmp_input: FilesystemIPC, input_writer: Optional[InputWriter]) -> None:
         '''Shut down the process if it is still running. Raise a SolverSubprocessError if the process exited with an error.'''
         if process.poll() is None:
             # Still running? Kill the subprocess
@@ -196,6 +240,9 @@ class DlvhexLineReader(ClosableIterable[str]):
         process.stdin.close()
         process.stdout.close()
         stderr_capture_thread.join()  # ensure cleanup of stderr
+        if input_writer is not None:
+            # The writer might still be blocked on the pipe (e.g., if the process exited early)
+            input_writer.close()
         # Remove the temporary input pipe/file
         # Note: To clean up tmp_input in a reliable way, we must be sure dlvhex2 has already read all the data (or, has at the very least opened the file).
         #       Because of this, the earliest point where we are able to clean up tmp_input would be when dlvhex2 starts outputting the first answer set.
@@ -207,27 +254,53 @@ class DlvhexLineReader(ClosableIterable[str]):
 
 
 class AnswerSetParserIterable(ClosableIterable[asp.RawAnswerSet]):
-    def __init__(self, lines: ClosableIterable[str]) -> None:
-        self.lines = lines
+    def __init__(self,
+                 lines: ClosableIterable[RawLine],
+                 *,
+                 encoding: str = 'UTF-8',
+                 symbols: Optional[SymbolTable] = None,
+                 compact: bool = False,
+                 workers: Optional[int] = None,
+                 executor: Optional['Executor'] = None) -> None:
+        '''Parses each line as an answer set.
 
-    # @staticmethod
-    # def _parse(line):
-    #     try:
-    #         return parse_answer_set(line)
-    #     except ParseException:
-    #         e = SolverError('Unable to parse answer set received from solver')
-    #         e.line = line  # type: ignore
-    #         raise e
+        The lines may be given as `str`, or as `bytes` in the given encoding.
+
+        If `workers` is given, the lines are parsed in a pool of worker processes.
+        While the workers are busy, further lines are requested from the solver (up to a fixed number of lines ahead of the consumer).
+        The answer sets are still yielded in the order of the lines.
+        The pool may be passed as `executor` (which is shut down together with this object), otherwise it is started when the iteration begins (see `start_process_pool`).
+        '''
+        self.lines = lines
+        self.encoding = encoding
+        self.symbols = symbols
+        self.compact = compact
+        self.workers = workers
+        self.executor = executor
 
     def __iter__(self) -> Iterator[asp.RawAnswerSet]:
-        # return iter(map(type(self)._parse, self.lines))
-        for line in self.lines:
+        if self.workers is None:
+            for line in self.lines:
+                # Raises a SolverError if the line is not a valid answer set.
+                # The facts are decoded lazily since usually only a few of the captured predicates are needed for any given output name.
+                yield parse_answer_set(line, lazy=True, compact=self.compact, symbols=self.symbols, encoding=self.encoding)
+        else:
+            if self.executor is None:
+                self.executor = start_process_pool(self.workers)
             try:
-                yield parse_answer_set(line)
-            except ParseException:
-                e = SolverError('Unable to parse answer set received from solver')
-                e.line = line  # type: ignore
-                raise e
+                # The workers return plain dictionaries, the symbols are interned here
+                parse = partial(parse_answer_set, encoding=self.encoding)
+                for answer_set in ordered_map(self.executor, parse, self.lines, window=2 * self.workers):
+                    if self.compact:
+                        yield ColumnarAnswerSet(answer_set, self.symbols if self.symbols is not None else SymbolTable())
+                    elif self.symbols is not None:
+                        yield self.symbols.intern_answer_set(answer_set)
+                    else:
+                        yield answer_set
+            finally:
+                self.executor.shutdown(wait=False)
 
     def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
         self.lines.close()
@@ -0,0 +1,126 @@
+import logging
+import os
+from pathlib import Path
+from typing import MutableMapping, Optional, Tuple, Union  # noqa
+from .input import InputSpec
+from .output import OutputSpec
+from . import parser
+
+__all__ = [
+    'SpecCache',
+    'global_spec_cache',
+    'set_spec_cache_directory',
+]
+
+log = logging.getLogger(__name__)
+
+ParsedSpec = Tuple[Optional[InputSpec], Optional[OutputSpec]]
+
+# Increment whenever the classes of the specification syntax tree change in an incompatible way.
+# Cache entries written with a different format version are ignored.
+FORMAT_VERSION = 4
+
+
+class SpecCache:
+    '''Cache of parsed I/O specifications, keyed by a hash of the specification text.
+
+    Parsing a specification with the pyparsing grammar is slow, so programs that are created repeatedly with the same specifications can skip that step.
+    Entries are always kept in memory; if a `directory` is given, they are also stored there (as pickle files) and thus survive the current process.
+
+    Note that the directory must not be writable by untrusted users, since the cached files are unpickled.
+    '''
+
+    def __init__(self, directory: Optional[Union[str, Path]] = None) -> None:
+        self.directory = directory
+        self._entries = {}  # type: MutableMapping[str, ParsedSpec]
+
+    @property
+    def directory(self) -> Optional[Path]:
+        return self._directory
+
+    @directory.setter
+    def directory(self, value: Optional[Union[str, Path]]) -> None:
+        self._directory = Path(value) if value is not None else None
+
+    @staticmethod
+    def key(spec_text: str) -> str:
+        import hashlib  # imported on first use to keep `import aspio` fast (as are the modules for the on-disk cache below)
+        data = '{0}\n{1}'.format(FORMAT_VERSION, spec_text).encode('UTF-8')
+        return hashlib.sha256(data).hexdigest()
+
+    def parse_embedded_spec(self, code: str) -> ParsedSpec:
+        '''Extract and parse the I/O specifications embedded in the given ASP code (see `parser.parse_embedded_spec`), using cached results if possible.'''
+        return self.parse_extracted_spec(parser.EmbeddedSpecParser.extractFromString(code))
+
+    def parse_embedded_spec_file(self, filename: Union[str, Path], *, encoding: str = 'UTF-8') -> ParsedSpec:
+        '''Extract and parse the I/O specifications embedded in the given file, using cached results if possible.'''
+        return self.parse_extracted_spec(parser.EmbeddedSpecParser.extractFromFile(str(filename), encoding=encoding))
+
+    def parse_extracted_spec(self, spec_text: str) -> ParsedSpec:
+        '''Parse the given specification text (already extracted from '%!' comments), using cached results if possible.'''
+        if not spec_text.strip():
+            # Nothing to parse
+            return (None, None)
+        key = self.key(spec_text)
+        spec = self._entries.get(key)
+        if spec is None:
+            spec = self._load(key)
+        if spec is None:
+            spec = parser.parse_extracted_spec(spec_text)
+            self._store(key, spec)
+        self._entries[key] = spec
+        return spec
+
+    def clear(self) -> None:
+        '''Remove all entries from memory. Entries stored on disk are not affected.'''
+        self._entries.clear()
+
+    def _path(self, key: str) -> Path:
+        assert self.directory is not None
+        return self.directory / (key + '.pickle')
+
+    def _load(self, key: str) -> Optional[ParsedSpec]:
+        if self.directory is None:
+            return None
+        import pickle
+        path = self._path(key)
+        try:
+            with path.open('rb') as f:
+                spec = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # A corrupt or outdated entry is not fatal, we just parse the specification again
+            log.warning('SpecCache: Unable to load cached specification from %r: %r', str(path), e)
+            return None
+        log.debug('SpecCache: Loaded cached specification from %r', str(path))
+        return spec
+
+    def _store(self, key: str, spec: ParsedSpec) -> None:
+        if self.directory is None:
+            return
+        import pickle
+        import tempfile
+        path = self._path(key)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first, so concurrent readers never see a partially written entry
+            (fd, tmp_name) = tempfile.mkstemp(dir=str(self.directory), prefix='.tmp-', suffix='.pickle')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(spec, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_name, str(path))
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+        except OSError as e:
+            # The cache is only an optimization, so we do not fail if it cannot be written
+            log.warning('SpecCache: Unable to store specification to %r: %r', str(path), e)
+
+
+global_spec_cache = SpecCache()
+
+
+def set_spec_cache_directory(directory: Optional[Union[str, Path]]) -> None:
+    '''Store the specifications parsed by `Program` instances in the given directory, so they can be reused by other processes. Pass `None` to only cache in memory.'''
+    global_spec_cache.directory = directory
@@ -0,0 +1,169 @@
+import unittest
+from unittest import mock
+from .. import answer_set
+from .. import parser
+from ..errors import SolverError
+
+
+class TestAnswerSetParser(unittest.TestCase):
+
+    valid_lines = [
+        '{}',
+        '{}\n',
+        '  {}  \n',
+        '{p}\n',
+        '{p,q,-r}\n',
+        '{p(a),p(b),q(1,2,abc_D3)}\n',
+        '{p(a),q(x),p(b),-p(c),q(y)}\n',
+        r'{p("abc"),p("a,b"),p("a)b"),p("a}b"),p("")}' + '\n',
+        r'{p("a\"b"),p("a\\b"),p("\\"),p("a\tb"),p("a\xb")}' + '\n',
+        r'{p("x",1,y),q("(",")")}' + '\n',
+        # whitespace between the tokens is handled by the fallback
+        '{ p(a), q(b, "c") }\n',
+    ]
+
+    invalid_lines = [
+        '',
+        '\n',
+        '{',
+        '}',
+        '{p(a)',
+        '{p()}',
+        '{p(a,)}',
+        '{P(a)}',
+        '{p(A)}',
+        '{p(1a)}',
+        '{p(a)q(b)}',
+        '{p(a),}',
+        '{p(a)}}',
+        '{p("abc)}',
+        'p(a)',
+    ]
+
+    def test_same_result_as_pyparsing(self):
+        for line in self.valid_lines:
+            expected = parser.parse_answer_set(line)
+            actual = answer_set.parse_answer_set(line)
+            self.assertEqual({p: list(fs) for (p, fs) in actual.items()}, dict(expected), msg='for line {0!r}'.format(line))
+
+    def test_result_types(self):
+        # The scanner and the pyparsing fallback should return the same types
+        for line in ['{p(a),q(b,"c")}\n', '{ p(a), q(b, "c") }\n']:
+            for symbols in [None, answer_set.SymbolTable()]:
+                result = answer_set.parse_answer_set(line, symbols=symbols)
+                self.assertEqual(result, {'p': (('a',),), 'q': (('b', 'c'),)}, msg='for line {0!r}'.format(line))
+
+    def test_invalid_lines(self):
+        for line in self.invalid_lines:
+            with self.assertRaises(SolverError, msg='for line {0!r}'.format(line)) as cm:
+                answer_set.parse_answer_set(line)
+            self.assertEqual(cm.exception.line, line)
+
+    def test_escape_sequences(self):
+        line = r'{p("a\"b"),p("a\\b"),p("a\tb"),p("\q")}'
+        self.assertSetEqual(set(answer_set.parse_answer_set(line)['p']), {('a"b',), ('a\\b',), ('a\tb',), ('q',)})
+
+    def test_lazy_answer_set(self):
+        for line in self.valid_lines:
+            expected = parser.parse_answer_set(line)
+            lazy = answer_set.parse_answer_set(line, lazy=True)
+            self.assertSetEqual(set(lazy), set(expected), msg='for line {0!r}'.format(line))
+            self.assertEqual(len(lazy), len(expected))
+            for pred in expected:
+                self.assertIn(pred, lazy)
+                self.assertEqual(list(lazy.get(pred)), expected[pred], msg='for line {0!r}'.format(line))
+            self.assertIsNone(lazy.get('unknown'))
+
+    def test_lazy_decoding(self):
+        lazy = answer_set.parse_answer_set('{p(a),q(x),p(b),r}\n', lazy=True)
+        self.assertIsInstance(lazy, answer_set.LazyAnswerSet)
+        self.assertEqual(lazy['q'], (('x',),))
+        self.assertEqual(set(lazy._facts), {'q'})  # only the accessed predicate has been decoded
+        self.assertEqual(lazy['p'], (('a',), ('b',)))
+        self.assertEqual(lazy['r'], ((),))
+        self.assertIsNone(lazy._line)  # raw data is released after everything has been decoded
+
+    def test_lazy_invalid_line(self):
+        with self.assertRaises(SolverError):
+            answer_set.parse_answer_set('{p(a),q(}', lazy=True)
+
+    def test_symbol_table(self):
+        symbols = answer_set.SymbolTable()
+        line = '{p(abc,"x y"),p(1,"x y"),q(abc),r}\n'
+        as1 = answer_set.parse_answer_set(line, symbols=symbols)
+        as2 = answer_set.parse_answer_set(line, symbols=symbols, lazy=True)
+        self.assertEqual(dict(as1), dict(as2))
+        # Equal tuples and equal constants are represented by the same objects
+        self.assertIs(as1['p'][0], as2['p'][0])
+        self.assertIs(as1['p'][1][1], as1['p'][0][1])
+        self.assertIs(as1['q'][0][0], as2['p'][0][0])
+        self.assertEqual(len(symbols), 6)  # p, q, r, abc, x y, 1
+
+    def test_symbol_table_size(self):
+        # Every answer set has a different extension of p, but all of them use the same few constants
+        symbols = answer_set.SymbolTable()
+        symbols.max_tuples = 100
+        constants = ['c{0}'.format(i) for i in range(50)]
+
+        def parse(k):
+            facts = ','.join('p({0},{1})'.format(constants[(k + i) % 50], constants[(k * i) % 50]) for i in range(20))
+            return answer_set.parse_answer_set('{' + facts + '}', symbols=symbols)
+
+        def size():
+            return (len(symbols), len(symbols._tuples), len(symbols._ids), len(symbols.symbol_names))
+        for k in range(500):
+            self.assertEqual(len(parse(k)['p']), 20)
+        before = size()
+        for k in range(500, 2000):
+            parse(k)
+        self.assertEqual(size(), before)
+        self.assertEqual(len(symbols), 51)
+        self.assertLessEqual(len(symbols._tuples), 100)
+
+    def test_columnar_answer_set(self):
+        for line in self.valid_lines:
+            expected = parser.parse_answer_set(line)
+            compact = answer_set.parse_answer_set(line, compact=True)
+            self.assertSetEqual(set(compact), set(expected), msg='for line {0!r}'.format(line))
+            for pred in expected:
+                self.assertEqual(len(compact[pred]), len(expected[pred]))
+                self.assertEqual(list(compact[pred]), expected[pred], msg='for line {0!r}'.format(line))
+                self.assertEqual([compact[pred][i] for i in range(len(expected[pred]))], expected[pred])
+
+    def test_columnar_mixed_arities(self):
+        symbols = answer_set.SymbolTable()
+        compact = answer_set.parse_answer_set('{p,p(a),p(b,"c"),p(d)}', compact=True, symbols=symbols)
+        self.assertIsInstance(compact, answer_set.ColumnarAnswerSet)
+        self.assertSetEqual(set(compact['p']), {(), ('a',), ('b', 'c'), ('d',)})
+        self.assertEqual(compact['p'][-1], ('b', 'c'))
+        with self.assertRaises(IndexError):
+            compact['p'][4]
+        self.assertEqual(symbols.symbol_name(symbols.symbol_id('c')), 'c')
+        self.assertEqual(symbols.symbol_names[symbols.symbol_id('d')], 'd')
+
+    def test_columnar_from_spans(self):
+        # The columns are built from the raw line, the facts are not decoded to tuples first
+        for line in self.valid_lines:
+            expected = answer_set.parse_answer_set(line)
+            with mock.patch.object(answer_set, '_decode_facts', side_effect=AssertionError('facts decoded')):
+                compact = answer_set.parse_answer_set(line.encode('UTF-8'), compact=True)
+            self.assertEqual({p: list(fs) for (p, fs) in compact.items()}, {p: list(fs) for (p, fs) in expected.items()}, msg='for line {0!r}'.format(line))
+
+    def test_bytes_lines(self):
+        for line in self.valid_lines:
+            expected = answer_set.parse_answer_set(line)
+            raw = line.encode('UTF-8')
+            self.assertEqual(dict(answer_set.parse_answer_set(raw)), dict(expected), msg='for line {0!r}'.format(raw))
+            self.assertEqual(dict(answer_set.parse_answer_set(raw, lazy=True)), dict(expected), msg='for line {0!r}'.format(raw))
+            self.assertEqual({p: list(fs) for (p, fs) in answer_set.parse_answer_set(raw, compact=True).items()},
+                             {p: list(fs) for (p, fs) in expected.items()}, msg='for line {0!r}'.format(raw))
+
+    def test_bytes_encoding(self):
+        line = '{p("größe"),q(abc)}\n'
+        self.assertEqual(answer_set.parse_answer_set(line.encode('latin-1'), encoding='latin-1')['p'], (('größe',),))
+        self.assertEqual(answer_set.parse_answer_set(line.encode('UTF-8'), lazy=True)['p'], (('größe',),))
+
+    def test_invalid_bytes_lines(self):
+        for line in self.invalid_lines:
+            with self.assertRaises(SolverError, msg='for line {0!r}'.format(line)):
+                answer_set.parse_answer_set(line.encode('UTF-8'))
@@ -0,0 +1,33 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable] + list(args),
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, universal_newlines=True,
+                          cwd=str(Path(__file__).parents[2]))
+
+
+class TestImport(unittest.TestCase):
+
+    @unittest.skipIf(sys.version_info < (3, 7), 'the grammar is imported eagerly before Python 3.7 (see aspio.parser)')
+    def test_grammar_is_imported_lazily(self):
+        statement = 'import sys, aspio; print(sorted(m for m in sys.modules if m.startswith(("pyparsing", "aspio.grammar", "concurrent"))))'
+        self.assertEqual(run_python('-c', statement).stdout.strip(), '[]')
+        # ... but is available on first use
+        statement = 'import sys, aspio; aspio.InputSpec.parse("INPUT(x){p(x);}"); print("aspio.grammar" in sys.modules)'
+        self.assertEqual(run_python('-c', statement).stdout.strip(), 'True')
+        statement = 'import sys, pyparsing; from aspio.parser import ParseException; print(ParseException is pyparsing.ParseException)'
+        self.assertEqual(run_python('-c', statement).stdout.strip(), 'True')
+
+    def test_import_time_budget(self):
+        # Generous budget to avoid spurious failures on slow machines; a regression that imports pyparsing eagerly is caught by the test above.
+        budget_us = 250000
+        for _ in range(3):
+            stderr = run_python('-X', 'importtime', '-c', 'import aspio').stderr
+            cumulative_us = next(int(line.split('|')[1]) for line in stderr.splitlines() if line.split('|')[-1].strip() == 'aspio')
+            if cumulative_us <= budget_us:
+                break
+        self.assertLessEqual(cumulative_us, budget_us)
@@ -1,6 +1,7 @@
+import pickle
 import unittest
 from collections import defaultdict
-from ..input import InputSpec, FactAccumulator
+from ..input import Columns, InputSpec, FactAccumulator
 
 
 class TestAccumulator(FactAccumulator):
@@ -54,3 +55,99 @@ class TestInput(unittest.TestCase):
         # Compare generated facts
         for pred in expected_result:
             self.assertSetEqual(acc.facts[pred], expected_result[pred], msg='for predicate {0!r}'.format(pred))
+
+    def test_compiled_mapping_errors(self):
+        class Node:
+            def __init__(self, label):
+                self.label = label
+        spec = InputSpec.parse(r'''
+            INPUT (nodes, d) {
+                node(n.label) for (_, n) in nodes;
+                value(d["key"]);
+                pair(a, b) for (a, b) in d["pairs"];
+            }''')
+        invalid_arguments = [
+            ([Node(1), object()], {'key': 1, 'pairs': []}),  # missing attribute
+            ([Node(1)], {}),  # missing key
+            ([Node(1)], {'key': 1, 'pairs': 42}),  # not a collection
+            ([Node(1)], {'key': 1, 'pairs': {(1, 2, 3)}}),  # tuple length mismatch
+        ]
+        for args in invalid_arguments:
+            with self.assertRaises(ValueError) as cm_interpreted:
+                spec.perform_interpreted_mapping(args, TestAccumulator())
+            acc = TestAccumulator()
+            with self.assertRaises(ValueError) as cm_compiled:
+                spec.perform_mapping(args, acc)
+            self.assertEqual(str(cm_compiled.exception), str(cm_interpreted.exception))
+        # Valid arguments, and the same specification after pickling (which drops the generated code)
+        args = ([Node(1), Node('x')], {'key': 'k', 'pairs': {'a': 'b'}})
+        for s in (spec, pickle.loads(pickle.dumps(spec))):
+            acc = TestAccumulator()
+            s.perform_mapping(args, acc)
+            self.assertEqual(dict(acc.facts), {'node': {(1,), ('x',)}, 'value': {('k',)}, 'pair': {('a', 'b')}})
+
+    def test_compiled_mapping_accumulator_errors(self):
+        class FailingAccumulator(TestAccumulator):
+            def add_fact(self, predicate, args):
+                raise RuntimeError('cancelled')
+
+            def add_facts(self, predicate, columns):
+                raise RuntimeError('cancelled')
+
+        class Spy:
+            accesses = 0
+
+            @property
+            def label(self):
+                Spy.accesses += 1
+                return 'x'
+        spec = InputSpec.parse(r'''
+            INPUT (xs, cols) {
+                p(x.label) for (_, x) in xs;
+                q(a) for (a, _) in cols;
+            }''')
+        for args in ([[Spy()], Columns([], [])], [[], Columns([1], [2])]):
+            Spy.accesses = 0
+            with self.assertRaisesRegex(RuntimeError, 'cancelled'):
+                spec.perform_mapping(args, FailingAccumulator())
+            # The mapping has not been repeated by the interpreter
+            self.assertLessEqual(Spy.accesses, 1)
+
+    def test_columns(self):
+        cols = Columns([1, 2, 3], ['a', 'b', 'c'], [None, None, None])
+        self.assertEqual(len(cols), 3)
+        self.assertIn((2, 'b', None), cols)
+        with self.assertRaises(ValueError):
+            Columns([1, 2], [1])
+        spec = InputSpec.parse(r'''
+            INPUT (cols) {
+                p(b, a) for (a, b, _) in cols;      % mapped in bulk
+                q(a) for (a, b, c) in cols;         % mapped in bulk
+                r(a, a) for (a, _, _) in cols;      % mapped in bulk
+                s(b, x) for (a, b, _) in cols for x in cols;
+                t(a.real) for (a, _, _) in cols;
+            }''')
+
+        class BulkAccumulator(TestAccumulator):
+            def __init__(self):
+                super().__init__()
+                self.bulk = []
+
+            def add_facts(self, predicate, columns):
+                self.bulk.append(predicate)
+                super().add_facts(predicate, columns)
+
+        expected_result = {
+            'p': {('a', 1), ('b', 2), ('c', 3)},
+            'q': {(1,), (2,), (3,)},
+            'r': {(1, 1), (2, 2), (3, 3)},
+            's': {(b, x) for (_, b, _) in cols for x in cols},
+            't': {(1,), (2,), (3,)},
+        }
+        acc = BulkAccumulator()
+        spec.perform_mapping([cols], acc)
+        self.assertEqual(dict(acc.facts), expected_result)
+        self.assertEqual(acc.bulk, ['p', 'q', 'r'])
+        acc = TestAccumulator()
+        spec.perform_interpreted_mapping([cols], acc)
+        self.assertEqual(dict(acc.facts), expected_result)
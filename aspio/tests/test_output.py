@@ -1,6 +1,7 @@
 import unittest
 from ..output import OutputSpec
 from ..program import Program
+from ..registry import Registry
 from ..errors import CircularReferenceError, DuplicateKeyError, InvalidIndicesError, UndefinedNameError
 
 
@@ -21,6 +22,27 @@ class TestOutput(unittest.TestCase):
                 }
             ''')
 
+    def test_nested_query_variables(self):
+        # The value of V is only used by the nested queries, so it is captured for them
+        spec = OutputSpec.parse(r'''
+            OUTPUT {
+                x = dictionary { query: p(K,V); key: K; content: set { query: q(V,W); content: W; }; };
+                y = set { query: p(K,V); content: (K, set { query: r(W); content: (W, set { query: q(V,W,Z); content: Z; }); }); };
+            }
+        ''')
+        answer_set = {
+            'p': [('a', '1'), ('b', '2')],
+            'q': [('1', 'x'), ('1', 'y'), ('2', 'z'), ('1', 'x', 'u'), ('2', 'x', 'v')],
+            'r': [('x',)],
+        }
+        expected_x = {'a': {'x', 'y'}, 'b': {'z'}}
+        expected_y = {('a', frozenset({('x', frozenset({'u'}))})), ('b', frozenset({('x', frozenset({'v'}))}))}
+        registry = Registry()
+        for s in (spec, spec.compile(registry)):
+            r = s.prepare_mapping(answer_set, registry)
+            self.assertEqual(r.get_object('x'), expected_x)
+            self.assertEqual(r.get_object('y'), expected_y)
+
     def test_cycle_detection(self):
         spec = OutputSpec.parse(r'''
             OUTPUT {
@@ -210,3 +232,333 @@ class TestOutput(unittest.TestCase):
             %!  }
         ''').solve_one()
         self.assertSetEqual(result.x, {3, 4, 5})
+
+    def test_nested_container_index(self):
+        spec = OutputSpec.parse(r'''
+            OUTPUT {
+                d = dictionary {
+                    query: p(K, _);
+                    key: K;
+                    content: set { query: p(K, V); content: int(V); };
+                };
+                e = dictionary {
+                    query: p(K, V);
+                    key: (K, V);
+                    content: set { query: q(K, V, W); content: W; };
+                };
+            }
+        ''')
+        self.assertEqual(spec.exprs['d'].captured_variables, ('K',))
+        self.assertEqual(spec.exprs['d'].content.captured_variables, ('K', 'V'))
+        # Except for the outer dictionary of 'd', all collections read the original predicates directly
+        self.assertEqual([spec.exprs['d'].output_predicate, spec.exprs['d'].content.output_predicate], ['aspio__0', 'p'])
+        self.assertEqual([spec.exprs['e'].output_predicate, spec.exprs['e'].content.output_predicate], ['p', 'q'])
+        answer_set = {
+            'aspio__0': [('a',), ('c',)],
+            'p': [('a', '1'), ('a',), ('a', '2'), ('c', '3'), ('a', '1', '2')],  # tuples of other arities are ignored
+            'q': [('a', '1', 'x'), ('a', '1', 'y'), ('c', '3', 'z'), ('c', '1', 'w')],
+        }
+        r = spec.prepare_mapping(answer_set, Registry())
+        self.assertDictEqual(dict(r.get_object('d')), {'a': {1, 2}, 'c': {3}})
+        self.assertDictEqual(dict(r.get_object('e')), {('a', '1'): {'x', 'y'}, ('a', '2'): set(), ('c', '3'): {'z'}})
+
+    def test_shared_helper_predicates(self):
+        spec = OutputSpec.parse(r'''
+            OUTPUT {
+                a = set { query: p(X, Y), not q(Y); content: (X, Y); };
+                b = set { query: p(A, B), not q(B); content: Pair(A, B); };
+                c = set { query: p(X, Y), not q(Y); content: (Y, X); };
+                d = set { query: p(X), p(Y); content: (X, Y); };
+                e = set { query: p(A), p(B); content: (A, B); };
+                f = set { query: p(X, Y); content: X; };
+            }
+        ''')
+        self.assertEqual([spec.exprs[name].output_predicate for name in 'abcdef'], ['aspio__0', 'aspio__0', 'aspio__0', 'aspio__1', 'aspio__1', 'aspio__2'])
+        self.assertEqual(list(spec.additional_rules()), [
+            'aspio__0(X,Y) :- p(X,Y),not q(Y).',
+            'aspio__1(X,Y) :- p(X),p(Y).',
+            'aspio__2(X) :- p(X,Y).',
+        ])
+        self.assertEqual(spec.captured_predicates(), {'aspio__0', 'aspio__1', 'aspio__2'})
+
+    def test_direct_predicates(self):
+        spec = OutputSpec.parse(r'''
+            OUTPUT {
+                a = set { p/5 };
+                b = set { query: p(X, Y); content: (Y, X); };
+                c = set { query: p(X, X); content: X; };
+                d = set { query: p(X, a); content: X; };
+                e = set { query: p(X, _); content: X; };
+                f = set { query: -p(X); content: X; };
+                g = set { query: not p(X), q(X); content: X; };
+                h = set { query: q(X), p(X); content: X; };
+            }
+        ''')
+        self.assertEqual(spec.exprs['a'].output_predicate, 'p')
+        self.assertEqual(spec.exprs['b'].output_predicate, 'p')
+        self.assertEqual(list(spec.additional_rules()), [
+            'aspio__0(X) :- p(X,X).',
+            'aspio__1(X) :- p(X,a).',
+            'aspio__2(X) :- p(X,_).',
+            'aspio__3(X) :- -p(X).',
+            'aspio__4(X) :- not p(X),q(X).',
+            'aspio__5(X) :- q(X),p(X).',
+        ])
+        r = spec.prepare_mapping({'p': [('1', '2'), ('3',), ('1', '2', '3', '4', '5')]}, Registry())
+        self.assertEqual(r.get_object('a'), {('1', '2', '3', '4', '5')})
+        self.assertEqual(r.get_object('b'), {('2', '1')})
+
+    def test_compiled_mapping(self):
+        spec = OutputSpec.parse(r'''
+            OUTPUT {
+                constant = 25;
+                ref = &nested;
+                simple = set { p/2 };
+                unary = set { q/1 -> int };
+                objects = set { query: p(X, Y); content: Pair(Y, int(X), "c"); };
+                seq = sequence { query: s(X, I); index: I; content: (X); };
+                nested = dictionary {
+                    query: p(K, _);
+                    key: K;
+                    content: set { query: p(K, V), q(V); content: (int(V), &constant); };
+                };
+                deep = dictionary {
+                    query: p(A, B);
+                    key: (A, B);
+                    content: sequence { query: s(X, I); index: I; content: (A, B, X); };
+                };
+            }
+        ''')
+
+        class Pair:
+            def __init__(self, *args):
+                self.args = args
+
+            def __eq__(self, other):
+                return self.args == other.args
+
+            def __hash__(self):
+                return hash(self.args)
+
+        registry = Registry()
+        registry.register(Pair)
+        answer_set = {
+            'p': [('1', '2'), ('1', '3'), ('2', '3')],
+            'q': [('2',), ('3',)],
+            's': [('c', '1'), ('b', '0')],
+            # The tuples of the helper predicates, as computed by the solver
+            'aspio__0': [('1',), ('2',)],
+            'aspio__1': [('1', '2'), ('1', '3'), ('2', '3')],
+        }
+        self.assertEqual(list(spec.additional_rules()), ['aspio__0(K) :- p(K,_).', 'aspio__1(K,V) :- p(K,V),q(V).'])
+        compiled = spec.compile(registry)
+        for name in spec.exprs:
+            expected = spec.prepare_mapping(answer_set, registry).get_object(name)
+            self.assertEqual(compiled.prepare_mapping(answer_set, registry).get_object(name), expected, msg='for name {0}'.format(name))
+        self.assertEqual(compiled.prepare_mapping(answer_set, registry).get_object('seq'), [('b',), ('c',)])
+        # Errors are the same as in the interpreted mapping
+        for (spec_text, exception) in [
+            (r'OUTPUT { x = sequence { query: s(X, I); index: I; content: X; }; }', InvalidIndicesError),
+            (r'OUTPUT { x = dictionary { query: s(X, I); key: I; content: X; }; }', DuplicateKeyError),
+            (r'OUTPUT { x = set { query: s(X, I); content: Undefined(X, I); }; }', NotImplementedError),
+        ]:
+            compiled = OutputSpec.parse(spec_text).compile(registry)
+            with self.assertRaises(exception):
+                compiled.prepare_mapping({'s': [('a', '0'), ('b', '0')]}, registry).get_object('x')
+
+    def test_memoized_mapping(self):
+        spec = OutputSpec.parse(r'''
+            OUTPUT {
+                nodes = set { query: node(X); content: Node(X); };
+                labels = set { query: node(X); content: Label(X); };
+                pairs = set { query: edge(X, Y); content: (int(X), Node(Y)); };
+                edges = set { query: edge(X, Y); content: Edge(X, Node(Y)); };
+                words = set { query: node(X); content: Word(Letters(X)); };
+            }
+        ''')
+        constructed = []
+
+        def Node(label):
+            constructed.append(label)
+            return ('node', label)
+
+        def Label(label):
+            return ('label', label)
+
+        def Edge(x, y):
+            return (x, y)
+
+        def Letters(label):
+            return list(label)
+
+        def Word(letters):
+            return ''.join(letters)
+
+        registry = Registry()
+        registry.register(Node, pure=True)
+        registry.register(Label)
+        registry.register(Edge, pure=True)
+        registry.register(Letters)
+        registry.register(Word, pure=True)
+        answer_sets = [
+            {'node': [('1',), ('2',)], 'edge': [('1', '2')]},
+            {'node': [('2',), ('3',)], 'edge': [('1', '2'), ('2', '3')]},
+        ]
+
+        def shared(name, compiled):
+            (r1, r2) = (compiled.prepare_mapping(answer_set, registry) for answer_set in answer_sets)
+            (xs, ys) = (r1.get_object(name), r2.get_object(name))
+            common = [x for x in xs if x in ys]
+            self.assertGreater(len(common), 0)
+            return all(any(x is y for y in ys) for x in common)
+
+        memo = {}
+        compiled = spec.compile(registry, memo=memo)
+        # Objects of pure constructors and tuples are shared between answer sets
+        self.assertTrue(shared('nodes', compiled))
+        self.assertEqual(sorted(constructed), ['1', '2', '3'])
+        self.assertTrue(shared('pairs', compiled))
+        self.assertTrue(shared('edges', compiled))
+        self.assertEqual(len(constructed), 3)
+        # Other constructors are called for every answer set
+        self.assertFalse(shared('labels', compiled))
+        # Objects built from objects of other constructors are not memoized
+        self.assertEqual(compiled.prepare_mapping(answer_sets[0], registry).get_object('words'), {'1', '2'})
+        self.assertNotIn(Word, memo)
+        self.assertTrue(memo[Node])
+        # Without a memo, every answer set gets its own objects
+        self.assertFalse(shared('nodes', spec.compile(registry)))
+        self.assertFalse(shared('edges', spec.compile(registry)))
+
+    def test_memoized_mapping_with_impure_arguments(self):
+        spec = OutputSpec.parse(r'''
+            OUTPUT {
+                pairs = set { query: edge(X, Y); content: (int(X), Node(Y)); };
+                labels = set { query: edge(X, Y); content: Label(X, Node(Y)); };
+            }
+        ''')
+
+        class Node:
+            # Hashes by identity and may be modified by the caller
+            def __init__(self, label):
+                self.label = label
+
+        def Label(x, node):
+            return node.label
+
+        registry = Registry()
+        registry.register(Node)
+        registry.register(Label, pure=True)
+        memo = {}
+        compiled = spec.compile(registry, memo=memo)
+        answer_set = {'edge': [('1', '2')]}
+        results = []
+        for _ in range(100):
+            r = compiled.prepare_mapping(answer_set, registry)
+            results.append((r.get_object('pairs'), r.get_object('labels')))
+            self.assertEqual(r.get_object('labels'), {'2'})
+        # Every answer set gets its own Node objects, and the memo does not grow with the number of answer sets
+        ((first_pair,), _) = results[0]
+        ((last_pair,), _) = results[-1]
+        self.assertIsNot(first_pair[1], last_pair[1])
+        self.assertLessEqual(sum(len(objects) for objects in memo.values()), 1)
+
+    def test_memoized_none(self):
+        # Pure constructors may return None, which is memoized as well
+        spec = OutputSpec.parse(r'''
+            OUTPUT {
+                single = set { query: node(X); content: (Nothing(X), 1); };
+                pairs = set { query: edge(X, Y); content: (Nothing(X, Y), 2); };
+            }
+        ''')
+        calls = []
+
+        def Nothing(*args):
+            calls.append(args)
+            return None
+
+        registry = Registry()
+        registry.register(Nothing, pure=True)
+        compiled = spec.compile(registry, memo={})
+        answer_set = {'node': [('1',)], 'edge': [('1', '2')]}
+        for _ in range(3):
+            r = compiled.prepare_mapping(answer_set, registry)
+            self.assertEqual((r.get_object('single'), r.get_object('pairs')), ({(None, 1)}, {(None, 2)}))
+        self.assertEqual(calls, [('1',), ('1', '2')])
+
+    def test_lazy_mapping(self):
+        spec = OutputSpec.parse(r'''
+            OUTPUT {
+                nodes = set { query: node(X); content: Node(X); };
+                seq = sequence { query: s(X, I); index: I; content: Node(X); };
+                neighbors = dictionary {
+                    query: node(X);
+                    key: X;
+                    content: set { query: edge(X, Y); content: Node(Y); };
+                };
+            }
+        ''')
+        constructed = []
+
+        def Node(label):
+            constructed.append(label)
+            return ('node', label)
+
+        registry = Registry()
+        registry.register(Node)
+        answer_set = {
+            'node': [('a',), ('b',), ('c',)],
+            's': [('c', '1'), ('b', '0'), ('a', '2')],
+            'edge': [('a', 'b'), ('a', 'c'), ('b', 'c')],
+        }
+        eager = spec.compile(registry).prepare_mapping(answer_set, registry)
+        lazy = spec.compile(registry, lazy=True).prepare_mapping(answer_set, registry)
+        del constructed[:]
+        seq = lazy.get_object('seq')
+        neighbors = lazy.get_object('neighbors')
+        nodes = lazy.get_object('nodes')
+        self.assertEqual(constructed, [])
+        self.assertEqual(len(seq), 3)
+        self.assertEqual(seq[1], ('node', 'c'))
+        self.assertEqual(constructed, ['c'])
+        self.assertEqual(sorted(neighbors), ['a', 'b', 'c'])
+        self.assertIn('a', neighbors)
+        self.assertEqual(constructed, ['c'])
+        self.assertEqual(neighbors['a'], {('node', 'b'), ('node', 'c')})
+        self.assertEqual(constructed, ['c', 'b', 'c'])
+        # Elements are only constructed once
+        self.assertIs(seq[1], seq[1])
+        self.assertEqual(constructed.count('c'), 2)
+        # Lazy views are equal to the eagerly mapped collections
+        for name in spec.exprs:
+            self.assertEqual(lazy.get_object(name), eager.get_object(name), msg='for name {0}'.format(name))
+            self.assertEqual(eager.get_object(name), lazy.get_object(name), msg='for name {0}'.format(name))
+        self.assertEqual(seq.materialize(), [('node', 'b'), ('node', 'c'), ('node', 'a')])
+        self.assertIn(next(iter(nodes)), {('node', 'a'), ('node', 'b'), ('node', 'c')})
+        self.assertIn(('node', 'b'), nodes)
+
+    def test_lazy_set_size(self):
+        spec = OutputSpec.parse(r'''
+            OUTPUT {
+                tuples = set { query: edge(X, Y); content: (Y, X, "c"); };
+                sources = set { query: edge(X, Y); content: Source(X, Y); };
+            }
+        ''')
+        constructed = []
+
+        def Source(x, y):
+            constructed.append(x)
+            return x
+
+        registry = Registry()
+        registry.register(Source)
+        answer_set = {'edge': [('a', 'b'), ('a', 'c'), ('b', 'c')]}
+        r = spec.compile(registry, lazy=True).prepare_mapping(answer_set, registry)
+        tuples = r.get_object('tuples')
+        # The size of a set of tuples is known without constructing the elements
+        self.assertEqual(len(tuples), 3)
+        self.assertIsNone(tuples._set)
+        self.assertEqual(tuples, {('b', 'a', 'c'), ('c', 'a', 'c'), ('c', 'b', 'c')})
+        # Other contents may map different captured tuples to equal elements, so all of them have to be constructed
+        self.assertEqual(len(r.get_object('sources')), 2)
+        self.assertEqual(sorted(constructed), ['a', 'a', 'b'])
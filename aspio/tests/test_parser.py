@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 from ..parser import parse_input_spec, parse_output_spec, parse_embedded_spec, EmbeddedSpecParser, ParseException
 
@@ -152,3 +154,34 @@ class TestParser(unittest.TestCase):
             ' behind predicate ',
             ' behind a quoted string containing percent',
         ]))
+
+    def test_embedded_parser_file(self):
+        code = r'''
+            % a normal asp comment
+            % another asp comment  %! this should be IGNORED
+            p(abc).    % comment behind predicate
+            %! this is what we want to parse
+            p(def).   %! behind predicate % IGNORED % IGNORED too
+            p("quoted %!\"string").  %! behind a quoted string containing percent
+            p("größe"). %! non-ascii: äöü
+            p("quoted"). % q("quoted but in comment").  %! means: this should be IGNORED.
+        %! at the end without newline'''
+        variants = [
+            (code, 'UTF-8'),
+            (code, 'latin-1'),
+            (code, 'UTF-16'),  # not ASCII-compatible, falls back to decoding the whole file
+            (code.replace('\n', '\r\n'), 'UTF-8'),
+            (code + '\n', 'UTF-8'),
+            ('p(a).\n' * 10000, 'UTF-8'),
+            ('', 'UTF-8'),
+        ]
+        for (content, encoding) in variants:
+            (fd, filename) = tempfile.mkstemp(suffix='.dl')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content.encode(encoding))
+                with open(filename, 'rt', encoding=encoding) as f:
+                    expected = EmbeddedSpecParser.extractFromString(f.read())
+                self.assertEqual(EmbeddedSpecParser.extractFromFile(filename, encoding=encoding), expected, msg='for encoding {0}'.format(encoding))
+            finally:
+                os.unlink(filename)
@@ -1,6 +1,40 @@
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from io import StringIO
+import os
+import tempfile
 import unittest
-from ..program import Program, StreamAccumulator
+from ..helper import predicate_scan, scan_file_predicate_names
+from ..input import InputSpec
+from ..output import OutputSpec
+from ..program import InputCache, MappingOptions, Program, Results, StreamAccumulator, write_input_facts
+from ..registry import Registry
+from ..solver import Solver, SolverOptions
+
+# Defined at module level, so the objects can be sent back from worker processes
+Edge = namedtuple('Edge', ['src', 'dst'])
+
+
+class ClosableList(list):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class InputRecordingSolver(Solver):
+    '''Records the input passed to the solver instead of running it.'''
+
+    def run(self, *, write_input, capture_predicates, file_args, options=None, symbols=None):
+        s = StringIO()
+        write_input(s)
+        self.input = s.getvalue()
+        self.capture = list(capture_predicates) + list(options.capture if options is not None and options.capture is not None else [])
+        return ClosableList()
+
+    def __copy__(self):
+        return InputRecordingSolver()
 
 
 class TestProgram(unittest.TestCase):
@@ -53,3 +87,302 @@ class TestProgram(unittest.TestCase):
         self.assertEqual(sa_map('pred', tuple()), 'pred().')
         self.assertEqual(sa_map('p', ("abc",)), 'p("abc").')
         self.assertEqual(sa_map('p', (1, 2, 'xy"z', 3)), r'p(1,2,"xy\"z",3).')
+
+    def test_buffered_stream_accumulator(self):
+        s = StringIO()
+        acc = StreamAccumulator(s, buffer_size=30)
+        acc.add_fact('p', (1, 'a'))
+        self.assertEqual(s.getvalue(), '')  # not yet flushed
+        acc.add_fact('q', (True, 'b\\"c', 1.5, None))
+        acc.add_fact('r', ())
+        acc.flush()
+        self.assertEqual(s.getvalue(), 'p(1,"a").\nq(True,"b\\\\\\"c","1.5","None").\nr().\n')
+
+    def test_stream_accumulator_columns(self):
+        s = StringIO()
+        acc = StreamAccumulator(s)
+        acc.add_fact('p', (0, 'x'))
+        acc.add_facts('p', (array('q', [1, 2, 3]), ['a', 'b"c', 'd'], [True, None, 4]))
+        self.assertEqual(s.getvalue(), 'p(0,"x").\np(1,"a",True).\np(2,"b\\"c","None").\np(3,"d",4).\n')
+
+    def test_stream_accumulator_deduplicate(self):
+        for buffer_size in (0, 3, 100):
+            s = StringIO()
+            acc = StreamAccumulator(s, buffer_size=buffer_size, deduplicate={'p', 'r'})
+            for _ in range(2):
+                acc.add_fact('p', (1, 'a'))
+                acc.add_fact('q', (1,))
+                acc.add_fact('r', ())
+            acc.add_facts('p', ([1, 2, 2], ['a', 'b', 'b']))
+            acc.flush()
+            self.assertEqual(sorted(s.getvalue().splitlines()), ['p(1,"a").', 'p(2,"b").', 'q(1).', 'q(1).', 'r().'], msg='for buffer size {0}'.format(buffer_size))
+            self.assertEqual(acc.duplicates, {'p': 3, 'r': 1})
+
+    def test_stream_accumulator_deduplicate_keys(self):
+        # Only compact keys of the written facts are remembered, not the facts themselves
+        for buffer_size in (0, 100):
+            s = StringIO()
+            acc = StreamAccumulator(s, buffer_size=buffer_size, deduplicate={'p'})
+            long_arg = 'x' * 1000
+            acc.add_fact('p', (long_arg, 'ä\udc80'))
+            acc.add_facts('p', ([long_arg, long_arg, 'y'], ['ä\udc80', 'b', 'b']))
+            acc.flush()
+            self.assertEqual(acc.duplicates, {'p': 1})
+            self.assertEqual(len(s.getvalue().splitlines()), 3)
+            self.assertEqual(len(acc._seen), 3)
+            self.assertTrue(all(len(key) == 16 for key in acc._seen))
+
+    def test_write_input_facts_deduplicate(self):
+        spec = InputSpec.parse(r'''
+            INPUT (xs, ys) {
+                p(x) for (_, x) in xs;
+                p(y) for y in ys;
+            }''')
+        args = ((1, 1, 2), frozenset([2, 3]))
+        for dedup in (set(), {'p'}):
+            # Duplicates are removed within each mapping and across the mappings of the same predicate
+            expected = ['p(1).', 'p(2).', 'p(3).'] if dedup else ['p(1).', 'p(1).', 'p(2).', 'p(2).', 'p(3).']
+            s = StringIO()
+            acc = StreamAccumulator(s, deduplicate=dedup)
+            spec.perform_mapping(args, acc)
+            self.assertEqual(sorted(s.getvalue().splitlines()), expected)
+            cache = InputCache()
+            for _ in range(2):
+                s = StringIO()
+                write_input_facts(spec, args, s, input_cache=cache, deduplicate=dedup)
+                self.assertEqual(sorted(s.getvalue().splitlines()), expected)
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                s = StringIO()
+                write_input_facts(spec, args, s, executor=executor, deduplicate=dedup)
+                self.assertEqual(sorted(s.getvalue().splitlines()), expected)
+
+    def test_write_input_facts_deduplicate_multiline(self):
+        spec = InputSpec.parse(r'''
+            INPUT (xs, ys) {
+                p(x) for (_, x) in xs;
+                p(y) for (_, y) in ys;
+            }''')
+        # Line breaks in strings are not escaped, so the facts must not be split at line breaks
+        args = (('a\nb', 'c'), ('b', 'a\nb', 'c\nb'))
+        expected = 'p("a\nb").\np("c").\np("b").\np("c\nb").\n'
+        cache = InputCache()
+        for _ in range(2):
+            s = StringIO()
+            write_input_facts(spec, args, s, input_cache=cache, deduplicate={'p'})
+            self.assertEqual(s.getvalue(), expected)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            s = StringIO()
+            write_input_facts(spec, args, s, executor=executor, deduplicate={'p'})
+            self.assertEqual(s.getvalue(), expected)
+
+    def test_used_predicates(self):
+        (fd, filename) = tempfile.mkstemp(suffix='.dl')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write('fq(X) :- Xq(X), "q(1)", not -fr(X).  %  ignored(X)\n')
+            p = Program(code=r'''
+                %! INPUT (xs) { p(x) for x in xs; q(x) for x in xs; r(x) for x in xs; s(x) for x in xs; t(); }
+                %! OUTPUT { ps = set { query: p(X), not t; content: X; }; qs = set { s/1 }; }
+                a(X) :- r(X), Abc = "p(1)".  % comment(X)
+            ''')
+            p.append_file(filename)
+            used = p.used_predicates()
+            self.assertTrue({'a', 'p', 'r', 's', 't', 'fq', 'fr'} <= used)
+            self.assertTrue(used.isdisjoint({'q', 'comment', 'ignored', 'bc', 'Abc', 'Xq'}))
+            # Only the used predicates are mapped
+            s = StringIO()
+            p.input_spec.perform_mapping((frozenset([1]),), StreamAccumulator(s), predicates=used)
+            self.assertEqual(sorted(s.getvalue().splitlines()), ['p(1).', 'r(1).', 's(1).', 't().'])
+            s = StringIO()
+            write_input_facts(p.input_spec, (frozenset([1]),), s, predicates=used)
+            self.assertEqual(sorted(s.getvalue().splitlines()), ['p(1).', 'r(1).', 's(1).', 't().'])
+            # The scan of the file is updated when it changes
+            with open(filename, 'a') as f:
+                f.write('x :- q(1).\n')
+            os.utime(filename, ns=(0, 0))
+            self.assertIn('q', p.used_predicates())
+        finally:
+            os.unlink(filename)
+        p.file_parts.append(filename)
+        self.assertIsNone(p.used_predicates())
+
+    def test_used_predicates_encoding(self):
+        code = '%! INPUT (xs) { node(x) for x in xs; edge(x, x) for x in xs; }\n% größe\nok(X) :- node(X), X != "größe".\n'
+        for encoding in ['UTF-8', 'UTF-16', 'latin-1']:
+            with tempfile.NamedTemporaryFile('w', encoding=encoding, suffix='.dl', delete=False) as f:
+                f.write(code)
+                filename = f.name
+            try:
+                p = Program()
+                p.append_file(filename, encoding=encoding)
+                used = p.used_predicates()
+                self.assertIn('node', used, msg='for encoding {0}'.format(encoding))
+                self.assertNotIn('edge', used, msg='for encoding {0}'.format(encoding))
+            finally:
+                os.unlink(filename)
+
+    def test_scan_file_cache_size(self):
+        filenames = []
+        try:
+            for i in range(predicate_scan._file_cache_size + 10):
+                with tempfile.NamedTemporaryFile('w', suffix='.dl', delete=False) as f:
+                    f.write('p{0}.\n'.format(i))
+                    filenames.append(f.name)
+                self.assertEqual(scan_file_predicate_names(f.name), frozenset(['p{0}'.format(i)]))
+            self.assertEqual(len(predicate_scan._file_cache), predicate_scan._file_cache_size)
+        finally:
+            for filename in filenames:
+                os.unlink(filename)
+
+    def test_prune_input(self):
+        p = Program(code=r'''
+            %! INPUT (xs) { p(x) for x in xs; q(x) for x in xs; r(x) for x in xs; }
+            a(X) :- p(X).
+        ''')
+        solver = InputRecordingSolver()
+        p.solve(frozenset([1]), solver=solver, mapping_options=MappingOptions(prune_input=True))
+        self.assertEqual([line for line in solver.input.splitlines() if line.endswith('(1).')], ['p(1).'])
+        # Predicates that are captured explicitly are always mapped
+        options = SolverOptions(capture=iter(['q']))
+        p.solve(frozenset([1]), solver=solver, options=options, mapping_options=MappingOptions(prune_input=True))
+        self.assertEqual(sorted(line for line in solver.input.splitlines() if line.endswith('(1).')), ['p(1).', 'q(1).'])
+        self.assertIn('q', solver.capture)
+
+    def test_used_predicates_include(self):
+        p = Program(code='a :- p(X). % #include "other.dl".\nb :- q("#include").')
+        self.assertIn('p', p.used_predicates())
+        self.assertNotIn('#include', p.used_predicates())
+        # Predicates used only in included files are unknown
+        p.append_code('#include "other.dl".')
+        self.assertIsNone(p.used_predicates())
+        with tempfile.NamedTemporaryFile('w', suffix='.dl', delete=False) as f:
+            f.write('#include "other.dl".\n#maxint = 10.\nx :- #count { X : p(X) } > 1.\n')
+            filename = f.name
+        try:
+            self.assertEqual(scan_file_predicate_names(filename), frozenset(['#include', 'p', 'x']))
+            p = Program()
+            p.append_file(filename)
+            self.assertIsNone(p.used_predicates())
+        finally:
+            os.unlink(filename)
+
+    def test_input_cache(self):
+        class Graph:
+            def __init__(self):
+                self.nodes = set()
+                self.aspio_version = 0
+
+        spec = InputSpec.parse(r'''
+            INPUT (g, labels, extra) {
+                node(n) for n in g.nodes;
+                label(k, v) for (k, v) in labels;
+                extra(x) for (_, x) in extra;
+                constant();
+            }''')
+        g = Graph()
+        g.nodes.update([1, 2])
+        labels = frozenset([(1, 'a'), (2, 'b')])
+        extra = ['x']  # unhashable, never cached
+        cache = InputCache()
+
+        def facts(*args):
+            s = StringIO()
+            cache.write_facts(spec, args, s)
+            return sorted(s.getvalue().splitlines())
+
+        self.assertEqual(facts(g, labels, extra), ['constant().', 'extra("x").', 'label(1,"a").', 'label(2,"b").', 'node(1).', 'node(2).'])
+        self.assertEqual((cache.hits, cache.misses), (0, 4))
+        self.assertEqual(facts(g, labels, extra), ['constant().', 'extra("x").', 'label(1,"a").', 'label(2,"b").', 'node(1).', 'node(2).'])
+        self.assertEqual((cache.hits, cache.misses), (3, 5))
+        # Changing an object without updating its version is not detected
+        g.nodes.add(3)
+        self.assertNotIn('node(3).', facts(g, labels, extra))
+        g.aspio_version += 1
+        self.assertIn('node(3).', facts(g, labels, extra))
+        # Replacing an argument by another object is detected
+        self.assertIn('label(3,"c").', facts(g, labels | {(3, 'c')}, extra))
+        with self.assertRaises(ValueError):
+            facts(g, labels)
+
+    def test_input_cache_without_version(self):
+        class Graph:
+            def __init__(self):
+                self.nodes = set()
+
+        spec = InputSpec.parse(r'''
+            INPUT (g) {
+                node(n) for n in g.nodes;
+            }''')
+        g = Graph()
+        g.nodes.add(1)
+        cache = InputCache()
+
+        def facts():
+            s = StringIO()
+            cache.write_facts(spec, (g,), s)
+            return sorted(s.getvalue().splitlines())
+
+        self.assertEqual(facts(), ['node(1).'])
+        # Objects with the default identity-based hash may have been changed in place, so they are never cached
+        g.nodes.add(2)
+        self.assertEqual(facts(), ['node(1).', 'node(2).'])
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_concurrent_input_mapping(self):
+        spec = InputSpec.parse(r'''
+            INPUT (xs, ys) {
+                p(x) for x in xs;
+                q(x, y) for x in xs for y in ys;
+                r();
+            }''')
+        args = (frozenset(range(100)), frozenset('abc'))
+        s = StringIO()
+        acc = StreamAccumulator(s)
+        spec.perform_mapping(args, acc)
+        expected = sorted(s.getvalue().splitlines())
+        for make_executor in (ThreadPoolExecutor, ProcessPoolExecutor):
+            with make_executor(max_workers=2) as executor:
+                s = StringIO()
+                write_input_facts(spec, args, s, executor=executor)
+                self.assertEqual(sorted(s.getvalue().splitlines()), expected)
+                # Errors are passed on to the caller
+                with self.assertRaises(ValueError):
+                    write_input_facts(spec, (1, 2), StringIO(), executor=executor)
+
+    def test_parallel_output_mapping(self):
+        spec = OutputSpec.parse(r'''
+            OUTPUT {
+                edges = set { query: edge(X, Y); content: Edge(X, Y); };
+                weight = sequence { query: weight(I, W); index: I; content: int(W); };
+            }''')
+        registry = Registry()
+        registry.register(Edge)
+        answer_sets = [
+            {'edge': [(str(i), str(i + 1)), (str(i + 1), str(i))], 'weight': [('0', str(i))]}
+            for i in range(20)
+        ]
+        answer_sets.append({'edge': [], 'weight': [('0', 'w')]})
+        expected = list(Results(ClosableList(answer_sets), spec, registry, False))
+        results = Results(ClosableList(answer_sets), spec, registry, True, workers=2)
+        with results:
+            mapped = list(results)
+        self.assertTrue(results.answer_sets.closed)
+        self.assertEqual(len(mapped), len(answer_sets))
+        for (i, (r, e)) in enumerate(zip(mapped, expected)):
+            self.assertIs(r.answer_set, answer_sets[i])
+            self.assertEqual(r.edges, e.edges)
+            if i < 20:
+                self.assertEqual(r.weight, [i])
+        # The pool may be started in advance (e.g., before other threads are started)
+        executor = Results.start_workers(spec, registry, 2)
+        with Results(ClosableList(answer_sets), spec, registry, False, workers=2, executor=executor) as results:
+            self.assertEqual([r.edges for r in results], [e.edges for e in expected])
+        # Errors are raised when the name is accessed, other names can still be used
+        self.assertEqual(mapped[-1].edges, frozenset())
+        with self.assertRaises(ValueError):
+            mapped[-1].weight
+        with self.assertRaises(AttributeError):
+            mapped[0].undefined
+        # Lazy output views cannot be sent back from worker processes
+        with self.assertRaises(ValueError):
+            Program(code='p.').solve(mapping_options=MappingOptions(lazy_output=True, output_workers=2))
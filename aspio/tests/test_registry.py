@@ -0,0 +1,55 @@
+import unittest
+from copy import copy
+from unittest import mock
+from ..registry import Registry
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_resolve(self):
+        r = Registry()
+        self.assertIs(r.resolve('int'), int)
+        self.assertIs(r.resolve('collections.OrderedDict'), __import__('collections').OrderedDict)
+        self.assertIsNone(r.resolve('collections.NoSuchName'))
+        self.assertIsNone(r.resolve('no_such_module_aspio.X'))
+
+    def test_resolve_cache(self):
+        r = Registry()
+        with mock.patch('importlib.import_module', side_effect=ImportError) as import_module:
+            for _ in range(3):
+                self.assertIsNone(r.resolve('Point'))
+                self.assertIs(r.resolve('int'), int)
+            # Failed lookups are cached, too
+            self.assertEqual(import_module.call_count, 1)
+
+            def Point(x, y):
+                return (x, y)
+            # Registering a name invalidates the cache
+            r.register(Point)
+            self.assertIs(r.resolve('Point'), Point)
+            r.register_dict({'Point2': Point})
+            self.assertIs(r.resolve('Point2'), Point)
+            self.assertEqual(import_module.call_count, 1)  # registered names are not imported
+            self.assertIsNone(r.resolve('Point3'))
+            self.assertIsNone(r.resolve('Point3'))
+            self.assertEqual(import_module.call_count, 2)
+            r.clear_resolve_cache()
+            self.assertIsNone(r.resolve('Point3'))
+            self.assertEqual(import_module.call_count, 3)
+
+    def test_pure(self):
+        r = Registry()
+
+        def Point(x, y):
+            return (x, y)
+        r.register(Point)
+        self.assertFalse(r.is_pure('Point'))
+        # Registering the same constructor again may mark it as pure, but not the other way round
+        r.register(Point, pure=True)
+        self.assertTrue(r.is_pure('Point'))
+        r.register_dict({'Point': Point})
+        self.assertTrue(r.is_pure('Point'))
+        self.assertTrue(copy(r).is_pure('Point'))
+        r.register(lambda x, y: [x, y], 'Point', replace=True)
+        self.assertFalse(r.is_pure('Point'))
+        self.assertTrue(r.is_pure('int'))  # int returns immutable values
@@ -1,10 +1,45 @@
 import gc
+import io
+import multiprocessing
+import os
+import threading
 import re
+import subprocess
+import sys
 import unittest
 import warnings
 import weakref
+from ..answer_set import SymbolTable
+from ..helper import InputWriter, TemporaryNamedPipe, read_lines, start_process_pool
+from ..helper.process_pool import _start_forked_process_pool
+from ..helper.typing import ClosableIterable
 from ..program import Program
 from ..errors import SolverError
+from ..solver.dlvhex2 import AnswerSetParserIterable, DlvhexLineReader
+
+
+class ListLines(ClosableIterable[str]):
+    def __init__(self, lines):
+        self.lines = lines
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def close(self):
+        self.closed = True
+
+
+_worker_label = None
+
+
+def _init_worker(label):
+    global _worker_label
+    _worker_label = label
+
+
+def _worker_info(_):
+    return (os.getpid(), _worker_label)
 
 
 class TestSolver(unittest.TestCase):
@@ -62,3 +97,177 @@ class TestSolver(unittest.TestCase):
                 # Make sure we didn't get any ResourceWarnings
                 if w and str(w[-1]):
                     self.fail('ResourceWarning was issued during test')
+
+
+class TestAnswerSetParserIterable(unittest.TestCase):
+
+    lines = ['{{p({0}),q(x,"y"),r}}\n'.format(i) for i in range(20)]
+
+    def test_pipelined_parsing(self):
+        serial = [dict(a) for a in AnswerSetParserIterable(ListLines(self.lines))]
+        symbols = SymbolTable()
+        pipelined = list(AnswerSetParserIterable(ListLines(self.lines), workers=2, symbols=symbols))
+        self.assertEqual([dict(a) for a in pipelined], serial)  # same answer sets in the same order
+        self.assertIs(pipelined[0]['q'][0], pipelined[1]['q'][0])  # symbols are interned in the calling process
+
+    def test_pipelined_parsing_error(self):
+        lines = ListLines(self.lines[:3] + ['{p(a),}\n'] + self.lines[3:])
+        answer_sets = AnswerSetParserIterable(lines, workers=2)
+        with self.assertRaises(SolverError) as cm:
+            for _ in answer_sets:
+                pass
+        self.assertEqual(cm.exception.line, '{p(a),}\n')
+        answer_sets.close()
+        self.assertTrue(lines.closed)
+
+
+class FailingInputWriter:
+    '''Stands in for an `InputWriter` whose input mapping has failed.'''
+    def __init__(self):
+        self.error = ValueError('mapping error')
+        self.closed = False
+
+    def check(self):
+        raise self.error
+
+    def close(self):
+        self.closed = True
+
+
+class StubInput:
+    def __init__(self):
+        self.cleaned_up = False
+
+    def cleanup(self):
+        self.cleaned_up = True
+
+
+class TestDlvhexLineReader(unittest.TestCase):
+
+    def test_input_writer_error(self):
+        # A stand-in for dlvhex2 that prints an answer set and waits for the request for the next one
+        process = subprocess.Popen(
+            [sys.executable, '-c', 'import sys; print("{p(a)}", flush=True); sys.stdin.readline()'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        writer = FailingInputWriter()
+        tmp_input = StubInput()
+        lines = DlvhexLineReader(process=process, encoding='UTF-8', tmp_input=tmp_input, input_writer=writer)  # type: ignore
+        executor = start_process_pool(1)
+        answer_sets = AnswerSetParserIterable(lines, workers=1, executor=executor)
+        with self.assertRaisesRegex(ValueError, 'mapping error'):
+            for _ in answer_sets:
+                pass
+        # Everything has been cleaned up without closing the iterable explicitly
+        self.assertIsNotNone(process.poll())
+        self.assertTrue(process.stdin.closed)
+        self.assertTrue(process.stdout.closed)
+        self.assertFalse(lines.stderr_capture_thread.is_alive())
+        self.assertTrue(writer.closed)
+        self.assertTrue(tmp_input.cleaned_up)
+        with self.assertRaises(RuntimeError):
+            executor.submit(int)  # the parse workers have been shut down
+        process.stderr.close()
+
+
+class ChunkedStream(io.RawIOBase):
+    '''A raw binary stream that returns at most `chunk` bytes per read.'''
+    def __init__(self, data, chunk):
+        self.data = data
+        self.chunk = chunk
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self.chunk, len(self.data) - self.pos)
+        b[:n] = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+
+class TestReadLines(unittest.TestCase):
+
+    def test_read_lines(self):
+        data = b'{p(a)}\n\n{' + b'q(x),' * 100 + b'r}\nlast'
+        expected = data.split(b'\n')
+        for chunk in (1, 3, 7, 64, 4096):
+            stream = io.BufferedReader(ChunkedStream(data, chunk), buffer_size=chunk)
+            self.assertEqual(list(read_lines(stream, chunk_size=4)), expected, msg='for chunk size {0}'.format(chunk))
+
+    def test_read_lines_trailing_newline(self):
+        self.assertEqual(list(read_lines(io.BytesIO(b'a\nb\n'))), [b'a', b'b'])
+        self.assertEqual(list(read_lines(io.BytesIO(b''))), [])
+
+
+class TestInputWriter(unittest.TestCase):
+
+    def read_pipe(self, name, result):
+        with open(name, 'rt', encoding='UTF-8') as f:
+            result.append(f.read())
+
+    def test_input_writer(self):
+        def write_input(stream):
+            for i in range(10000):
+                stream.write('p({0}).\n'.format(i))
+        expected = ''.join('p({0}).\n'.format(i) for i in range(10000))
+        with TemporaryNamedPipe() as pipe_name:
+            writer = InputWriter(pipe_name, 'UTF-8', write_input, max_chunks=2, chunk_size=100)
+            writer.start()
+            result = []  # type: ignore
+            reader = threading.Thread(target=self.read_pipe, args=(pipe_name, result))
+            reader.start()
+            reader.join()
+            writer.join()
+            writer.check()
+            writer.close()
+        self.assertEqual(result, [expected])
+
+    def test_input_writer_error(self):
+        def write_input(stream):
+            stream.write('p(1).\n')
+            raise ValueError('mapping error')
+        with TemporaryNamedPipe() as pipe_name:
+            writer = InputWriter(pipe_name, 'UTF-8', write_input)
+            writer.start()
+            result = []  # type: ignore
+            reader = threading.Thread(target=self.read_pipe, args=(pipe_name, result))
+            reader.start()
+            reader.join()
+            with self.assertRaisesRegex(ValueError, 'mapping error'):
+                writer.check()
+            writer.check()  # raised only once
+            writer.close()
+
+    def test_input_writer_close_without_reader(self):
+        def write_input(stream):
+            for i in range(100000):
+                stream.write('p({0}).\n'.format(i))
+        with TemporaryNamedPipe() as pipe_name:
+            writer = InputWriter(pipe_name, 'UTF-8', write_input, max_chunks=2, chunk_size=100)
+            writer.start()
+            # Nobody opens the pipe for reading, so the writer is blocked while opening it
+            writer.close()
+            writer.check()  # errors after cancellation are ignored
+
+    def test_start_process_pool(self):
+        self._check_process_pool(start_process_pool(3, initializer=_init_worker, initargs=('w',)))
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == 'fork', 'requires the fork start method')
+    def test_start_forked_process_pool(self):
+        # The variant used before Python 3.7
+        self._check_process_pool(_start_forked_process_pool(3, initializer=_init_worker, initargs=('w',)))
+
+    def _check_process_pool(self, executor):
+        try:
+            # All workers have been started before the pool is returned (not only when further tasks are submitted)
+            pids = set(executor._processes)  # type: ignore
+            self.assertEqual(len(pids), 3)
+            for (pid, label) in executor.map(_worker_info, range(20)):
+                self.assertIn(pid, pids)
+                self.assertEqual(label, 'w')
+        finally:
+            executor.shutdown()
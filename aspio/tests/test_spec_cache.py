@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from ..spec_cache import SpecCache
+from .. import parser
+
+code = r'''
+%! INPUT (nodes) { node(n) for n in nodes; }
+%! OUTPUT {
+%!     colored = set { query: color(N, C), not bad(N); content: (N, C); };  % a comment
+%!     named = dictionary { query: color(N, C); key: N; content: sequence { query: label(N, I, L); index: I; content: L; }; };
+%! }
+color(X, red) :- node(X).
+'''
+
+
+def describe(spec):
+    i, o = spec
+    return (str(i._predicates[0]._iterations[0]), sorted(o.captured_predicates()), list(o.additional_rules()))
+
+
+class TestSpecCache(unittest.TestCase):
+
+    def test_deterministic_helper_predicates(self):
+        i, o = parser.parse_embedded_spec(code)
+        self.assertEqual(list(o.additional_rules()), [
+            'aspio__0(N,C) :- color(N,C),not bad(N).',
+            'aspio__1(N) :- color(N,C).',
+            # the nested sequence reads the tuples of label/3 directly
+        ])
+        self.assertEqual(sorted(o.captured_predicates()), ['aspio__0', 'aspio__1', 'label'])
+        # The same rules are generated in a process with a different hash seed
+        script = 'from aspio.parser import parse_embedded_spec; import sys; print(list(parse_embedded_spec(sys.stdin.read())[1].additional_rules()))'
+        output = subprocess.check_output([sys.executable, '-c', script], input=code, universal_newlines=True,
+                                         cwd=str(Path(__file__).parents[2]), env=dict(os.environ, PYTHONHASHSEED='12345'))
+        self.assertEqual(output.strip(), repr(list(o.additional_rules())))
+
+    def test_memory_cache(self):
+        cache = SpecCache()
+        spec1 = cache.parse_embedded_spec(code)
+        spec2 = cache.parse_embedded_spec('% some other code\n' + code)
+        self.assertIs(spec1[0], spec2[0])
+        self.assertIs(spec1[1], spec2[1])
+        self.assertEqual(cache.parse_embedded_spec('p(a).'), (None, None))
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            expected = describe(SpecCache(directory).parse_embedded_spec(code))
+            # A new cache instance (e.g., in another process) must not parse the specification again
+            with mock.patch.object(parser, 'parse_extracted_spec', side_effect=AssertionError('spec has been parsed')):
+                spec = SpecCache(directory).parse_embedded_spec(code)
+            self.assertEqual(describe(spec), expected)
+
+    def test_corrupt_disk_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = SpecCache(directory)
+            expected = describe(cache.parse_embedded_spec(code))
+            for path in cache.directory.iterdir():
+                path.write_bytes(b'garbage')
+            with self.assertLogs('aspio.spec_cache', 'WARNING'):
+                spec = SpecCache(directory).parse_embedded_spec(code)
+            self.assertEqual(describe(spec), expected)
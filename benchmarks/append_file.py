@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+'''Measure `Program.append_file` on a large file of generated facts with a small embedded I/O specification.
+
+Compares the memory-mapped scan for '%!' lines with decoding the whole file and running the extraction regex over it.
+'''
+import os
+import tempfile
+import timeit
+import aspio
+from aspio.parser import EmbeddedSpecParser
+
+
+def write_file(f, fact_lines: int) -> None:
+    f.write(b'%! INPUT (xs) { p(x) for x in xs; }\n')
+    f.write(b'%! OUTPUT { ys = set { query: q(X); content: X; }; }\n')
+    chunk = b''.join(b'edge(n%d,n%d). %% generated\n' % (i, i + 1) for i in range(10000))
+    for _ in range(fact_lines // 10000):
+        f.write(chunk)
+    f.write(b'q(X) :- p(X).\n')
+
+
+def main():
+    fact_lines = 5000000
+    with tempfile.NamedTemporaryFile(suffix='.dl', delete=False) as f:
+        write_file(f, fact_lines)
+    try:
+        size = os.path.getsize(f.name)
+        print('File with {0} lines of facts ({1:.1f} MiB)'.format(fact_lines, size / 2**20))
+
+        def read_whole_file():
+            with open(f.name, 'rt', encoding='UTF-8') as file:
+                return EmbeddedSpecParser.extractFromString(file.read())
+        assert read_whole_file() == EmbeddedSpecParser.extractFromFile(f.name)
+        t_read = min(timeit.repeat(read_whole_file, number=1, repeat=3))
+        print('decode and regex:  {0:8.3f} s'.format(t_read))
+        t_mmap = min(timeit.repeat(lambda: EmbeddedSpecParser.extractFromFile(f.name), number=1, repeat=3))
+        print('mmap and find:     {0:8.3f} s'.format(t_mmap))
+        t_append = min(timeit.repeat(lambda: aspio.Program(filename=f.name), number=1, repeat=3))
+        print('Program(filename): {0:8.3f} s'.format(t_append))
+    finally:
+        os.unlink(f.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+'''Measure the input mapping of a large edge list, given as a set of tuples and as `Columns`, written to a file through `StreamAccumulator`.
+
+If NumPy is installed, the columns are additionally given as NumPy arrays.
+'''
+import os
+import tempfile
+import timeit
+from aspio import Columns, InputSpec
+from aspio.program import StreamAccumulator
+
+
+def write_facts(filename, spec, argument):
+    with open(filename, 'wt', encoding='UTF-8') as stream:
+        acc = StreamAccumulator(stream, buffer_size=StreamAccumulator.default_buffer_size)
+        spec.perform_mapping([argument], acc)
+        acc.flush()
+
+
+def main():
+    rows = 1000000
+    sources = list(range(rows))
+    targets = [(i * 7919) % rows for i in range(rows)]
+    spec = InputSpec.parse(r'INPUT (edges) { edge(u, v) for (u, v) in edges; }')
+    variants = [
+        ('set of tuples', set(zip(sources, targets))),
+        ('Columns (lists)', Columns(sources, targets)),
+    ]
+    try:
+        import numpy
+        variants.append(('Columns (numpy)', Columns(numpy.array(sources), numpy.array(targets))))
+    except ImportError:
+        pass
+    (fd, filename) = tempfile.mkstemp(suffix='.dl')
+    os.close(fd)
+    try:
+        print('Mapping {0} edges'.format(rows))
+        for (name, argument) in variants:
+            t = min(timeit.repeat(lambda: write_facts(filename, spec, argument), number=1, repeat=3))
+            print('{0:18} {1:8.3f} s'.format(name + ':', t))
+    finally:
+        os.unlink(filename)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+'''Measure the memory needed by a large timetabling answer set in the different raw answer set representations.'''
+import itertools
+import tracemalloc
+from aspio.answer_set import parse_answer_set, SymbolTable
+
+
+def make_timetable_line(classes: int, days: int = 5, periods: int = 8) -> str:
+    subjects = ['MAT', 'GER', 'ENG', 'FRE', 'LAT', 'PHY', 'CHE', 'BIO', 'INF', 'GEO']
+    facts = []
+    for (c, d, p) in itertools.product(range(classes), range(days), range(periods)):
+        s = subjects[(c + d + p) % len(subjects)]
+        t = (c * 7 + p) % 40
+        facts.append('assign("C{0}","{1}",{2},{3},{4})'.format(c, s, t, d, p))
+        facts.append('classassign("C{0}","{1}",{2},{3},{4})'.format(c, s, t, d, p))
+        facts.append('teacherassign("C{0}","{1}",{2},{3},{4})'.format(c, s, t, d, p))
+    return '{' + ','.join(facts) + '}\n'
+
+
+def retained_memory(line: str, **kwargs) -> int:
+    tracemalloc.start()
+    symbols = SymbolTable()
+    answer_set = parse_answer_set(line, symbols=symbols, **kwargs)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(answer_set) == 3
+    return size
+
+
+def main():
+    line = make_timetable_line(classes=500)
+    print('Answer set with {0} atoms'.format(line.count('assign(')))
+    plain = retained_memory(line)
+    compact = retained_memory(line, compact=True)
+    print('tuples:   {0:10.1f} KiB'.format(plain / 1024))
+    print('columnar: {0:10.1f} KiB ({1:.0%})'.format(compact / 1024, compact / plain))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+'''Measure the input mapping of a program with several large INPUT predicates, serially and with a process pool.'''
+import io
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from aspio import InputSpec
+from aspio.program import write_input_facts
+
+
+def main():
+    n = 200000
+    arguments = tuple(frozenset((i, 'label {0}'.format(i % 1000 + k)) for i in range(n)) for k in range(4))
+    spec = InputSpec.parse(r'''
+        INPUT (a, b, c, d) {
+            pa(x, y) for (x, y) in a;
+            pb(x, y) for (x, y) in b;
+            pc(x, y) for (x, y) in c;
+            pd(x, y) for (x, y) in d;
+        }''')
+    print('{0} predicates with {1} facts each'.format(len(arguments), n))
+    t_serial = min(timeit.repeat(lambda: write_input_facts(spec, arguments, io.StringIO()), number=1, repeat=3))
+    print('serial:                   {0:8.3f} s'.format(t_serial))
+    with ProcessPoolExecutor(max_workers=len(arguments)) as executor:
+        write_input_facts(spec, arguments, io.StringIO(), executor=executor)  # start the worker processes
+        t_pool = min(timeit.repeat(lambda: write_input_facts(spec, arguments, io.StringIO(), executor=executor), number=1, repeat=3))
+    print('process pool ({0} workers): {1:8.3f} s'.format(len(arguments), t_pool))
+
+
+if __name__ == '__main__':
+    main()
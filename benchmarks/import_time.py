@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+'''Measure the time of `import aspio` in a fresh interpreter, using `python -X importtime`.
+
+Prints the cumulative import time of the `aspio` package, and the modules with the largest self time.
+'''
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+
+def import_times(statement: str = 'import aspio'):
+    '''Run the statement in a fresh interpreter and return a list of (self time, cumulative time, module name) tuples, in microseconds.'''
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            stderr=subprocess.PIPE, check=True, universal_newlines=True,
+                            cwd=str(Path(__file__).parent.parent)).stderr
+    times = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times.append((int(self_us), int(cumulative_us), name.strip()))
+    return times
+
+
+def main():
+    runs = [import_times() for _ in range(10)]
+    cumulative = [next(c for (_, c, name) in times if name == 'aspio') for times in runs]
+    print('import aspio: {0:8.1f} ms (median of {1} runs)'.format(statistics.median(cumulative) / 1000, len(runs)))
+    print('Largest self times of the last run:')
+    for (self_us, _, name) in sorted(runs[-1], reverse=True)[:10]:
+        print('    {0:8.1f} ms  {1}'.format(self_us / 1000, name))
+    loaded = {name for (_, _, name) in runs[-1]}
+    print('pyparsing loaded: {0}'.format('pyparsing' in loaded))
+
+
+if __name__ == '__main__':
+    main()
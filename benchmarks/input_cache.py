@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+'''Measure repeated input mappings where only a small input argument changes between calls, with and without an `InputCache`.'''
+import io
+import timeit
+from aspio import InputCache, InputSpec
+from aspio.program import StreamAccumulator
+
+
+def main():
+    edges = frozenset((i, (i * 7919) % 500000) for i in range(500000))
+    spec = InputSpec.parse(r'''
+        INPUT (edges, query) {
+            edge(u, v) for (u, v) in edges;
+            query(q) for q in query;
+        }''')
+    cache = InputCache()
+    requests = [frozenset([i, i + 1]) for i in range(5)]
+
+    def without_cache():
+        for query in requests:
+            acc = StreamAccumulator(io.StringIO(), buffer_size=StreamAccumulator.default_buffer_size)
+            spec.perform_mapping([edges, query], acc)
+            acc.flush()
+
+    def with_cache():
+        for query in requests:
+            cache.write_facts(spec, [edges, query], io.StringIO())
+
+    print('{0} requests with {1} unchanged edges each'.format(len(requests), len(edges)))
+    t_without = min(timeit.repeat(without_cache, number=1, repeat=3))
+    print('without cache:    {0:8.3f} s'.format(t_without))
+    t_cold = timeit.timeit(with_cache, number=1)
+    print('cold cache:       {0:8.3f} s'.format(t_cold))
+    t_warm = min(timeit.repeat(with_cache, number=1, repeat=3))
+    print('warm cache:       {0:8.3f} s'.format(t_warm))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+'''Compare the interpreted and the compiled INPUT mapping on a graph with many nodes and edges.'''
+import timeit
+from aspio.input import InputSpec, FactAccumulator
+
+
+class Node:
+    def __init__(self, label):
+        self.label = label
+        self.neighbors = []
+
+
+class CountingAccumulator(FactAccumulator):
+    def __init__(self):
+        self.count = 0
+
+    def add_fact(self, predicate, args):
+        self.count += 1
+
+
+def main():
+    nodes = [Node('n{0}'.format(i)) for i in range(100000)]
+    for (i, n) in enumerate(nodes):
+        n.neighbors.extend(nodes[(i + k) % len(nodes)] for k in range(1, 10))
+    spec = InputSpec.parse(r'''
+        INPUT (nodes) {
+            node(n.label) for (_, n) in nodes;
+            edge(n.label, m.label) for (_, n) in nodes for (_, m) in n.neighbors;
+        }''')
+    acc = CountingAccumulator()
+    spec.perform_mapping([nodes], acc)
+    print('{0} facts'.format(acc.count))
+    t_interpreted = min(timeit.repeat(lambda: spec.perform_interpreted_mapping([nodes], CountingAccumulator()), number=1, repeat=3))
+    print('interpreted: {0:8.3f} s'.format(t_interpreted))
+    t_compiled = min(timeit.repeat(lambda: spec.perform_mapping([nodes], CountingAccumulator()), number=1, repeat=3))
+    print('compiled:    {0:8.3f} s'.format(t_compiled))
+    print('speedup:     {0:8.1f}x'.format(t_interpreted / t_compiled))
+
+
+if __name__ == '__main__':
+    main()
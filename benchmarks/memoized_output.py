@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+'''Compare the output mapping of many similar answer sets with and without memoization of pure constructors (the solver is not run).
+
+Memoization mainly reduces the memory held by the results; the constructors used here are cheap, so the mapping time is about the same.
+'''
+import timeit
+import tracemalloc
+from collections import namedtuple
+from aspio.output import OutputSpec
+from aspio.program import Results
+from aspio.registry import Registry
+
+ColoredNode = namedtuple('ColoredNode', ['label', 'color'])
+
+
+class ClosableList(list):
+    def close(self):
+        pass
+
+
+def main():
+    spec = OutputSpec.parse(r'''
+        OUTPUT {
+            colored = set { query: color(N, C); content: ColoredNode(N, C); };
+            weights = set { query: weight(N, W); content: (N, int(W)); };
+        }''')
+    registry = Registry()
+    registry.register(ColoredNode, pure=True)
+    n = 2000
+    labels = ['n{0}'.format(i) for i in range(n)]
+    # Consecutive answer sets differ in the colors and weights of a few nodes only
+    answer_sets = [
+        {
+            'color': [(x, 'red' if i % 100 != k % 100 else 'green') for (i, x) in enumerate(labels)],
+            'weight': [(x, str(i if i % 100 != k % 100 else k)) for (i, x) in enumerate(labels)],
+        }
+        for k in range(200)
+    ]
+
+    def mapping(memoize):
+        results = Results(ClosableList(answer_sets), spec, registry, True, memoize=memoize)
+        for r in results:
+            r.colored
+            r.weights
+        return results
+
+    assert [(r.colored, r.weights) for r in mapping(False)] == [(r.colored, r.weights) for r in mapping(True)]
+    for memoize in (False, True):
+        t = min(timeit.repeat(lambda: mapping(memoize), number=1, repeat=3))
+        tracemalloc.start()
+        results = mapping(memoize)
+        (size, _) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del results
+        print('memoize={0!s:5}: {1:8.3f} s, {2:6.1f} MiB held by the cached results'.format(memoize, t, size / 2**20))
+    print('Memoization trades the time to look up the arguments of pure constructors for the memory of duplicate objects.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+'''Measure the output mapping of nested collections (like `class_timetables` in examples/timetable.dl) for growing numbers of classes.
+
+The answer sets are generated directly (the solver is not run). With the index on captured tuples, the time should grow linearly.
+'''
+import timeit
+from aspio.output import ExprCollection, OutputSpec
+from aspio.registry import Registry
+
+
+def collections(expr):
+    '''Yield the collections of the given expression, outermost first.'''
+    if isinstance(expr, ExprCollection):
+        yield expr
+    for subexpr in getattr(expr, 'subexpressions', ()):
+        yield from collections(subexpr)
+
+
+def main():
+    spec = OutputSpec.parse(r'''
+        OUTPUT {
+            class_timetables = dictionary {
+                query: class(C);
+                key: C;
+                content: sequence {
+                    query: day(D);
+                    index: D;
+                    content: sequence {
+                        query: classassign(C,S,_,D,P);
+                        index: P;
+                        content: S;
+                    };
+                };
+            };
+        }''')
+    # The answer set contains the tuples of the predicates the collections read (helper predicates or predicates of the program)
+    (class_query, day_query, assign_query) = collections(spec.exprs['class_timetables'])
+
+    def tuples(collection, assignments):
+        return [tuple(values[v] for v in collection.captured_variables) for values in assignments]
+    days = 5
+    periods = 6
+    registry = Registry()
+    for classes in (100, 200, 400, 800):
+        class_ids = ['c{0}'.format(c) for c in range(classes)]
+        answer_set = {
+            class_query.output_predicate: tuples(class_query, ({'C': c} for c in class_ids)),
+            day_query.output_predicate: tuples(day_query, ({'D': str(d)} for d in range(days))),
+            assign_query.output_predicate: tuples(assign_query, ({'C': c, 'D': str(d), 'S': 's{0}'.format(p), 'P': str(p)}
+                                                                 for c in class_ids for d in range(days) for p in range(periods))),
+        }
+        assert len(answer_set) == 3
+
+        def mapping():
+            return spec.prepare_mapping(answer_set, registry).get_object('class_timetables')
+        assert len(mapping()) == classes
+        t = min(timeit.repeat(mapping, number=1, repeat=3))
+        print('{0:4d} classes: {1:8.3f} s'.format(classes, t))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+'''Compare the interpreted, the compiled, and the lazy output mapping on a large generated answer set (the solver is not run).'''
+import timeit
+from collections import namedtuple
+from aspio.output import OutputSpec
+from aspio.registry import Registry
+
+ColoredNode = namedtuple('ColoredNode', ['label', 'color'])
+
+
+def main():
+    spec = OutputSpec.parse(r'''
+        OUTPUT {
+            nodes = set { node/1 };
+            colored = set { query: color(N, C); content: ColoredNode(N, C); };
+            weights = dictionary { query: weight(N, W); key: N; content: int(W); };
+            neighbors = dictionary {
+                query: node(N);
+                key: N;
+                content: set { query: edge(N, M); content: M; };
+            };
+        }''')
+    registry = Registry()
+    registry.register(ColoredNode)
+    n = 100000
+    labels = ['n{0}'.format(i) for i in range(n)]
+    answer_set = {
+        'node': [(x,) for x in labels],
+        'color': [(x, 'red') for x in labels],
+        'weight': [(x, str(i)) for (i, x) in enumerate(labels)],
+        'edge': [(labels[i], labels[(i + k) % n]) for i in range(n) for k in range(1, 4)],
+    }
+
+    def interpreted():
+        r = spec.prepare_mapping(answer_set, registry)
+        return [r.get_object(name) for name in spec.exprs]
+
+    compiled_spec = spec.compile(registry)
+
+    def compiled():
+        r = compiled_spec.prepare_mapping(answer_set, registry)
+        return [r.get_object(name) for name in spec.exprs]
+    assert interpreted() == compiled()
+    t_interpreted = min(timeit.repeat(interpreted, number=1, repeat=3))
+    print('interpreted: {0:8.3f} s'.format(t_interpreted))
+    t_compiled = min(timeit.repeat(compiled, number=1, repeat=3))
+    print('compiled:    {0:8.3f} s'.format(t_compiled))
+
+    lazy_spec = spec.compile(registry, lazy=True)
+
+    def lazy_sizes():
+        # Only the sizes of the dictionaries and a few elements are used
+        r = lazy_spec.prepare_mapping(answer_set, registry)
+        objs = [r.get_object(name) for name in spec.exprs]
+        return [len(objs[2]), len(objs[3]), next(iter(objs[1])), objs[3][labels[0]]]
+    eager_objs = compiled()
+    assert lazy_sizes()[:2] == [len(eager_objs[2]), len(eager_objs[3])]
+    t_lazy = min(timeit.repeat(lazy_sizes, number=1, repeat=3))
+    print('lazy (partial access): {0:8.3f} s'.format(t_lazy))
+
+
+if __name__ == '__main__':
+    main()
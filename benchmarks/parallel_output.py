@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+'''Compare the output mapping of many answer sets on the calling thread and in pools of worker processes (the solver is not run).'''
+import os
+import timeit
+from collections import namedtuple
+from aspio.output import OutputSpec
+from aspio.program import Results
+from aspio.registry import Registry
+
+ColoredNode = namedtuple('ColoredNode', ['label', 'color'])
+
+
+class ClosableList(list):
+    def close(self):
+        pass
+
+
+def main():
+    spec = OutputSpec.parse(r'''
+        OUTPUT {
+            colored = set { query: color(N, C); content: ColoredNode(N, C); };
+            weights = dictionary { query: weight(N, W); key: N; content: int(W); };
+        }''')
+    registry = Registry()
+    registry.register(ColoredNode)
+    n = 2000
+    labels = ['n{0}'.format(i) for i in range(n)]
+    answer_sets = [
+        {
+            'color': [(x, 'red' if (i + k) % 2 == 0 else 'green') for (i, x) in enumerate(labels)],
+            'weight': [(x, str(i + k)) for (i, x) in enumerate(labels)],
+        }
+        for k in range(200)
+    ]
+
+    def mapping(workers):
+        with Results(ClosableList(answer_sets), spec, registry, False, workers=workers) as results:
+            return [(r.colored, r.weights) for r in results]
+    print('{0} CPUs available'.format(len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()))
+    expected = mapping(None)
+    t = min(timeit.repeat(lambda: mapping(None), number=1, repeat=3))
+    print('calling thread: {0:8.3f} s'.format(t))
+    for workers in (1, 2, 4, 8):
+        assert mapping(workers) == expected
+        t = min(timeit.repeat(lambda: mapping(workers), number=1, repeat=3))
+        print('{0:2d} workers:     {1:8.3f} s'.format(workers, t))
+
+
+if __name__ == '__main__':
+    main()
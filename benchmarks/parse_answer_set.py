@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+'''Compare the pyparsing answer set grammar with the hand-written scanner (eager and lazy, on str and bytes) on a large answer set.'''
+import timeit
+from aspio.answer_set import parse_answer_set
+from aspio.parser import parse_answer_set as parse_answer_set_with_pyparsing
+
+
+def make_answer_set_line(atoms: int) -> str:
+    facts = []
+    for i in range(atoms):
+        if i % 3 == 0:
+            facts.append('assign(c{0},"Subject {1}",{2},{3},{4})'.format(i % 97, i % 13, i % 7, i % 5, i % 6))
+        elif i % 3 == 1:
+            facts.append('edge(n{0},n{1})'.format(i, i + 1))
+        else:
+            facts.append('label({0},"a \\"quoted\\" label")'.format(i))
+    return '{' + ','.join(facts) + '}\n'
+
+
+def main():
+    atoms = 50000
+    line = make_answer_set_line(atoms)
+    assert {p: list(fs) for (p, fs) in parse_answer_set(line).items()} == dict(parse_answer_set_with_pyparsing(line))
+    print('Answer set with {0} atoms ({1} characters)'.format(atoms, len(line)))
+    t_pyparsing = min(timeit.repeat(lambda: parse_answer_set_with_pyparsing(line), number=1, repeat=3))
+    print('pyparsing grammar: {0:8.3f} s'.format(t_pyparsing))
+    t_scanner = min(timeit.repeat(lambda: parse_answer_set(line), number=1, repeat=3))
+    print('scanner:           {0:8.3f} s'.format(t_scanner))
+    print('speedup:           {0:8.1f}x'.format(t_pyparsing / t_scanner))
+    raw_line = line.encode('UTF-8')
+    t_bytes = min(timeit.repeat(lambda: parse_answer_set(raw_line), number=1, repeat=3))
+    print('scanner, bytes:    {0:8.3f} s'.format(t_bytes))
+    t_lazy = min(timeit.repeat(lambda: parse_answer_set(line, lazy=True), number=1, repeat=3))
+    print('lazy, nothing read:{0:8.3f} s'.format(t_lazy))
+    t_lazy_one = min(timeit.repeat(lambda: parse_answer_set(line, lazy=True).get('edge'), number=1, repeat=3))
+    print('lazy, one of three:{0:8.3f} s'.format(t_lazy_one))
+    t_lazy_bytes = min(timeit.repeat(lambda: parse_answer_set(raw_line, lazy=True).get('edge'), number=1, repeat=3))
+    print('lazy bytes, one:   {0:8.3f} s'.format(t_lazy_bytes))
+
+
+if __name__ == '__main__':
+    main()
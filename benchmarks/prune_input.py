@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+'''Measure the input mapping of `Program.solve` with and without `prune_input`, for a specification shared by several encodings.
+
+The solver is not run; only the input passed to it is generated. Also measures the (cached) scan of the program's files.
+'''
+import os
+import tempfile
+import timeit
+from io import StringIO
+import aspio
+from aspio.helper import predicate_scan
+
+
+class CapturingSolver:
+    '''Only generates the solver input.'''
+    def run(self, *, write_input, capture_predicates, file_args, options, symbols=None):
+        self.input = StringIO()
+        write_input(self.input)
+        return iter(())
+
+
+def main():
+    node_count = 200000
+    nodes = frozenset(range(node_count))
+    # This encoding only uses two of the six INPUT predicates
+    with tempfile.NamedTemporaryFile('wt', suffix='.dl', delete=False) as f:
+        f.write('%! INPUT (nodes) { node(n) for n in nodes; a(n) for n in nodes; b(n) for n in nodes; c(n) for n in nodes; d(n) for n in nodes; e(n) for n in nodes; }\n')
+        f.write('%! OUTPUT { ys = set { query: q(X); content: X; }; }\n')
+        f.write('q(X) :- node(X), not a(X).\n')
+        f.write(''.join('% filler comment with node(n{0}) and e(n{0})\n'.format(i) for i in range(100000)))
+    try:
+        program = aspio.Program(filename=f.name)
+        solver = CapturingSolver()
+
+        def solve(prune_input):
+            program.solve(nodes, solver=solver, mapping_options=aspio.MappingOptions(prune_input=prune_input))
+            return len(solver.input.getvalue())
+        print('Input size: {0} characters, pruned: {1} characters'.format(solve(False), solve(True)))
+        t_full = min(timeit.repeat(lambda: solve(False), number=1, repeat=3))
+        print('all predicates:      {0:8.3f} s'.format(t_full))
+        t_pruned = min(timeit.repeat(lambda: solve(True), number=1, repeat=3))
+        print('pruned:              {0:8.3f} s'.format(t_pruned))
+
+        def scan_uncached():
+            predicate_scan._file_cache.clear()
+            return program.used_predicates()
+        t_scan = min(timeit.repeat(scan_uncached, number=1, repeat=3))
+        print('scan (uncached):     {0:8.3f} s'.format(t_scan))
+        t_cached = min(timeit.repeat(program.used_predicates, number=1, repeat=3))
+        print('scan (cached):       {0:8.3f} s'.format(t_cached))
+    finally:
+        os.unlink(f.name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+'''Measure the time to create programs with embedded I/O specifications, with a cold and a warm on-disk specification cache.
+
+Every measurement runs in a fresh interpreter, so the in-memory cache does not help.
+'''
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+script = '''
+import time
+start = time.perf_counter()
+import aspio
+aspio.set_spec_cache_directory(sys.argv[1])
+for filename in sys.argv[2:]:
+    aspio.Program(filename=filename)
+print(time.perf_counter() - start)
+'''
+
+examples = sorted(str(p) for p in (Path(__file__).parent.parent / 'examples').glob('*.dl'))
+
+
+def run(cache_directory: str) -> float:
+    output = subprocess.check_output([sys.executable, '-c', 'import sys\n' + script, cache_directory] + examples, universal_newlines=True)
+    return float(output)
+
+
+def main():
+    print('Creating {0} programs (one per example file)'.format(len(examples)))
+    cold = []
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(3):
+            with tempfile.TemporaryDirectory() as empty_directory:
+                cold.append(run(empty_directory))
+        run(directory)
+        warm = [run(directory) for _ in range(3)]
+    print('cold cache: {0:8.3f} s'.format(min(cold)))
+    print('warm cache: {0:8.3f} s'.format(min(warm)))
+
+
+if __name__ == '__main__':
+    main()
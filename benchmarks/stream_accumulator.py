@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+'''Measure the throughput of writing input facts to a file through `StreamAccumulator`.
+
+Compares the previous implementation (one `write` call per token) with the current one, unbuffered and buffered.
+'''
+import numbers
+import os
+import tempfile
+import timeit
+from aspio import asp
+from aspio.program import StreamAccumulator
+
+
+class PreviousStreamAccumulator:
+    '''The implementation of StreamAccumulator.add_fact before facts were batched (without the debug logging).'''
+    def __init__(self, output_stream):
+        self._stream = output_stream
+
+    def arg_str(self, arg):
+        if isinstance(arg, numbers.Integral):
+            return str(arg)
+        else:
+            return asp.quote(arg)
+
+    def add_fact(self, predicate, args):
+        self._stream.write(predicate)
+        self._stream.write('(')
+        for (idx, arg) in enumerate(args):
+            if idx > 0:
+                self._stream.write(',')
+            self._stream.write(self.arg_str(arg))
+        self._stream.write(').\n')
+
+    def flush(self):
+        pass
+
+
+def write_facts(filename, make_accumulator, facts):
+    with open(filename, 'wt', encoding='UTF-8') as stream:
+        acc = make_accumulator(stream)
+        for args in facts:
+            acc.add_fact('edge', args)
+        acc.flush()
+
+
+def main():
+    facts = [('n{0}'.format(i), 'n{0}'.format(i + 1), i % 100) for i in range(500000)]
+    (fd, filename) = tempfile.mkstemp(suffix='.dl')
+    os.close(fd)
+    try:
+        variants = [
+            ('previous', PreviousStreamAccumulator),
+            ('unbuffered', StreamAccumulator),
+            ('buffered', lambda stream: StreamAccumulator(stream, buffer_size=StreamAccumulator.default_buffer_size)),
+        ]
+        print('Writing {0} facts'.format(len(facts)))
+        for (name, make_accumulator) in variants:
+            t = min(timeit.repeat(lambda: write_facts(filename, make_accumulator, facts), number=1, repeat=3))
+            print('{0:12} {1:8.3f} s'.format(name + ':', t))
+    finally:
+        os.unlink(filename)
+
+
+if __name__ == '__main__':
+    main()
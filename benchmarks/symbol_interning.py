@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+'''Measure the memory retained by decoded answer sets, with and without a per-solve symbol table.
+
+The answer sets are shaped like those of examples/longrunning.py: a fixed domain, and one of three atoms per domain element.
+'''
+import itertools
+import tracemalloc
+from aspio.answer_set import parse_answer_set, SymbolTable
+
+
+def make_answer_set_lines(models: int, domain_size: int = 8):
+    domain = ['item_{0}'.format(i) for i in range(domain_size)]
+    choices = itertools.product(('a', 'b', 'c'), repeat=domain_size)
+    for choice in itertools.islice(choices, models):
+        facts = ['num({0})'.format(x) for x in domain]
+        facts.extend('{0}({1},"label of {1}")'.format(pred, x) for pred, x in zip(choice, domain))
+        yield '{' + ','.join(facts) + '}\n'
+
+
+def retained_memory(models: int, use_symbol_table: bool) -> int:
+    lines = list(make_answer_set_lines(models))
+    tracemalloc.start()
+    symbols = SymbolTable() if use_symbol_table else None
+    answer_sets = [parse_answer_set(line, symbols=symbols) for line in lines]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(answer_sets) == models
+    return size
+
+
+def main():
+    print('{0:>8}  {1:>16}  {2:>16}'.format('models', 'without table', 'with table'))
+    for models in (500, 1000, 2000, 4000, 6561):
+        without_table = retained_memory(models, use_symbol_table=False)
+        with_table = retained_memory(models, use_symbol_table=True)
+        print('{0:8}  {1:13.1f} KiB  {2:13.1f} KiB'.format(models, without_table / 1024, with_table / 1024))
+
+
+if __name__ == '__main__':
+    main()